@@ -5,16 +5,22 @@ __email__ = 'mail@daniel-williams.co.uk'
 __version__ = '0.2.0'
 __packagename__ = "acreroad_1420"
 
-from pkg_resources import resource_string, resource_stream, resource_filename
-import ConfigParser, os
-default_config = resource_stream(__name__, '{}.conf'.format(__packagename__))
+import os
+try:
+    import ConfigParser
+except ImportError:
+    import configparser as ConfigParser
+# The package is installed unzipped, so its data files can be found
+# beside it, without the slow import of pkg_resources
+_here = os.path.dirname(os.path.abspath(__file__))
+default_config = os.path.join(_here, '{}.conf'.format(__packagename__))
 CONFIGURATION = ConfigParser.ConfigParser()
 #if not config_file:
-CONFIGURATION.readfp(default_config)
+CONFIGURATION.read([default_config])
 CONFIGURATION.read([os.path.join(direc, ".{}".format(__packagename__)) for direc in (os.curdir, os.path.expanduser("~"), "/etc/{}".format(__packagename__))])
 
 # Load the radio sources catalogue
-CATALOGUE = resource_filename(__name__, 'radiosources.cat')
+CATALOGUE = os.path.join(_here, 'radiosources.cat')
 # SOURCES = 
 # #if not config_file:
 # CONFIGURATION.readfp(default_config)
@@ -10,6 +10,7 @@ Contact: frith.ronnie@gmail.com
 from . import CONFIGURATION as config
 from . import CATALOGUE
 from .drive import Drive
+from . import coordinates, transforms
 
 #from acreroad_1420 import CONFIGURATION as config
 import numpy as np
@@ -96,19 +97,19 @@ class antennaCoordsInfo(QtGui.QWidget):
         gb.setFixedSize(screen.width(),200)
         layout = QtGui.QHBoxLayout(self)
         #self.setLayout(layout)
-        position = self.parent().drive.current_position
+        status = self.parent().drive.status()
         
         self.posLabel = QtGui.QLabel(
             """<span style='font-family:mono,fixed; 
             background: black; font-size:8pt; font-weight:600; 
             color:#dddddd;'>
-            AltAz</span>: {0.alt:.2f} {0.az:.2f} """.format(self.parent().drive.current_position))
+            AltAz</span>: {0[alt]:.2f} {0[az]:.2f} """.format(status))
         layout.addWidget(self.posLabel)
 
-        self.radecLabel = QtGui.QLabel("Ra Dec: {0.ra:.2f} {0.dec:.2f}".format( position.transform_to('icrs')  ))
+        self.radecLabel = QtGui.QLabel("Ra Dec: {0[ra]:.2f} {0[dec]:.2f}".format(status))
         layout.addWidget(self.radecLabel)
         
-        self.galLabel = QtGui.QLabel("Gal: {0.l:.2f} {0.b:.2f}".format(position.transform_to('galactic')))
+        self.galLabel = QtGui.QLabel("Gal: {0[l]:.2f} {0[b]:.2f}".format(status))
         layout.addWidget(self.galLabel)
 
         self.utcLabel = QtGui.QLabel("UTC: todo")
@@ -125,10 +126,11 @@ class antennaCoordsInfo(QtGui.QWidget):
         """
         Update is called when the on screen antenna coordinate information should be updated to new values.
         """
-        currentPos = self.parent().drive.skycoord()
-        self.posLabel.setText("<span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0.az.value:.2f}</span> <span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd; left: -5px;'>az</span> <span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0.alt.value:.2f}</span>  <span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd;'>alt</span>".format(currentPos))
-        self.radecLabel.setText("<span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0.ra.value:.2f}<span><span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd;'>ra</span> <span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0.dec.value:.2f}</span><span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd;'>dec</span>" .format(currentPos.transform_to('icrs')))
-        self.galLabel.setText("<span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0.l.value:.2f}<span><span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd;'>lon</span> <span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0.b.value:.2f}</span><span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd;'>lat</span>".format(currentPos.transform_to('galactic')))
+        # One position, converted without astropy, for all three labels
+        status = self.parent().drive.status()
+        self.posLabel.setText("<span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0[az]:.2f}</span> <span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd; left: -5px;'>az</span> <span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0[alt]:.2f}</span>  <span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd;'>alt</span>".format(status))
+        self.radecLabel.setText("<span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0[ra]:.2f}<span><span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd;'>ra</span> <span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0[dec]:.2f}</span><span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd;'>dec</span>" .format(status))
+        self.galLabel.setText("<span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0[l]:.2f}<span><span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd;'>lon</span> <span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0[b]:.2f}</span><span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd;'>lat</span>".format(status))
 
     def tick(self):
         self.utcLabel.setText(" <span style='font-family:mono,fixed; background: black; font-size:12pt; font-weight:600; color:#ffffff;'>{0}</span> <span style='font-family:mono,fixed; background: black; font-size:8pt; font-weight:600; color:#dddddd;'>UTC</span>".format(time.strftime("%H:%M:%S",time.gmtime())))
@@ -167,19 +169,15 @@ class sourceInfo(QtGui.QWidget):
         Whenever it is required to update information about a radio source src.
         """
         name = src.getName()
-        pos = src.getPos()
-        skycoord = src.skycoord
-        #radec = src.getRADEC()
-        #gal = src.getGal()
+        az, alt = src.getPos()
+        ra, dec = transforms.CACHE.convert('altaz', az, alt, 'icrs', src.time, src.site)
+        l, b = transforms.CACHE.convert('altaz', az, alt, 'galactic', src.time, src.site)
+        l, b = coordinates.signed_dms(l), coordinates.signed_dms(b)
         
         self.nameLabel.setText("<span style='font-weight: 600; color: blue;'>{}</span>".format(name))
-        self.posLabel.setText("AzEl: {0.az.value:.2f} az {0.alt.value:.2f} el".format(skycoord))
-        self.radecLabel.setText("{0.ra.value:.2f} {0.dec.value:.2f}".format(skycoord.transform_to('icrs')))
-        galco = skycoord.transform_to('galactic')
-        self.galLabel.setText(u"{0:.0f}°{1[2]:.0f}'{1[3]:.2f}\" l   {2:.0f}°{3[2]:.0f}'{3[3]:.2f}\" b".format(galco.l.signed_dms[0]*galco.l.signed_dms[1], \
-                                                                                                                                galco.l.signed_dms, \
-                                                                                                                                galco.b.signed_dms[0]*galco.b.signed_dms[1],\
-                                                                                                                                galco.b.signed_dms))
+        self.posLabel.setText("AzEl: {0:.2f} az {1:.2f} el".format(az, alt))
+        self.radecLabel.setText("{0:.2f} {1:.2f}".format(ra, dec))
+        self.galLabel.setText(u"{0:.0f}°{1[2]:.0f}'{1[3]:.2f}\" l   {2:.0f}°{3[2]:.0f}'{3[3]:.2f}\" b".format(l[0]*l[1], l, b[0]*b[1], b))
 
 class commandButtons(QtGui.QWidget):
     """
@@ -353,7 +351,7 @@ class commandButtons(QtGui.QWidget):
         elif self.trackToggle == TrackToggle.ON:
             self.trackToggle = TrackToggle.OFF
             print("Track Toggle OFF")
-            self.parent().drive.track(tracking=False)
+            self.parent().drive.stop_track()
         self.parent().setFocus()
 
     def handleCalibrateButton(self):
@@ -376,35 +374,12 @@ def writeConfigFile():
 def park():
     """
     A simple script to park the telescope in the stow position.
-    """
-    import sys
-
-    import time
-    import drive
 
-    device = config.get('arduino','dev')
-    print "Connecting to the drive" 
-    connection = drive.Drive(device, config.get("arduino", "baud"), simulate=0, homeonstart=False)
-    print "Connected"
-    
-    #connection.stow()
-
-    if sys.argv[1] == "snow":
-        # If we're parking due to snow we want to park in the home position
-        # to avoid the bowl filling with the white stuff
-        command = connection.home()
-        #while connection.homing ==True: 
-        #    print "Homing..."
-        #    time.sleep(1)
-
-    elif sys.argv[1] == "wind":
-        # If we're parking due to the wind then park in the stow position
-        # pointing straight up
-        connection._command(connection.vocabulary['STOW'])
-        time.sleep(1)
-        #connection.stow()
-
-    
+    This is kept for anything which calls it from here; the work is
+    done by `acreroad_1420.park`, which doesn't start the whole drive.
+    """
+    from .park import main
+    sys.exit(main())
 
 def main():
     app = QtGui.QApplication(sys.argv)
@@ -433,6 +408,7 @@ def main():
         drive = Drive(simulate=0,calibration=calibrationSpeeds, persist=True)
     
     main = mainWindow(drive,catalogue)
+    app.aboutToQuit.connect(drive.close)
 
     main.show()
     sys.exit(app.exec_())
@@ -0,0 +1,186 @@
+"""
+acreroad_1420 asyncio drive
+
+An asyncio front-end for the drive, which reads from the controller on
+the event loop rather than on threads of its own, so that any number of
+coroutines, for example the GUI, the scheduler and a monitor, can share
+one connection.
+
+This needs Python 3.6 or later.
+
+Examples
+--------
+>>> connection = drive.Drive('/dev/ttyACM0', 9600, listen=False)
+>>> telescope = AsyncDrive(connection)
+>>> await telescope.goto(SkyCoord(ra=10*u.deg, dec=20*u.deg))
+>>> async for position in telescope.positions():
+...     print(position.az, position.alt)
+"""
+
+import asyncio
+import collections
+
+from . import protocol
+from .drive import ControllerException
+from .link import ConnectionLost
+from .reader import LineReader
+
+
+Position = collections.namedtuple('Position', 'time az alt')
+
+
+class AsyncDrive():
+    """
+    A drive which can be awaited.
+
+    Parameters
+    ----------
+    drive : Drive
+       The drive, which should be made with `listen=False` so that it
+       doesn't read from the controller itself.
+    loop : asyncio event loop
+       The loop to read from the controller on. Defaults to the current one.
+    queue : int
+       The most position updates which are kept for a consumer which is
+       falling behind. Older updates are dropped.
+    """
+    def __init__(self, drive, loop=None, queue=16):
+        self.drive = drive
+        self.loop = loop or asyncio.get_event_loop()
+        self.queue = queue
+        self._consumers = set()
+        self._fileno = None
+        self.reader = None
+        if not drive.sim:
+            if drive.reader and drive.reader.running:
+                # Its threads would otherwise go on taking lines from the port
+                drive.reader.stop()
+            # The reader is only used to frame the lines; it isn't started
+            self.reader = drive.reader = LineReader(drive.ser, self._parse, recorder=drive.recorder)
+            if hasattr(drive.ser, 'add_listener'):
+                # The port's file changes when the link reconnects
+                drive.ser.add_listener(self._connection_changed)
+            connected = getattr(drive.ser, 'connected', None)
+            self._reconnected(connected is None or connected.is_set())
+
+    def close(self):
+        """
+        Stop reading from the controller.
+        """
+        if self.reader and self._fileno is not None:
+            self.loop.remove_reader(self._fileno)
+            self._fileno = None
+        if hasattr(self.drive.ser, 'remove_listener'):
+            self.drive.ser.remove_listener(self._connection_changed)
+        self.reader = None
+        for consumer in self._consumers:
+            consumer.put_nowait(None)
+
+    def _connection_changed(self, link, connected):
+        # This is called from the link's thread
+        self.loop.call_soon_threadsafe(self._reconnected, connected)
+
+    def _reconnected(self, connected):
+        if not self.reader:
+            return
+        if self._fileno is not None:
+            self.loop.remove_reader(self._fileno)
+            self._fileno = None
+        if connected:
+            try:
+                self._fileno = self.drive.ser.fileno()
+            except ConnectionLost:
+                # It was lost again before this was called
+                return
+            self.loop.add_reader(self._fileno, self._readable)
+
+    def _readable(self):
+        connected = getattr(self.drive.ser, 'connected', None)
+        if connected is not None and not connected.is_set():
+            # Reading would block until the link reconnects
+            return
+        try:
+            waiting = self.reader._waiting()
+        except (IOError, OSError):
+            waiting = 0
+        if not waiting:
+            # The port is only readable with nothing to read once it has
+            # hung up. Reading would block, and leaving it watched would
+            # spin, so it's dropped until the link reconnects.
+            self._reconnected(False)
+            return
+        chunk = self.drive.ser.read(waiting)
+        if chunk:
+            self.reader.feed(chunk)
+            self.reader.drain()
+
+    def _parse(self, line):
+        record = self.drive.parse(line)
+        if isinstance(record, (protocol.Status, protocol.Click)):
+            position = self.drive.position
+            self._publish(Position(position.time, position.az, position.alt))
+
+    def _publish(self, position):
+        for consumer in self._consumers:
+            if consumer.full():
+                consumer.get_nowait()
+            consumer.put_nowait(position)
+
+    async def positions(self):
+        """
+        The positions of the telescope, as the controller reports them.
+
+        Yields
+        ------
+        Position
+           The time, azimuth and altitude, in degrees.
+        """
+        consumer = asyncio.Queue(self.queue)
+        self._consumers.add(consumer)
+        try:
+            while True:
+                position = await consumer.get()
+                if position is None:
+                    return
+                yield position
+        finally:
+            self._consumers.discard(consumer)
+
+    async def _slew(self, slew, timeout):
+        done = self.loop.create_future()
+        slew.add_done_callback(lambda slew: self.loop.call_soon_threadsafe(_settle, done))
+        await asyncio.wait_for(done, timeout)
+        if slew.reason:
+            raise ControllerException(slew.reason)
+        return slew
+
+    async def goto(self, skycoord, track=False, timeout=None):
+        """
+        Slew to a position, returning once the telescope arrives.
+
+        Raises
+        ------
+        ControllerException
+           If the slew fails.
+        asyncio.TimeoutError
+           If the telescope doesn't arrive in `timeout` seconds.
+        """
+        return await self._slew(self.drive.goto(skycoord, track=track), timeout)
+
+    async def home(self, timeout=None):
+        """
+        Slew to the home position, returning once the telescope arrives.
+        """
+        self.drive.home()
+        return await self._slew(self.drive.slew, timeout)
+
+    async def stow(self, timeout=None):
+        """
+        Slew to the stow position, returning once the telescope arrives.
+        """
+        self.drive.stow()
+        return await self._slew(self.drive.slew, timeout)
+
+def _settle(future):
+    if not future.done():
+        future.set_result(None)
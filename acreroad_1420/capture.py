@@ -0,0 +1,174 @@
+"""
+acreroad_1420 Serial capture
+
+Records the traffic between the drive and its controller, so that it
+can be played back later without the hardware: to rebuild what the
+drive knew on a particular night, or to test the parser against real
+traffic.
+
+A capture is a binary file which starts with `MAGIC`, followed by one
+record for each line from the controller and each command to it. Each
+record is a header, packed as `HEADER`, holding the time on the
+monotonic clock, the kind of record, and the length of the data, and
+then the data itself.
+
+Examples
+--------
+>>> connection = drive.Drive('/dev/ttyACM0', 19200, capture='tonight.cap')
+...
+>>> replica = drive.Drive(simulate=1, homeonstart=False)
+>>> replay('tonight.cap', replica.parse)
+{'lines': 86400, 'commands': 120, 'seconds': 0.9, 'rate': 96000.0}
+"""
+
+import collections
+import struct
+import threading
+import time
+
+
+monotonic = getattr(time, 'monotonic', time.time)
+
+MAGIC = b"ACRCAP1\n"
+HEADER = struct.Struct("<dBH")
+
+# The kinds of record
+LINE = 0
+COMMAND = 1
+
+Record = collections.namedtuple('Record', 'time kind data')
+
+
+class Recorder():
+    """
+    Writes a capture file.
+
+    Records can be made from any thread.
+
+    Parameters
+    ----------
+    path : str
+       The file to write. If it already exists it's added to.
+    interval : float
+       The longest time, in seconds, which records are kept in memory
+       before they're written to the file. 0 writes every record
+       straight away.
+    """
+    def __init__(self, path, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self.records = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab')
+        if not self._file.tell():
+            self._file.write(MAGIC)
+        self._flushed = monotonic()
+
+    def record(self, kind, data, when=None):
+        if not isinstance(data, bytes):
+            data = data.encode('ascii', 'replace')
+        data = data[:0xffff]
+        now = monotonic()
+        with self._lock:
+            if self._file.closed:
+                # Lines can still arrive while the drive is shutting down
+                return
+            self._file.write(HEADER.pack(now if when is None else when, kind, len(data)))
+            self._file.write(data)
+            self.records += 1
+            if now - self._flushed >= self.interval:
+                self._file.flush()
+                self._flushed = now
+
+    def line(self, data, when=None):
+        """
+        Record a line which was read from the controller, at `when` on the
+        monotonic clock, or now.
+        """
+        self.record(LINE, data, when)
+
+    def command(self, command):
+        """
+        Record a command which was sent to the controller.
+        """
+        self.record(COMMAND, command)
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._flushed = monotonic()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read(path):
+    """
+    Read the records from a capture file.
+
+    Yields
+    ------
+    Record
+       The time, on the monotonic clock of the machine which made the
+       capture, the kind, either `LINE` or `COMMAND`, and the data.
+    """
+    with open(path, 'rb') as capture:
+        if capture.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} isn't a capture file".format(path))
+        while True:
+            header = capture.read(HEADER.size)
+            if len(header) < HEADER.size:
+                # The end, or a record which was cut off
+                return
+            when, kind, length = HEADER.unpack(header)
+            data = capture.read(length)
+            if len(data) < length:
+                return
+            yield Record(when, kind, data)
+
+def replay(path, handler, command=None, realtime=False, speed=1.0):
+    """
+    Play a capture back through a parser.
+
+    Parameters
+    ----------
+    path : str
+       The capture file.
+    handler : callable
+       Given each line from the controller, as bytes; normally the
+       `parse` method of a drive in simulation mode.
+    command : callable
+       Given each command which was sent, as a str. Commands are skipped
+       if this isn't given.
+    realtime : bool
+       Whether to keep to the timing of the capture, rather than going
+       as fast as possible.
+    speed : float
+       How many times faster than real time to play back, if `realtime`.
+
+    Returns
+    -------
+    dict
+       The numbers of `lines` and `commands` played back, the `seconds`
+       this took, and the `rate` in lines per second.
+    """
+    lines = commands = 0
+    start = first = None
+    for record in read(path):
+        if start is None:
+            start, first = monotonic(), record.time
+        if realtime:
+            delay = (record.time - first)/speed - (monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+        if record.kind == LINE:
+            handler(record.data)
+            lines += 1
+        elif command:
+            command(record.data.decode('ascii'))
+            commands += 1
+    seconds = monotonic() - start if start is not None else 0
+    return {'lines': lines, 'commands': commands, 'seconds': seconds,
+            'rate': lines/seconds if seconds else None}
@@ -0,0 +1,71 @@
+"""
+acreroad_1420 Clocks
+
+The scheduler takes the time from a clock object rather than straight
+from the system, so that a schedule can be run against a virtual clock
+which jumps forward to each event instead of waiting for it.
+"""
+
+import datetime
+import time
+
+
+class SystemClock():
+    """
+    The wall clock, which is what the scheduler uses normally.
+    """
+    def now(self):
+        return datetime.datetime.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, condition, timeout=None):
+        """
+        Wait on a condition variable, which must be held by the caller,
+        until it's notified or the timeout, in seconds, runs out.
+        """
+        condition.wait(timeout)
+
+
+class VirtualClock():
+    """
+    A clock which only moves when it's told to, or when something waits
+    on it, in which case it jumps straight to the end of the wait.
+
+    Parameters
+    ----------
+    start : datetime
+       The time to start the clock at. Defaults to the current time.
+
+    Examples
+    --------
+    >>> clock = VirtualClock(datetime.datetime(2016, 3, 8, 17, 10))
+    >>> clock.sleep(3600)
+    >>> clock.now()
+    datetime.datetime(2016, 3, 8, 18, 10)
+    """
+    def __init__(self, start=None):
+        self._now = start or datetime.datetime.now()
+
+    def now(self):
+        return self._now
+
+    def advance(self, seconds):
+        """
+        Move the clock forward by a number of seconds.
+        """
+        if seconds > 0:
+            self._now += datetime.timedelta(seconds=seconds)
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def wait(self, condition, timeout=None):
+        # Nothing else can happen while the clock is stopped, so a wait
+        # always runs to its timeout. A wait without one can only end by
+        # being notified, which is waited for on the real clock.
+        if timeout is None:
+            condition.wait()
+        else:
+            self.advance(timeout)
@@ -0,0 +1,293 @@
+"""
+acreroad_1420 Coordinates
+
+Fast conversions between horizontal, equatorial (ICRS) and Galactic
+coordinates, for the places where the position of the telescope is
+converted many times a second, such as the labels in the GUI.
+
+Astropy builds a `Time` and a `SkyCoord`, and works out the
+orientation of the Earth in full, for every transformation, which
+takes milliseconds. Here positions and times are plain floats, or
+NumPy arrays of them, and the orientation of the Earth comes from
+short series:
+
+* precession (IAU 1976) and the largest terms of the nutation,
+* the apparent sidereal time, from UT1, which is taken to be UTC
+  unless `dut1` is given,
+* annual aberration, from a low-precision orbit of the Earth.
+
+Polar motion, diurnal aberration and the bending of light by the Sun
+are left out; together they come to well under an arcsecond away from
+the Sun. There's no refraction, as there's none in the drive's
+`AltAz` frames.
+
+The results agree with astropy to within `TOLERANCE`, given the same
+UT1, and to within `POINTING_TOLERANCE` if UT1 is taken to be UTC.
+Galactic coordinates agree to within `GALACTIC_TOLERANCE`.
+Astropy is still the reference, and should be used wherever precision
+matters more than speed.
+
+Examples
+--------
+>>> altaz_to_icrs(180., 34.1, 1476576000., 55.9, -4.3)
+(20.4227, -0.0881)
+>>> icrs_to_galactic(83.633, 22.014)
+(184.5578, -5.7847)
+"""
+
+import numpy as np
+
+
+# Agreement with astropy, in degrees: for display, with the same UT1,
+# and for pointing, with UT1 taken to be UTC
+TOLERANCE = 1.5 / 3600.
+POINTING_TOLERANCE = 0.01
+# Agreement with astropy between ICRS and Galactic coordinates, which
+# differs by a few hundredths of an arcsecond between its versions
+GALACTIC_TOLERANCE = 0.1 / 3600.
+
+ARCSEC = np.pi / (180 * 3600.)
+
+# Noon on the 1st of January 2000, in seconds since 1970
+J2000 = 946728000.
+
+# The speed of light, in AU per day
+SPEED_OF_LIGHT = 173.1446326847
+
+
+def _rotation(axis, angle):
+    """
+    Matrices which rotate the coordinate frame by `angle` radians about
+    the x (0), y (1) or z (2) axis, stacked along the shape of `angle`.
+    """
+    angle = np.asarray(angle, dtype=float)
+    cos, sin = np.cos(angle), np.sin(angle)
+    i, j = (axis + 1) % 3, (axis + 2) % 3
+    matrix = np.zeros(angle.shape + (3, 3))
+    matrix[..., axis, axis] = 1
+    matrix[..., i, i] = matrix[..., j, j] = cos
+    matrix[..., i, j] = sin
+    matrix[..., j, i] = -sin
+    return matrix
+
+def _stack(parts):
+    """
+    Arrays of the same shape, stacked along a new last axis. (This is
+    `np.stack`, which isn't in NumPy 1.8.)
+    """
+    return np.concatenate([np.asarray(part)[..., None] for part in parts], axis=-1)
+
+def _vector(lon, lat):
+    lon, lat = np.radians(lon), np.radians(lat)
+    return _stack([np.cos(lat)*np.cos(lon), np.cos(lat)*np.sin(lon), np.sin(lat)])
+
+def _angles(vector):
+    x, y, z = vector[..., 0], vector[..., 1], vector[..., 2]
+    return np.degrees(np.arctan2(y, x)) % 360, np.degrees(np.arctan2(z, np.hypot(x, y)))
+
+def _apply(matrix, vector):
+    return np.einsum('...ij,...j->...i', matrix, vector)
+
+def _product(*matrices):
+    """
+    The product of stacks of matrices, from left to right.
+    """
+    product = matrices[-1]
+    for matrix in reversed(matrices[:-1]):
+        product = np.einsum('...ij,...jk->...ik', matrix, product)
+    return product
+
+# The small rotation from the ICRS to the mean equator and equinox of J2000
+BIAS = _product(_rotation(0, 0.0068192*ARCSEC), _rotation(1, -0.0166170*ARCSEC), _rotation(2, -0.0146*ARCSEC))
+
+def _galactic_matrix():
+    """
+    The rotation from the ICRS to Galactic coordinates, from the pole
+    and the longitude of the celestial pole which astropy uses to define
+    the Galactic frame on the mean equator of J2000.
+    """
+    pole = _vector(192.8594812065348, 27.12825118085622)
+    lon0 = np.radians(122.9319185680026)
+    # The direction of the celestial pole, in the Galactic plane
+    north = np.array([0., 0., 1.]) - pole[2]*pole
+    north /= np.linalg.norm(north)
+    east = np.cross(pole, north)
+    x = np.cos(lon0)*north - np.sin(lon0)*east
+    y = np.sin(lon0)*north + np.cos(lon0)*east
+    return np.dot(np.array([x, y, pole]), BIAS)
+
+GALACTIC = _galactic_matrix()
+
+
+def _days(t):
+    """
+    The number of days since J2000, for a time in seconds since 1970.
+    """
+    return (np.asarray(t, dtype=float) - J2000) / 86400.
+
+def nutation(days):
+    """
+    The nutation in longitude and obliquity, and the mean obliquity of
+    the ecliptic, in radians, from the largest terms of the series.
+    """
+    T = days / 36525.
+    node = np.radians(125.04452 - 1934.136261*T)
+    sun = np.radians(2*(280.4665 + 36000.7698*T))
+    moon = np.radians(2*(218.3165 + 481267.8813*T))
+    dpsi = (-17.20*np.sin(node) - 1.32*np.sin(sun) - 0.23*np.sin(moon) + 0.21*np.sin(2*node))*ARCSEC
+    deps = (9.20*np.cos(node) + 0.57*np.cos(sun) + 0.10*np.cos(moon) - 0.09*np.cos(2*node))*ARCSEC
+    eps = (84381.448 - (46.8150 + (0.00059 - 0.001813*T)*T)*T)*ARCSEC
+    return dpsi, deps, eps
+
+def precession_matrix(days):
+    """
+    The rotation from the ICRS to the true equator and equinox of the
+    date.
+    """
+    T = days / 36525.
+    zeta = (2306.2181 + (0.30188 + 0.017998*T)*T)*T*ARCSEC
+    z = (2306.2181 + (1.09468 + 0.018203*T)*T)*T*ARCSEC
+    theta = (2004.3109 - (0.42665 + 0.041833*T)*T)*T*ARCSEC
+    dpsi, deps, eps = nutation(days)
+    precession = _product(_rotation(2, -z), _rotation(1, theta), _rotation(2, -zeta))
+    nutate = _product(_rotation(0, -(eps + deps)), _rotation(2, -dpsi), _rotation(0, eps))
+    return _product(nutate, precession, BIAS)
+
+def _earth_velocity(days):
+    """
+    The velocity of the Earth around the Sun, as a fraction of the speed
+    of light, on the true equator of the date.
+    """
+    def position(days):
+        T = days / 36525.
+        mean = np.radians(280.46646 + 36000.76983*T)
+        anomaly = np.radians(357.52911 + 35999.05029*T)
+        e = 0.016708634 - 0.000042037*T
+        centre = np.radians((1.914602 - 0.004817*T)*np.sin(anomaly)
+                            + (0.019993 - 0.000101*T)*np.sin(2*anomaly)
+                            + 0.000289*np.sin(3*anomaly))
+        r = 1.000001018*(1 - e*e)/(1 + e*np.cos(anomaly + centre))
+        # The position of the Sun seen from the Earth, turned round
+        return -r*np.cos(mean + centre), -r*np.sin(mean + centre)
+    step = 0.05
+    before, after = position(days - step), position(days + step)
+    vx, vy = [(a - b)/(2*step*SPEED_OF_LIGHT) for a, b in zip(after, before)]
+    _, deps, eps = nutation(days)
+    ecliptic = _stack([vx, vy, np.zeros_like(vx)])
+    return _apply(_rotation(0, -(eps + deps)), ecliptic)
+
+def _aberrate(vector, velocity, sign=1):
+    """
+    Add (or, with `sign` -1, remove) annual aberration, to first order in
+    the velocity.
+    """
+    dot = np.sum(vector*velocity, axis=-1)[..., None]
+    vector = vector + sign*(velocity - dot*vector)
+    return vector / np.linalg.norm(vector, axis=-1)[..., None]
+
+def sidereal_time(t, longitude, dut1=0.0):
+    """
+    The local apparent sidereal time.
+
+    Parameters
+    ----------
+    t : float or array
+       The time, in seconds since 1970 (UTC).
+    longitude : float
+       The longitude of the telescope, in degrees east.
+    dut1 : float
+       UT1 - UTC, in seconds.
+
+    Returns
+    -------
+    float or array
+       In degrees.
+    """
+    days = _days(np.asarray(t, dtype=float) + dut1)
+    T = days / 36525.
+    gmst = 280.46061837 + 360.98564736629*days + (0.000387933 - T/38710000.)*T*T
+    dpsi, _, eps = nutation(days)
+    return (gmst + np.degrees(dpsi*np.cos(eps)) + longitude) % 360
+
+def icrs_to_altaz(ra, dec, t, latitude, longitude, dut1=0.0):
+    """
+    The horizontal position of a point on the sky.
+
+    Parameters
+    ----------
+    ra, dec : float or array
+       The ICRS position, in degrees.
+    t : float or array
+       The time, in seconds since 1970 (UTC).
+    latitude, longitude : float
+       The location of the telescope, in degrees.
+    dut1 : float
+       UT1 - UTC, in seconds.
+
+    Returns
+    -------
+    az, alt : float or array
+       In degrees, with azimuth measured from north through east.
+    """
+    days = _days(t)
+    vector = _apply(precession_matrix(days), _vector(ra, dec))
+    ra, dec = _angles(_aberrate(vector, _earth_velocity(days)))
+    ha = np.radians(sidereal_time(t, longitude, dut1) - ra)
+    dec, lat = np.radians(dec), np.radians(latitude)
+    alt = np.arcsin(np.sin(lat)*np.sin(dec) + np.cos(lat)*np.cos(dec)*np.cos(ha))
+    az = np.arctan2(-np.cos(dec)*np.sin(ha), np.sin(dec)*np.cos(lat) - np.cos(dec)*np.sin(lat)*np.cos(ha))
+    return np.degrees(az) % 360, np.degrees(alt)
+
+def altaz_to_icrs(az, alt, t, latitude, longitude, dut1=0.0):
+    """
+    The ICRS position of a point in the sky, in degrees. The parameters
+    are as for `icrs_to_altaz`.
+    """
+    az, alt, lat = np.radians(az), np.radians(alt), np.radians(latitude)
+    sin_dec = np.sin(lat)*np.sin(alt) + np.cos(lat)*np.cos(alt)*np.cos(az)
+    dec = np.arcsin(np.clip(sin_dec, -1, 1))
+    ha = np.arctan2(-np.sin(az)*np.cos(alt), np.sin(alt)*np.cos(lat) - np.cos(alt)*np.sin(lat)*np.cos(az))
+    ra = sidereal_time(t, longitude, dut1) - np.degrees(ha)
+    days = _days(t)
+    vector = _aberrate(_vector(ra, np.degrees(dec)), _earth_velocity(days), sign=-1)
+    return _angles(_apply(np.swapaxes(precession_matrix(days), -1, -2), vector))
+
+def icrs_to_galactic(ra, dec):
+    """
+    The Galactic longitude and latitude of an ICRS position, all in
+    degrees.
+    """
+    return _angles(_apply(GALACTIC, _vector(ra, dec)))
+
+def galactic_to_icrs(l, b):
+    """
+    The ICRS position of a Galactic longitude and latitude, all in
+    degrees.
+    """
+    return _angles(_apply(GALACTIC.T, _vector(l, b)))
+
+def altaz_to_galactic(az, alt, t, latitude, longitude, dut1=0.0):
+    """
+    The Galactic longitude and latitude of a point in the sky, in
+    degrees. The parameters are as for `icrs_to_altaz`.
+    """
+    return icrs_to_galactic(*altaz_to_icrs(az, alt, t, latitude, longitude, dut1))
+
+def galactic_to_altaz(l, b, t, latitude, longitude, dut1=0.0):
+    """
+    The horizontal position of a Galactic longitude and latitude, in
+    degrees. The parameters are as for `icrs_to_altaz`.
+    """
+    return icrs_to_altaz(*galactic_to_icrs(l, b), t=t, latitude=latitude, longitude=longitude, dut1=dut1)
+
+def signed_dms(angle):
+    """
+    An angle, in degrees, split into its sign, degrees, minutes and
+    seconds, like astropy's `Angle.signed_dms`.
+    """
+    sign = np.sign(angle) or 1.0
+    angle = abs(angle)
+    d = np.floor(angle)
+    m = np.floor((angle - d) * 60)
+    s = ((angle - d) * 60 - m) * 60
+    return sign, d, m, s
@@ -34,6 +34,15 @@ from astropy.time import Time
 import threading
 from os.path import expanduser, isfile, join
 import os.path
+from .slew import SlewModel
+from . import protocol
+from .reader import LineReader
+from .writer import CommandWriter, CommandFuture
+from .link import SerialLink
+from .capture import Recorder
+from .tracking import Tracker, RateTracker
+from . import telemetry
+from . import transforms
 
 import logging
 
@@ -84,8 +93,9 @@ class Drive():
     ra = 0
     dec = 0
 
-    az = 26
-    alt = 3
+    # The latest position, which is replaced, never changed, when the
+    # controller reports a new one
+    position = None
 
     # Calibration variables
 
@@ -98,6 +108,10 @@ class Drive():
     ready = False
     tracking = False
     slewing = False
+    # The slew which is under way, or the last one
+    _slew = None
+    # What keeps the telescope on its target, while it's tracking
+    tracker = None
 
     # String formats
 
@@ -107,7 +121,7 @@ class Drive():
     #stat_format = re.compile(r"\b(\w+)\s*=\s*([^=]*)(?=\s+\w+\s*:|$)")
     stat_format = re.compile(r"(?=\s+)([\w_]+)\s*=\s*([\d_:\.T]+)")
     
-    def __init__(self, device=None, baud=None, timeout=3, simulate=0, calibration=None, location=None, persist=True, homeonstart=True):
+    def __init__(self, device=None, baud=None, timeout=3, simulate=0, calibration=None, location=None, persist=True, homeonstart=True, listen=True, capture=None):
         """
         Software designed to drive the 1420 MHz telescope on the roof of the
         Acre Road observatory. This class interacts with "qp", the telescope
@@ -133,6 +147,14 @@ class Drive():
            The default is `None` which forces a calibration run to be carried-out.
         location : astropy.coordinates.EarthLocation object
            The Earth location of the telescope. The default is `None`, which sets the location as Acre Road Observatory, Glasgow.
+        listen : bool
+           Whether to start the threads which read from the controller.
+           This can be False if something else will read from it, such
+           as an `AsyncDrive`.
+        capture : str
+           The path to a file to record the traffic to and from the 
+           controller in, which can be played back with
+           `acreroad_1420.capture.replay()`.
         
         Examples
         --------
@@ -177,8 +199,12 @@ class Drive():
 
 
         self.sim = self.simulate = simulate
+        self.recorder = Recorder(capture) if capture else None
         self.timeout = timeout
         self.location = location
+        # Coordinate transformations are shared with the GUI through a cache
+        self.cache = transforms.CACHE
+        self._site = transforms.site(location)
 
         self.targetPos = SkyCoord(AltAz(self.az_abs*u.deg,self.el_abs*u.deg,obstime=self.current_time,location=self.location))
 
@@ -186,8 +212,8 @@ class Drive():
         # Initialise the connection to the arduino Note that this can
         # be complicated by the ability of the device name to change
         # when disconnected and reconnected, so a search is
-        # required. This is now handled by the `_openconnection()`
-        # method.
+        # required. This is now handled by a `SerialLink`, which also
+        # reconnects if the arduino drops out.
         if not baud:
             # Get the target baudrate from the config file
             baud = config.get("arduino", "baud")
@@ -195,9 +221,15 @@ class Drive():
         if not device:
             device = config.get('arduino','dev')
         
+        self.writer = None
         if not self.sim:
-            self._openconnection(device, baud)
-            logging.info("Drive controller connected.")
+            self.ser = SerialLink(device, baud, timeout=self.timeout)
+            # Commands are sent from their own thread, once the link is up
+            self.writer = CommandWriter(self.ser, paused=True)
+            self.ser.add_listener(self._connection_changed)
+            self.ser.start()
+            if not self.ser.connected.wait(self.timeout):
+                logging.warning("The drive controller isn't connected yet; commands will be sent once it is.")
 
         
         # Give the Arduino a chance to power-up
@@ -212,6 +244,15 @@ class Drive():
 
         self.calibration = calibration
         self.calibrate(calibration)
+
+        # Where the telescope is, and has been, pointing
+        self.position = Snapshot(26, 3, time.time())
+        self.history = telemetry.PositionHistory()
+
+        # The model used to predict how long slews will take, which is
+        # refined as slews are timed.
+        self.slew_model = SlewModel.from_config(config, max_speed=self.MAX_SPEED)
+        self._slew_record = None
         #self.calibrate()
 
         # Set the format we want to see status strings produced in; we just want azimuth and altitude.
@@ -230,16 +271,15 @@ class Drive():
         if homeonstart:
             self.home()
         
+        self.reader = None
         if not self.sim:
-            self.listen_thread =  threading.Thread(target=self._listener)
-            self.listen_thread.daemon = True
-            self.listen_thread.start()
+            # Lines from the controller are read on one thread and
+            # parsed on another
+            self.reader = LineReader(self.ser, self.parse, recorder=self.recorder)
+            if listen: self.reader.start()
 
         self.ready = True
 
-        self.track()
-        self.stop_track()
-
 
     @property
     def current_time(self):
@@ -255,58 +295,70 @@ class Drive():
         """
         return Time( datetime.datetime.now(), location = self.location)
              
-    def _openconnection(self, device, baud):
-        from serial import SerialException
-        import serial
-        try:
-            self.ser = serial.Serial(device, baud, timeout=self.timeout)
-            logging.info("Drive connected on {} at {} baud".format(device, baud))
-        except SerialException:
-            # The arduino might be connected, but it's not at that
-            # device address, so let's have a look around.
-            import serial.tools.list_ports
-            ports = list(serial.tools.list_ports.comports())
-            for p in ports:
-                if "ACM" in p[0]:
-                    device = p[0]
-                    break
-            self._openconnection(device, baud)
+    def _connection_changed(self, link, connected):
+        """
+        Pause the writer while the controller is disconnected, and when
+        it comes back set its clock and calibration again before
+        anything else is sent.
+        """
+        if not connected:
+            self.writer.pause()
+            return
+        commands = []
+        if link.reconnects:
+            try:
+                commands = [command for command in (self._clock_command(), self._calibration_command(getattr(self, 'calibration', None))) if command]
+            except Exception as e:
+                logging.error("Couldn't set the controller up again after reconnecting: {}".format(e))
+        # The writer is always resumed, so that stops still get through
+        self.writer.resume(commands)
 
     def _command(self, string):
         """
         Passes commands to the controller.
         """
+        self.send(string)
+        return 1
+
+    def send(self, string):
+        """
+        Queue a command to be sent to the controller, without waiting 
+        for it to be sent.
 
+        Parameters
+        ----------
+        string : str
+           The command.
+
+        Returns
+        -------
+        CommandFuture
+           The outcome of the command, which can be waited on for the
+           controller's reply. A motion command may be replaced by a later
+           one before it's sent, in which case it's cancelled.
+        """
         # Check that the command string is a string, and that it
         # matches the format required for a command string
         string = str(string)
-        string = string+"\n"
 
-        if not self.com_format.match(string):
+        if not self.com_format.match(string+"\n"):
             logging.error("Invalid command rejected: {}".format(string))
             raise ValueError(string+" : This string doesn't have the format of a valid controller command.'")
 
-        
+        if self.recorder:
+            self.recorder.command(string)
+
         if self.sim:
             print("In simulation mode, command ignored.")
-            return 1
+            future = CommandFuture(string)
+            future.written.set()
+            future._resolve()
+            return future
         else:
-            # Pass the command to the Arduino via pyserial
+            # Pass the command to the Arduino via the writer thread
             logging.debug("Command: {}".format(string))
-            self.ser.write(string.encode('ascii'))
-            return 1
+            return self.writer.submit(string)
         
-    def _listener(self):
-        while True:
-            try:
-                line = self.ser.readline()
-                self.parse(line)
-            except Exception as e:
-                print str(e)
-                logging.error("Parser error, continuing. \n {}".format(line))
-        time.sleep(0.5)
-        return
-
     def _stat_update(self, az, alt):
         """
         Update the internal record of the telescope's position.
@@ -342,130 +394,120 @@ class Drive():
         if az > 360 : az = az % 360
         if alt > 90 : alt = alt % 90
 
-        self.az, self.alt = az, alt
+        slewing, tracking = self.slewing, self.tracking
+        # Only the listener updates the position, so the new snapshot can
+        # be built from the old one and published by assignment alone.
+        self.position = Snapshot(az, alt, time.time(), self.position.sequence + 1, slewing, tracking)
+        self.history.append(az, alt, slewing*telemetry.SLEWING | tracking*telemetry.TRACKING)
+
+    @property
+    def az(self):
+        """The latest azimuth of the telescope, in degrees."""
+        return self.position.az
+
+    @property
+    def alt(self):
+        """The latest altitude of the telescope, in degrees."""
+        return self.position.alt
             
     def parse(self, string):
-        #print string
-        # Ignore empty lines
-        if len(string)<1: return 0
-        logging.debug(string)
-        # A specific output from a function
-        if string[0]==">":
-            #print string
-            if string[1]=="S": # This is a status string of keyval pairs
-                # This currently seems to be broken, so pass
-                pass
-                # print("string", string[2:])
-                d = string[2:].split()
-                out = {}
-                for field in d:
-                    key, val = field.split("=")
-                    out[key] = val
-                #print("d", out)
-                try:
-                    #print "Status string"
-                    az, alt = out['Taz'], out['Talt']
-                except KeyError:
-                    logging.error('Key missing from the status output {}'.format(out))
-                return out
-            if string[1:3] == "g E":
-                # Telescope has reached an endstop and will need to be homed before continuing.
-                logging.info("The telescope appears to have hit an end-stop.")
-                #self.home()
-                #logging.info("Rehoming the telescope.")
-                #self._command(self.vocabulary["QUEUE"])
-                #logging.info("After re-homing the telescope will attempt to move to the requested location again.")
-                #self.goto(self.target)
-            if string[1:4] == "g A":
-                # This is the flag confirming that the telescope has reached the destination.
-                self.slewing = False
-                logging.info("The telescope has reached {}".format(string[3:]))
-            if string[1]=='c':
-                # This is the return from a calibration run
-                logging.info("Calibration completed. New values are {}".format(string[2:]))
-                self.calibrating=False
-                self.config.set('offsets','calibration',string[2:])
-                self.calibration = string[2:]
-                #print string
-            else:
-                logging.info(string[1:])
-
-        # A status string
-        elif string[0]=="s" and len(string)>1:
-            # Status strings are comma separated
-            d = string[2:].strip('\n').split(",")
-            if len(d) > 3: return
-            try:
-                #try:
-                az, alt = self._parse_floats(d[1]), self._parse_floats(d[2])
-                #az = np.pi - az
-                
-                self._stat_update( self._r2d(az), self._r2d(alt) )
-            except:
-                logging.error(d)
-                logging.info("{} az, {} alt".format(az, alt))
-                if len(d)<3: return
-                az, alt = self._parse_floats(d[1]), self._parse_floats(d[2])
-                #print az, type(az)
-                #print alt, self._r2d(az), az
-                self._stat_update( self._r2d(az), self._r2d(alt) )
-                #    print self._parse_floats(d[1]), self._parse_floats(d[2])
-
-                pass
-            #except IndexError:
-                # Sometimes (early on?) the drive appears to produce
-                # an incomplete status string. These need to be
-                # ignored otherwise the parser crashes the listener
-                # process.
-            #    pass
-            return d
-        elif string[0]=="a":            
-            if string[1]=="z" or string[1]=="l":
-                # This is an azimuth or an altitude click, update the position
-                d = string.split(",")
-                #print string, d
-                #print d
-                self._stat_update(self._r2d(self._parse_floats(d[3])), self._r2d(self._parse_floats(d[4])))
-        elif string[0]=="!":
-            # This is an error string
-            logging.error(string[1:])
-            print "Error: {}".format(string[1:])
-        elif string[0]=="#":
-            logging.info(string[1:])
-            pass
-            #print string
-        #     # This is a comment string
-        #     if string[1:18] == "FollowingSchedule":
-        #         # This is a scheduler comment
-        #         d = string.split()
-        #         if not d[1][0] == "o":
-        #             pass
-
-        #    pass
-        else: pass
-        
+        """
+        Parse a line from the controller, and act on it.
+
+        Parameters
+        ----------
+        string : str
+           The line, as read from the serial connection.
+
+        Returns
+        -------
+        record or None
+           The decoded line; see `acreroad_1420.protocol`.
+        """
+        record = protocol.decode(string)
+        if record is not None:
+            self._handlers[type(record)](self, record)
+            if self.writer:
+                self.writer.acknowledge(record)
+        return record
+
+    def _on_status(self, record):
+        self._stat_update(self._r2d(record.az), self._r2d(record.alt))
+
+    def _on_status_report(self, record):
+        if 'Taz' not in record.fields or 'Talt' not in record.fields:
+            logging.error('Key missing from the status output {}'.format(record.fields))
+
+    def _on_arrived(self, record):
+        # This is the flag confirming that the telescope has reached the destination.
+        self.slewing = False
+        self._slew_complete()
+        if self._slew: self._slew._finish()
+        logging.info("The telescope has reached {}".format(record.text))
+
+    def _on_endstop(self, record):
+        # Telescope has reached an endstop and will need to be homed before continuing.
+        self.slewing = False
+        if self._slew: self._slew._finish("The telescope hit an end-stop.")
+        logging.info("The telescope appears to have hit an end-stop.")
+
+    def _on_calibration(self, record):
+        # This is the return from a calibration run
+        logging.info("Calibration completed. New values are {}".format(record.values))
+        self.calibrating=False
+        self.config.set('offsets','calibration',record.values)
+        self.calibration = record.values
+
+    def _on_reply(self, record):
+        logging.info(record.text)
+
+    def _on_error(self, record):
+        logging.error(record.text)
+        print("Error: {}".format(record.text))
+
+    _handlers = {protocol.Status: _on_status,
+                 protocol.Click: _on_status,
+                 protocol.StatusReport: _on_status_report,
+                 protocol.Arrived: _on_arrived,
+                 protocol.Endstop: _on_endstop,
+                 protocol.Calibration: _on_calibration,
+                 protocol.Reply: _on_reply,
+                 protocol.Error: _on_error,
+                 protocol.Comment: _on_reply}
+
+    @property
+    def slew(self):
+        """
+        The slew which is under way, or the last one.
+        """
+        return self._slew
+
+    def _begin_slew(self, target):
+        # A new slew takes over from any which is still under way
+        if self._slew: self._slew._finish("The slew was superseded by another.")
+        self._slew = Slew(target)
+        if self.sim: self._slew._finish()
+        return self._slew
 
     def slewSuccess(self):
         """
-        Checks if the slew has completed. This /should/ now be 
-        entirely handled by qp, and all we need to do is to 
-        check that the slewing flag is false.
+        Checks if the slew has completed. This is entirely handled by
+        qp, which reports when the telescope arrives.
         """
-        if type(self.targetPos) is tuple:
-            (cx, cy) = self.targetPos
-            #if cx > 90.0: cx -= (cx - 90) 
-            self.targetPos = SkyCoord(AltAz(cx*u.deg,cy*u.deg,obstime=self.current_time,location=self.location))
-            
-        cx,cy = self.status()['az'], self.status()['alt']
-        print cx, cy
-        self.realPos = SkyCoord(AltAz(az=cx*u.deg,alt=cy*u.deg,obstime=self.current_time,location=self.location))
-        d = 0.5 * u.degree
+        if self._slew:
+            return self._slew.arrived
+        return not self.slewing
+
+    def _slew_complete(self):
+        """
+        Use the duration of the slew which has just finished to refine
+        the slew-time model.
+        """
+        if not self._slew_record: return
+        started, az0, alt0, az1, alt1 = self._slew_record
+        self._slew_record = None
+        self.slew_model.observe(az0, alt0, az1, alt1, time.time() - started)
 
-        if self.targetPos.separation(self.realPos) < d:
-            return True
-        else:
-            return False
-            
     def _r2d(self, radians):
         """
         Converts radians to degrees.
@@ -498,18 +540,13 @@ class Drive():
         float
            A float which is in the correct format for Python.
         """
-        if string == '0e0':
-            return 0.0
-        parts = string.split('e')
-        if len(parts)==2:
-            return float(parts[0]) * 10**float(parts[1])
-        else:
-            return float(parts[0])
+        return protocol.parse_float(string)
 
     def panic(self):
         """
         Stops the telescope drives.
         """
+        if self._slew: self._slew._finish("The telescope was stopped.")
         return self._command("x")
 
     def set_speed(self, speed):
@@ -609,25 +646,32 @@ class Drive():
         if self.sim:
             return ">c 000 000"
         if values:                      
-            # Check the format of the values string.
-            if self.cal_format.match(values):
-                return self._command(self.vocabulary["CALIBRATE"].format(values[0], values[1]))
+            command = self._calibration_command(values)
+            if command:
+                return self._command(command)
                 #return self._command("c "+values)
         else:
             self.calibrating=True
             return self._command("c")
         pass
 
+    def _calibration_command(self, values):
+        # Check the format of the values string.
+        if values and self.cal_format.match(values):
+            az, alt = [float(value) for value in values.split()]
+            return self.vocabulary["CALIBRATE"].format(az, alt)
+
     def setTime(self):
         """
         Sets the time on the drive controller's clock to the current system time.
 
         """
+        return self._command(self._clock_command())
+
+    def _clock_command(self):
         time = datetime.datetime.utcnow()
 
-        command_str = "T {} {} {} {} {} {:.4f}".format(time.year, time.month, time.day, time.hour, time.minute, time.second)
-
-        return self._command(command_str)
+        return "T {} {} {} {} {} {:.4f}".format(time.year, time.month, time.day, time.hour, time.minute, time.second)
 
     def setLocation(self, location=None, dlat=0, dlon=0, azimuth=None, altitude=None):
         """
@@ -670,12 +714,21 @@ class Drive():
            An astropy SkyCoord object which contains the sky location to slew to.
            This can also be a list of locations which the telescope will slew to sequentially. 
 
+        Returns
+        -------
+        Slew
+           The slew, which can be waited on until the telescope arrives.
+
+        Examples
+        --------
+        >>> connection.goto(SkyCoord(ra=10*u.deg, dec=20*u.deg)).wait(timeout=120)
+        True
         """
 
         if not type(skycoord)==astropy.coordinates.sky_coordinate.SkyCoord:
             raise ValueError("The sky coordinates provided aren't an astropy SkyCoord object!'")
 
-        self.target = skycoord
+        self.target = sky = skycoord
 
         # Stop any ongoing tracking
         self.stop_track()
@@ -684,98 +737,162 @@ class Drive():
         # To do : We need to make sure that this behaves nicely with a
         # list of coordinates as well as single ones.
         
-        time = Time.now()
+        now = Time.now()
 
-        skycoord = skycoord.transform_to(AltAz(obstime=time, location=self.location))
+        if skycoord.isscalar:
+            az, alt = self.cache.altaz(skycoord, now.unix, self.location)
+            skycoord = SkyCoord(AltAz(az=az*u.deg, alt=alt*u.deg, obstime=now, location=self.location))
+        else:
+            skycoord = skycoord.transform_to(AltAz(obstime=now, location=self.location))
 
         logging.info("Going to {0.az} {0.alt}".format(skycoord))
 
         self.target = skycoord
         self.status()
+        # Keep a record of the slew so that it can be timed
+        self._slew_record = (time.time(), self.az, self.alt, skycoord.az.value, skycoord.alt.value)
         # construct a command string
         #self._command(self.vocabulary["QUEUE"])
         command_str = "gh {0.az.radian:.2f} {0.alt.radian:.2f}".format(skycoord)
+        slew = self._begin_slew(skycoord)
         # pass the slew-to command to the controller
-        if self._command(command_str):
+        command = self.send(command_str)
+        command.add_done_callback(slew._command_done)
 
-            print "Command received."
-            self.slewing = True
-        else:
-            self.slewing = True
-            raise ControllerException("The telescope has failed to slew to the requested location")
+        print("Command received.")
+        # In simulation mode there's no controller to report the
+        # end of the slew, so it's treated as instantaneous.
+        self.slewing = not self.sim
 
         if track:
-            self.track()
+            self.track(target=sky)
+        return slew
         
-    def track(self, interval = 60):
+    def track(self, interval=None, target=None, mode=None):
         """Make the drive track an object.
 
+        Parameters
+        ----------
+        interval : float
+           The time, in seconds, between corrections. Defaults to the
+           cadence in the configuration.
+        target : SkyCoord
+           The object to track. Defaults to the target of the last slew.
+        mode : {"nudge", "rate"}
+           Whether to keep the telescope on the object only by nudging
+           it, or to also drive the azimuth axis continuously at the
+           object's rate (see `tracking.RateTracker`). Defaults to the
+           mode in the configuration.
+
         Notes
         -----
 
         At the moment qp can't handle tracking correctly, and so this
         is implemented in this module in a slightly less graceful
-        manner. The position of the drive is checked at regular
-        intervals, and is corrected to keep an object within the beam
-        of the telescope, by simply driving forwards.
+        manner. The object's path across the sky for the next few
+        minutes is worked out in one go, and the position of the
+        drive is checked against it at regular intervals, and nudged
+        back onto it to keep the object within the beam of the
+        telescope. If the drive has strayed too far it's sent on a
+        new slew instead.
 
         This allows a little more flexibility than keeping the drive
         running continuously at slow speed, as we can track faster
-        moving objects, e.g. the sun, this way. However, tracking a
-        very fast-moving object is probably impractical (e.g. a
-        satellite), and would require something more robust.
+        moving objects, e.g. the sun, this way. Very fast-moving
+        objects, such as satellites, are tracked with
+        `track_satellite()` instead.
         """
-        
-        #if tracking:
-        #     self.tracking = True
-        #     command_str = "q"
-        #     self._command(command_str)
-        #     command_str = "ts"
-        #     self._command(command_str)
-        # else: 
-        #     self.tracking=False
-        #     command_str = "q"
-        #     self._command(command_str)
-        #     command_str = "ts 0.0"
-        #     self._command(command_str)
+        self.stop_track()
+        target = target if target is not None else self.target
+        if not isinstance(target, SkyCoord):
+            raise ValueError("There's no target to track.")
 
         # Set the tracking flag
         self.tracking = True
 
-        # Set-up the threaded tracking process as a timer
+        # The tracker corrects the drive on a thread of its own
+        settings = dict(cadence=interval or float(config.get('tracking', 'cadence')),
+                        horizon=float(config.get('tracking', 'horizon')),
+                        tolerance=float(config.get('tracking', 'tolerance')))
+        mode = mode or config.get('tracking', 'mode')
+        if mode == "rate":
+            self.tracker = RateTracker(self, target, threshold=float(config.get('tracking', 'rate_threshold')), **settings)
+        elif mode == "nudge":
+            self.tracker = Tracker(self, target, **settings)
+        else:
+            raise ValueError("Unknown tracking mode {}".format(mode))
+        self.tracker.start()
 
-        self.tracking_thread = threading.Timer(self._tracking, interval)
-        self.tracking_thread.start()
+    def track_satellite(self, tle, lead=None, start=None):
+        """
+        Track a satellite through its next pass, or the rest of the
+        present one.
 
-    def stop_track(self):
+        Parameters
+        ----------
+        tle : str or list of str
+           The satellite's name and two-line elements.
+        lead : float
+           How far ahead, in seconds, of the satellite the telescope is
+           sent, to allow for the time taken to send each command and to
+           move. Defaults to the lead in the configuration.
+        start : float
+           The time to look for a pass from, in seconds since 1970.
+           Defaults to now.
+
+        Returns
+        -------
+        SatelliteTracker
+           The tracker, which gives the times of the pass and how well
+           the satellite was followed.
+
+        Raises
+        ------
+        satellite.PassError
+           If the satellite never rises or never sets, as for a
+           geostationary satellite.
         """
-        Stop on-going tracking.
+        from .satellite import SatelliteTracker
+        self.stop_track()
+        if lead is None:
+            lead = float(config.get('tracking', 'lead'))
+        self.tracker = SatelliteTracker(self, tle, lead=lead, start=start)
+        self.tracking = True
+        self.tracker.start()
+        return self.tracker
+
+    def close(self):
         """
-        
-        self.tracking_thread.cancel()
-        self.tracking = False
-            
-    def _tracking(self):
-        self.tracking_thread.start()
+        Shut the drive down: stop tracking, stop the threads which talk
+        to the controller, close the serial link, and close the capture
+        file, if there is one. The telescope is left where it is.
+        """
+        self.stop_track()
+        if self.reader:
+            self.reader.stop()
+        if self.writer:
+            self.writer.stop()
+        if not self.sim:
+            self.ser.stop()
+        if self.recorder:
+            self.recorder.close()
 
     def stop_track(self):
         """
         Stop on-going tracking.
         """
-        
-        self.tracking_thread.cancel()
+        if self.tracker:
+            self.tracker.stop()
+            self.tracker = None
         self.tracking = False
-    
-    def _tracking(self):
-        """This is the function which actually carries out the heavy lifting
-        required for the telescope tracking to work. It's not all that
-        sophisticated.
-        """
 
-        # Do not track if the telescope is still slewing
-        if not self.slewing:
-            self.goto(self.target)
-        
+    def _slew_to(self, az, alt):
+        """
+        Slew to a horizontal position, in degrees, without stopping any
+        tracking; this is how the tracker gets back onto its target.
+        """
+        self.slewing = not self.sim
+        return self.send(self.vocabulary["GOTO_HOR"].format(np.radians(az), np.radians(alt)))
 
     def home(self):
         """
@@ -785,10 +902,11 @@ class Drive():
         """
         self.homing = True
         command_str = "gH"
-        self._command(command_str)
         home_pos = SkyCoord(AltAz(alt=self.el_home*u.deg,
                                   az=self.az_home*u.deg,obstime=self.current_time,location=self.location))
+        self._begin_slew(home_pos)
         self.target = home_pos
+        return self._command(command_str)
 
     def stow(self):
         """
@@ -797,11 +915,13 @@ class Drive():
         zenith = self._d2r(89)
         command_str = "gh 1.6 1.5"#+str(zenith)
         self.target = (0.0, 90.0)
+        self._begin_slew(self.target)
         return self._command(self.vocabulary["STOW"])
         
 
     def skycoord(self):
-        cx,cy = self.status()['az'], self.status()['alt']
+        position = self.position
+        cx,cy = position.az, position.alt
         realPos = SkyCoord(AltAz(az=cx*u.deg, alt=cy*u.deg,
                                  obstime=self.current_time,
                                  location=self.location))
@@ -816,10 +936,18 @@ class Drive():
         """
         Returns a dictionary describing the status of the telescope (e.g. its location).
 
+        The position is converted to equatorial and Galactic coordinates
+        with `coordinates`, rather than astropy, through the drive's
+        transform `cache`, so this is cheap enough to call every time the
+        GUI is redrawn; `skycoord()` gives the position as an astropy
+        coordinate.
+
         Returns
         -------
         dict
-           A dictionary containing the right ascension, declination, altitude, and azimuth of the telescope.
+           A dictionary containing the right ascension, declination,
+           Galactic longitude and latitude, altitude, and azimuth of the
+           telescope, in degrees.
 
         Examples
         --------
@@ -828,14 +956,121 @@ class Drive():
         >>> from astropy.coordinates import ICRS, 
         >>> c = SkyCoord(frame="galactic", l="1h12m43.2s", b="+1d12m43s")
         >>> self.connection.goto(c)
-        >>> ra = self.connection.status()['ra'].value
+        >>> ra = self.connection.status()['ra']
         
         """
-        command_str = "S"
-        #self._command(command_str)
-        #time.sleep(0.1)
-        return {'ra':self.ra, 'dec': self.dec, 'alt':self.alt, 'az':self.az}
+        position = self.position
+        now = time.time()
+        ra, dec = self.cache.convert('altaz', position.az, position.alt, 'icrs', now, self._site)
+        l, b = self.cache.convert('altaz', position.az, position.alt, 'galactic', now, self._site)
+        return {'ra': ra, 'dec': dec, 'l': l, 'b': b, 'alt': position.alt, 'az': position.az}
+
+
+class Snapshot(object):
+    """
+    The position of the telescope at one moment.
+
+    A snapshot is never changed once it's made; when the controller
+    reports a new position the drive makes a new snapshot and swaps it
+    in, so a reader which takes `Drive.position` once sees the azimuth,
+    altitude and flags from a single update, without taking a lock.
+
+    Attributes
+    ----------
+    az, alt : float
+       The position, in degrees.
+    time : float
+       When the position was reported, in seconds since 1970.
+    sequence : int
+       The number of updates before this one.
+    slewing, tracking : bool
+       Whether the telescope was slewing or tracking at the time.
+    """
+    __slots__ = ('az', 'alt', 'time', 'sequence', 'slewing', 'tracking')
+
+    def __init__(self, az, alt, time, sequence=0, slewing=False, tracking=False):
+        for name, value in zip(self.__slots__, (az, alt, time, sequence, slewing, tracking)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshots can't be changed")
+
+    def __repr__(self):
+        return "<Snapshot {0.sequence}: az={0.az:.2f} alt={0.alt:.2f}>".format(self)
 
 
 class ControllerException(Exception):
     pass
+
+
+class Slew():
+    """
+    A slew of the telescope, which finishes when the controller reports
+    that the telescope has arrived, or that it couldn't get there.
+
+    Parameters
+    ----------
+    target : SkyCoord
+       The position the telescope is slewing to.
+    """
+    def __init__(self, target):
+        self.target = target
+        self.arrived = False
+        self.reason = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the telescope to arrive.
+
+        Parameters
+        ----------
+        timeout : float
+           The longest time to wait, in seconds. By default there's no limit.
+
+        Returns
+        -------
+        bool
+           True if the telescope has arrived, False if it's still slewing
+           after the timeout.
+
+        Raises
+        ------
+        ControllerException
+           If the slew failed, for example because the telescope hit an
+           end-stop, or was sent somewhere else.
+        """
+        self._done.wait(timeout)
+        if self.reason:
+            raise ControllerException(self.reason)
+        return self.arrived
+
+    def add_done_callback(self, function):
+        """
+        Call a function, with the slew as its argument, once the slew
+        has finished, or straight away if it already has.
+        """
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(function)
+                return
+        function(self)
+
+    def _command_done(self, command):
+        # The slew command was rejected by the controller, or never sent
+        if command.exception():
+            self._finish("The slew command failed: {}".format(command.exception()))
+
+    def _finish(self, reason=None):
+        with self._lock:
+            if self.done(): return
+            self.arrived, self.reason = reason is None, reason
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for function in callbacks:
+            function(self)
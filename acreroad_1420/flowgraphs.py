@@ -0,0 +1,210 @@
+"""
+acreroad_1420 Flowgraph cache
+
+GNU Radio flowgraphs have to be compiled to python before they can be
+run. Rather than compiling a flowgraph every time a job runs it, the
+scheduler compiles it once, when the first job which uses it is queued,
+and keeps the generated python in a cache, keyed by a hash of the
+flowgraph file and the version of GNU Radio which compiled it. A job
+which starts before its flowgraph is ready compiles and runs it the
+old way, so the scheduler never waits on a compile.
+"""
+
+import glob
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def gnuradio_version():
+    """
+    The version of GNU Radio which is installed, or "unknown".
+    """
+    try:
+        return subprocess.check_output(["gnuradio-config-info", "--version"]).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class FlowgraphCache():
+    """
+    A cache of compiled GNU Radio flowgraphs.
+
+    Parameters
+    ----------
+    directory : str
+       The directory the compiled flowgraphs are kept in.
+    grcc : str
+       The GNU Radio compiler.
+
+    Examples
+    --------
+    >>> cache = flowgraphs.FlowgraphCache("/home/astro/flowgraphs")
+    >>> cache.prepare("/home/astro/srt2016/observing.grc")
+    >>> cache.wait("/home/astro/srt2016/observing.grc")
+    True
+    >>> cache.command(["grcc", "-e", "/home/astro/srt2016/observing.grc"])
+    ['/usr/bin/python', '/home/astro/flowgraphs/5d41.../top_block.py']
+    """
+    def __init__(self, directory, grcc="grcc"):
+        self.directory = directory
+        self.grcc = grcc
+        self.hits = 0
+        self.misses = 0
+        self.compile_time = 0.0
+        self.saved = 0.0
+        self._version = None
+        self._digests = {}
+        self._compiling = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        if self._version is None:
+            self._version = gnuradio_version()
+        return self._version
+
+    def key(self, path):
+        """
+        The cache key for a flowgraph file. The file is only hashed again
+        if its size or modification time have changed.
+        """
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime)
+        cached = self._digests.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256(self.version.encode())
+        with open(path, 'rb') as flowgraph:
+            digest.update(flowgraph.read())
+        key = digest.hexdigest()
+        self._digests[path] = (signature, key)
+        return key
+
+    def prepare(self, path):
+        """
+        Start compiling a flowgraph in the background, unless it's
+        already compiled or being compiled.
+        """
+        key = self.key(path)
+        with self._lock:
+            if key in self._compiling or self._compiled(key):
+                return
+            self._compiling[key] = threading.Event()
+        thread = threading.Thread(target=self._compile, args=(path, key))
+        thread.daemon = True
+        thread.start()
+
+    def wait(self, path, timeout=None):
+        """
+        Wait for a flowgraph which is being compiled to be ready.
+
+        Returns
+        -------
+        bool
+           Whether the flowgraph has been compiled.
+        """
+        key = self.key(path)
+        with self._lock:
+            compiling = self._compiling.get(key)
+        if compiling:
+            compiling.wait(timeout)
+        return self._compiled(key) is not None
+
+    def _compiled(self, key):
+        """
+        The path of the compiled flowgraph's top block, as recorded when
+        it was compiled, or None if it hasn't been.
+        """
+        try:
+            with open(os.path.join(self.directory, key, "top_block")) as record:
+                name = record.read().strip()
+        except IOError:
+            return None
+        return os.path.join(self.directory, key, name)
+
+    def _compile(self, path, key):
+        """
+        Compile a flowgraph into a scratch directory, and move it into
+        the cache once it's complete, so that a half-compiled flowgraph
+        is never used.
+        """
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            scratch = tempfile.mkdtemp(dir=self.directory)
+            tick = time.time()
+            try:
+                subprocess.check_call([self.grcc, "-d", scratch, path])
+                elapsed = time.time() - tick
+                # grcc names the top block after the flowgraph's id, which
+                # would mean parsing the flowgraph to find it
+                generated = glob.glob(os.path.join(scratch, "*.py"))
+                if len(generated) != 1:
+                    raise OSError("grcc generated {} python files, rather than one top block".format(len(generated)))
+                with open(os.path.join(scratch, "top_block"), "w") as record:
+                    record.write(os.path.basename(generated[0]))
+                with open(os.path.join(scratch, "compile_time"), "w") as record:
+                    record.write(repr(elapsed))
+                target = os.path.join(self.directory, key)
+                # Clear out anything left by a compile which was interrupted
+                shutil.rmtree(target, ignore_errors=True)
+                os.rename(scratch, target)
+                self.compile_time += elapsed
+            except (OSError, subprocess.CalledProcessError) as e:
+                logging.error("Failed to compile the flowgraph {}: {}".format(path, e))
+                shutil.rmtree(scratch, ignore_errors=True)
+        finally:
+            with self._lock:
+                self._compiling.pop(key).set()
+
+    def command(self, command):
+        """
+        Swap a command which compiles and runs a flowgraph for one which
+        runs the compiled flowgraph from the cache. This never waits for
+        a compile: if the flowgraph isn't ready, or can't be compiled,
+        the command is returned as it is, and the flowgraph is compiled
+        in the background for next time. Any other command is returned
+        as it is too.
+        """
+        if not (isinstance(command, list) and command[:2] == [self.grcc, "-e"]):
+            return command
+        path = command[2]
+        try:
+            key = self.key(path)
+        except OSError:
+            return command
+        compiled = self._compiled(key)
+        if not compiled:
+            self.misses += 1
+            self.prepare(path)
+            return command
+        self.hits += 1
+        self.saved += self._compile_time(key)
+        return [sys.executable, compiled]
+
+    def _compile_time(self, key):
+        try:
+            with open(os.path.join(self.directory, key, "compile_time")) as record:
+                return float(record.read())
+        except (IOError, ValueError):
+            return 0.0
+
+    def stats(self):
+        """
+        Summarise how well the cache is working.
+
+        Returns
+        -------
+        dict
+           The number of `hits` and `misses`, the total `compile_time`,
+           and the compile time `saved` by the hits, in seconds.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'compile_time': self.compile_time, 'saved': self.saved}
@@ -0,0 +1,342 @@
+"""
+acreroad_1420 Schedule journal
+
+A crash-safe, append-only record of the jobs which have been added to
+the scheduler, and of what has happened to them, so that the schedule
+can be rebuilt if the scheduler is restarted.
+
+The journal is an SQLite database in write-ahead-log mode. Writes are
+handed to a background thread, so that recording a job doesn't slow
+down adding it to the schedule.
+"""
+
+import errno
+import importlib
+import logging
+import os
+import pickle
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from astropy.coordinates import SkyCoord
+from astropy.time import Time
+import astropy.units as u
+
+
+# The frames whose positions can be stored as a pair of angles; anything
+# else is pickled.
+SIMPLE_FRAMES = ('icrs', 'galactic', 'altaz')
+
+class Journal():
+    """
+    An append-only journal of scheduled jobs and their state changes.
+
+    Parameters
+    ----------
+    path : str
+       The path to the journal database, which is created if it doesn't
+       already exist.
+
+    Examples
+    --------
+    >>> jobs = schedule.Scheduler(drive=connection, journal="~/.acreroad_1420.journal")
+    """
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        connection = self._connect()
+        connection.execute("CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, record BLOB)")
+        connection.execute("CREATE TABLE IF NOT EXISTS events (seq INTEGER PRIMARY KEY AUTOINCREMENT, job INTEGER, state TEXT, pid INTEGER, time REAL, started TEXT)")
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(events)")]
+        if 'started' not in columns:
+            # A journal from before the start times of processes were kept
+            connection.execute("ALTER TABLE events ADD COLUMN started TEXT")
+        connection.commit()
+        connection.close()
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write)
+        self._writer.daemon = True
+        self._writer.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _write(self):
+        """
+        Write queued records to the database, committing each batch of
+        records which have built up while the last batch was written.
+        """
+        connection = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # None is put on the queue by close()
+            closing = None in batch
+            try:
+                for sql, args in batch[:batch.index(None)] if closing else batch:
+                    connection.execute(sql, args)
+                connection.commit()
+            except Exception as e:
+                logging.error("Failed to write to the schedule journal: {}".format(e))
+            for _ in batch:
+                self._queue.task_done()
+            if closing:
+                connection.close()
+                return
+
+    def add(self, job):
+        """
+        Record a job which has been added to the schedule.
+        """
+        # The record is encoded here, rather than by the writer thread,
+        # since the scheduler goes on to fill in parts of the job.
+        record = sqlite3.Binary(pickle.dumps(encode_job(job), 2))
+        self._queue.put(("INSERT OR REPLACE INTO jobs (id, record) VALUES (?, ?)", (job['id'], record)))
+        self.state(job['id'], 'queued')
+
+    def state(self, idn, state, pid=None):
+        """
+        Record a change in the state of a job.
+
+        Parameters
+        ----------
+        idn : int
+           The job number.
+        state : {'queued', 'slewing', 'running', 'ended'}
+           The new state of the job.
+        pid : int
+           The process id of the job's observation script, if it's running.
+           Its start time is recorded with it, so that a later process 
+           which is given the same id isn't mistaken for it.
+        """
+        started = process_started(pid) if pid else None
+        self._queue.put(("INSERT INTO events (job, state, pid, time, started) VALUES (?, ?, ?, ?, ?)",
+                         (idn, state, pid, time.time(), started)))
+
+    def compact(self):
+        """
+        Remove the jobs which have ended from the journal.
+        """
+        ended = "SELECT job FROM events WHERE state = 'ended'"
+        self._queue.put(("DELETE FROM jobs WHERE id IN ({})".format(ended), ()))
+        self._queue.put(("DELETE FROM events WHERE job IN ({})".format(ended), ()))
+
+    def flush(self):
+        """
+        Wait until everything which has been recorded is written to disk.
+        """
+        self._queue.join()
+
+    def close(self, timeout=None):
+        """
+        Write out everything which has been recorded, and stop the writer
+        thread. Nothing recorded after this is written.
+        """
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout)
+
+    def replay(self, location=None):
+        """
+        Read back the jobs in the journal.
+
+        Parameters
+        ----------
+        location : astropy.coordinates.EarthLocation
+           The location of the telescope, which is needed to rebuild
+           positions given in horizontal coordinates.
+
+        Returns
+        -------
+        list
+           A (job, state, pid, started) tuple for each job, giving its 
+           last recorded state, and the id and start time of its process.
+        """
+        connection = self._connect()
+        states = {}
+        for idn, state, pid, started in connection.execute("SELECT job, state, pid, started FROM events ORDER BY seq"):
+            states[idn] = (state, pid, started)
+        jobs = []
+        for idn, record in connection.execute("SELECT id, record FROM jobs ORDER BY id"):
+            state, pid, started = states.get(idn, ('queued', None, None))
+            jobs.append((decode_job(pickle.loads(bytes(record)), location), state, pid, started))
+        connection.close()
+        return jobs
+
+
+class JournalJob(dict):
+    """
+    A job which has been read back from the journal. Its position is
+    only turned back into a SkyCoord when it's first needed, which keeps
+    replaying the journal quick.
+    """
+    def __missing__(self, key):
+        if key == 'position' and 'position_spec' in self:
+            self['position'] = decode_position(self['position_spec'], self.get('location'))
+            return self['position']
+        raise KeyError(key)
+
+def encode_position(position):
+    """
+    Encode a position compactly, as its frame and a pair of angles,
+    falling back to a pickle for frames which need more than that.
+    """
+    if position is None:
+        return None
+    if position.frame.name in SIMPLE_FRAMES:
+        obstime = getattr(position, 'obstime', None)
+        spherical = position.spherical
+        return (position.frame.name, float(spherical.lon.deg), float(spherical.lat.deg),
+                obstime.isot if obstime is not None else None)
+    return ('pickle', pickle.dumps(position, 2))
+
+def decode_position(spec, location=None):
+    if spec is None:
+        return None
+    if spec[0] == 'pickle':
+        return pickle.loads(spec[1])
+    frame, lon, lat, obstime = spec
+    kwargs = {}
+    if obstime:
+        kwargs['obstime'] = Time(obstime, format='isot')
+    if frame == 'altaz':
+        kwargs['location'] = location
+    return SkyCoord(lon, lat, unit=(u.deg, u.deg), frame=frame, **kwargs)
+
+def encode_callable(function):
+    """
+    Encode a `then` callable by name. Bound methods are stored by their
+    name alone, and are re-bound to the drive when the journal is read.
+    """
+    if getattr(function, '__self__', None) is not None:
+        return ('method', function.__name__)
+    return ('function', function.__module__, function.__name__)
+
+def check_callable(function, drive=None):
+    """
+    Check that a `then` callable can be encoded, and found again when
+    the journal is read, raising a ValueError if it can't.
+
+    Only methods of the drive, and functions which can be imported by
+    name from a module other than `__main__`, can be journaled; lambdas,
+    closures and methods of other objects can't.
+    """
+    owner = getattr(function, '__self__', None)
+    if owner is not None:
+        if owner is not drive:
+            raise ValueError("{!r} is a method of something other than the drive, so it can't be journaled.".format(function))
+        return
+    module, name = getattr(function, '__module__', None), getattr(function, '__name__', None)
+    if not module or module == '__main__':
+        raise ValueError("{!r} can't be imported by name, so it can't be journaled.".format(function))
+    if getattr(sys.modules.get(module), name, None) is not function:
+        raise ValueError("{!r} isn't a module-level function, so it can't be journaled.".format(function))
+
+def encode_job(job):
+    record = dict((key, value) for key, value in job.items() if key not in ('position', 'then'))
+    record['position_spec'] = encode_position(job.get('position'))
+    record['then'] = [encode_callable(then) if hasattr(then, '__call__') else then for then in job['then']]
+    return record
+
+def decode_job(record, location=None):
+    job = JournalJob(record)
+    job['location'] = location
+    return job
+
+def resolve_callable(spec, drive=None):
+    """
+    Turn an encoded `then` callable back into a callable.
+    """
+    if spec[0] == 'method':
+        return getattr(drive, spec[1])
+    return getattr(importlib.import_module(spec[1]), spec[2])
+
+def process_started(pid):
+    """
+    When a process started, as a string which is only equal for the same
+    process: the boot id and the start time in clock ticks since boot
+    where /proc is available, and otherwise the start time given by ps.
+
+    Returns
+    -------
+    str or None
+       None if the process isn't running, or its start time can't be found.
+    """
+    try:
+        with open("/proc/{}/stat".format(pid)) as stat:
+            # The command name can contain spaces, so count from the
+            # bracket which ends it; the start time is the 22nd field.
+            fields = stat.read().rsplit(")", 1)[1].split()
+        with open("/proc/sys/kernel/random/boot_id") as boot:
+            return "{}:{}".format(boot.read().strip(), fields[19])
+    except (IOError, OSError, IndexError):
+        pass
+    try:
+        started = subprocess.check_output(["ps", "-o", "lstart=", "-p", str(pid)])
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return started.decode().strip() or None
+
+def process_alive(pid, started):
+    """
+    Check whether a process is still running, and is the one which was
+    recorded as starting at `started`, rather than a later process which
+    has been given the same id. A process whose start time wasn't 
+    recorded is never taken to be running.
+    """
+    if not (pid and started):
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        if e.errno != errno.EPERM:
+            return False
+    return process_started(pid) == started
+
+class Orphan():
+    """
+    A handle on an observation process which was started before the
+    scheduler was restarted, which provides the parts of the Popen
+    interface which the scheduler uses. Signals are only sent if the
+    process is still the one which was recorded.
+    """
+    def __init__(self, pid, started):
+        self.pid = pid
+        self.started = started
+        self.returncode = None
+
+    def poll(self):
+        if process_alive(self.pid, self.started):
+            return None
+        self.returncode = 0
+        return self.returncode
+
+    def _signal(self, signum):
+        if self.poll() is not None:
+            return
+        try:
+            os.kill(self.pid, signum)
+        except OSError:
+            pass
+
+    def terminate(self):
+        self._signal(signal.SIGTERM)
+
+    def kill(self):
+        self._signal(signal.SIGKILL)
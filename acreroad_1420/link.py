@@ -0,0 +1,408 @@
+"""
+acreroad_1420 Serial link
+
+Keeps the connection to the drive controller open. The Arduino can
+drop off the USB bus and come back, possibly under a different device
+name, so the link watches the port for errors, and for the controller
+going quiet, and when either happens it looks for the controller again
+and reopens the port.
+
+Reads and writes go through the link rather than straight to the serial
+port. While the controller is disconnected reads return nothing, after
+waiting for a short time, and writes raise `ConnectionLost`, so the
+threads which use the port are never stuck on a dead device.
+
+For emergencies there is also `DriveLink`, which does nothing but send
+commands, and which can be used without importing astropy or waiting
+for the full drive to start.
+"""
+
+import logging
+import threading
+import time
+
+
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+class ConnectionLost(IOError):
+    """
+    The serial connection to the drive controller has been lost.
+    """
+    pass
+
+
+def devices(device, ports=None):
+    """
+    The devices which the controller might be on, most likely first:
+    the expected `device`, then any "ACM" device. The ports are only
+    listed if the expected device doesn't work out.
+
+    Parameters
+    ----------
+    device : str
+       The device which the controller is expected to be on.
+    ports : callable
+       Lists the serial devices which are present. Defaults to pySerial's
+       `comports`.
+    """
+    yield device
+    try:
+        if ports:
+            ports = ports()
+        else:
+            import serial.tools.list_ports
+            ports = serial.tools.list_ports.comports()
+    except Exception as e:
+        logging.error("Couldn't list the serial ports: {}".format(e))
+        ports = []
+    for port in ports:
+        if "ACM" in port[0] and port[0] != device:
+            yield port[0]
+
+
+class SerialLink():
+    """
+    A serial port which reconnects itself.
+
+    Parameters
+    ----------
+    device : str
+       The device which the controller is expected to be on. If it can't
+       be opened, any "ACM" device is tried instead.
+    baud : int
+       The baud-rate of the connection.
+    timeout : float
+       The timeout for reads from the port, in seconds.
+    silence : float
+       If nothing is read from the controller for this many seconds the
+       connection is assumed to be lost. None disables the check.
+    backoff : float
+       The time to wait, in seconds, after failing to find the
+       controller. This doubles after each failure, up to `max_backoff`.
+    max_backoff : float
+       The longest time to wait between attempts to reconnect.
+    opener : callable
+       Opens a port, given the device, baud-rate and timeout. Defaults
+       to `serial.Serial`.
+    ports : callable
+       Lists the serial devices which are present. Defaults to pySerial's
+       `comports`.
+
+    Examples
+    --------
+    >>> link = SerialLink('/dev/ttyACM0', 19200)
+    >>> link.start()
+    >>> link.connected.wait(5)
+    True
+    >>> link.stats()
+    {'connected': True, 'device': '/dev/ttyACM0', 'reconnects': 0, 'last_outage': None, 'longest_outage': None}
+    """
+    def __init__(self, device, baud, timeout=3, silence=10, backoff=0.25, max_backoff=4,
+                 opener=None, ports=None):
+        self.device = device
+        self.baud = baud
+        self.timeout = timeout
+        self.silence = silence
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.opener = opener
+        self.ports = ports
+        self.port = None
+        self.running = False
+        self.connected = threading.Event()
+        # Counters
+        self.reconnects = 0
+        self.last_outage = None
+        self.longest_outage = None
+        self._last_read = monotonic()
+        self._lost_at = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def add_listener(self, function):
+        """
+        Call a function, with the link and whether it's now connected,
+        whenever the link connects or is lost. It's called from the
+        link's own thread, or from whichever thread noticed the loss.
+        """
+        self._listeners.append(function)
+
+    def remove_listener(self, function):
+        """
+        Stop calling a function which was given to `add_listener`.
+        """
+        if function in self._listeners:
+            self._listeners.remove(function)
+
+    def start(self):
+        """
+        Start the thread which connects to the controller, and watches
+        the connection.
+        """
+        self.running = True
+        self._thread = threading.Thread(target=self._supervise)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        self._lost("the link was stopped")
+
+    def _supervise(self):
+        while self.running:
+            if not self.connected.is_set():
+                self._connect()
+            elif self.silence and monotonic() - self._last_read > self.silence:
+                self._lost("nothing was heard for {} seconds".format(self.silence))
+                continue
+            self._wake.wait(min(self.silence or 1, 1) / 2.)
+            self._wake.clear()
+
+    def _connect(self):
+        """
+        Look for the controller until it's found, waiting longer after
+        each failed attempt.
+        """
+        if not self.opener:
+            import serial
+            self.opener = serial.Serial
+        delay = self.backoff
+        while self.running:
+            for device in devices(self.device, self.ports):
+                try:
+                    port = self.opener(device, self.baud, timeout=self.timeout)
+                except (IOError, OSError, ValueError) as e:
+                    logging.debug("Couldn't open {}: {}".format(device, e))
+                    continue
+                self._connected(port, device)
+                return
+            logging.warning("The drive controller wasn't found, trying again in {} seconds".format(delay))
+            self._wake.wait(delay)
+            self._wake.clear()
+            delay = min(2*delay, self.max_backoff)
+
+    def _connected(self, port, device):
+        with self._lock:
+            self.port, self.device = port, device
+            self._last_read = monotonic()
+            if self._lost_at is not None:
+                self.reconnects += 1
+                self.last_outage = monotonic() - self._lost_at
+                self.longest_outage = max(self.longest_outage or 0, self.last_outage)
+                logging.info("Drive reconnected on {} after {:.1f} seconds".format(device, self.last_outage))
+            else:
+                logging.info("Drive connected on {} at {} baud".format(device, self.baud))
+            self.connected.set()
+        self._notify(True)
+
+    def _lost(self, reason):
+        with self._lock:
+            if not self.connected.is_set():
+                return
+            self.connected.clear()
+            self._lost_at = monotonic()
+            try:
+                self.port.close()
+            except Exception:
+                pass
+        logging.error("Lost the connection to the drive: {}".format(reason))
+        self._wake.set()
+        self._notify(False)
+
+    def _notify(self, connected):
+        for function in list(self._listeners):
+            try:
+                function(self, connected)
+            except Exception as e:
+                logging.error("Connection listener failed: {}".format(e))
+
+    # The parts of the serial port interface which the reader and writer use
+
+    @property
+    def in_waiting(self):
+        if not self.connected.is_set():
+            return 0
+        try:
+            return self.port.in_waiting
+        except (IOError, OSError) as e:
+            self._lost(e)
+            return 0
+
+    def read(self, size=1):
+        """
+        Read from the controller, returning nothing if it's disconnected.
+        """
+        if not self.connected.wait(self.timeout):
+            return b""
+        try:
+            data = self.port.read(size)
+        except (IOError, OSError, TypeError) as e:
+            # pySerial can raise a TypeError if the port is closed under it
+            self._lost(e)
+            return b""
+        if data:
+            self._last_read = monotonic()
+        return data
+
+    def write(self, data):
+        """
+        Write to the controller.
+
+        Raises
+        ------
+        ConnectionLost
+           If the controller is disconnected, or the write fails.
+        """
+        if not self.connected.is_set():
+            raise ConnectionLost("The drive controller is disconnected")
+        try:
+            return self.port.write(data)
+        except (IOError, OSError) as e:
+            self._lost(e)
+            raise ConnectionLost(str(e))
+
+    def fileno(self):
+        """
+        The file descriptor of the port, which changes when the link
+        reconnects.
+
+        Raises
+        ------
+        ConnectionLost
+           If the port hasn't been opened.
+        """
+        port = self.port
+        if port is None:
+            raise ConnectionLost("The drive controller hasn't been connected")
+        return port.fileno()
+
+    def stats(self):
+        """
+        Whether the link is connected, the device, the number of times
+        the link has reconnected, and how long, in seconds, the last
+        and longest outages lasted.
+        """
+        return {'connected': self.connected.is_set(), 'device': self.device,
+                'reconnects': self.reconnects, 'last_outage': self.last_outage,
+                'longest_outage': self.longest_outage}
+
+
+class DriveLink():
+    """
+    The quickest way to get a command to the drive controller.
+
+    This opens the serial port and nothing else: it doesn't read from
+    the controller, start any threads, set the controller up, or import
+    astropy, so a command can be on its way within milliseconds of
+    starting. It's meant for parking the telescope in an emergency; use
+    a `Drive` for anything else.
+
+    Parameters
+    ----------
+    device : str
+       The device which the controller is expected to be on. Defaults to
+       the one in the configuration; if it can't be opened any "ACM"
+       device is tried instead.
+    baud : int
+       The baud-rate of the connection. Defaults to the configured one.
+    timeout : float
+       The timeout for writes to the port, in seconds.
+    settle : float
+       The longest time to wait, in seconds, after opening the port for
+       the controller to send its first line, since the Arduino resets
+       when the port is opened, and anything sent while it's starting is
+       lost. Defaults to the configured boot time; 0 doesn't wait.
+    opener : callable
+       Opens a port, given the device, baud-rate and timeout. Defaults
+       to `serial.Serial`.
+    ports : callable
+       Lists the serial devices which are present.
+
+    Attributes
+    ----------
+    ready : bool
+       Whether the controller was heard from before `settle` ran out.
+
+    Raises
+    ------
+    ConnectionLost
+       If the controller can't be found.
+
+    Examples
+    --------
+    >>> DriveLink().stow()
+    """
+    vocabulary = {"STOP": "x", "STOW": "X", "DRIVE_HOME": "gH"}
+
+    def __init__(self, device=None, baud=None, timeout=1, settle=None, opener=None, ports=None):
+        if not (device and baud) or settle is None:
+            from . import CONFIGURATION as config
+            device = device or config.get('arduino', 'dev')
+            baud = baud or config.get('arduino', 'baud')
+            if settle is None:
+                settle = float(config.get('arduino', 'boot'))
+        if not opener:
+            import serial
+            opener = serial.Serial
+        for candidate in devices(device, ports):
+            try:
+                self.port = opener(candidate, baud, timeout=timeout, write_timeout=timeout)
+            except (IOError, OSError, ValueError) as e:
+                logging.debug("Couldn't open {}: {}".format(candidate, e))
+                continue
+            self.device = candidate
+            break
+        else:
+            raise ConnectionLost("The drive controller wasn't found at {}".format(device))
+        self.ready = self.listen(settle) if settle else False
+
+    def listen(self, timeout):
+        """
+        Wait for the controller to send a line, which it only does once
+        it has started.
+
+        Returns
+        -------
+        bool
+           Whether a line arrived within `timeout` seconds.
+        """
+        deadline = monotonic() + timeout
+        while monotonic() < deadline:
+            try:
+                if b"\n" in self.port.read(1):
+                    return True
+            except (IOError, OSError) as e:
+                logging.debug("Couldn't read from {}: {}".format(self.device, e))
+                return False
+        return False
+
+    def send(self, command):
+        """
+        Send a command, returning once it has been written to the port.
+        """
+        self.port.write((command + "\n").encode('ascii'))
+        self.port.flush()
+
+    def stop(self):
+        """
+        Stop the drives.
+        """
+        self.send(self.vocabulary["STOP"])
+
+    def stow(self):
+        """
+        Slew to the stow position, pointing straight up.
+        """
+        self.send(self.vocabulary["STOW"])
+
+    def home(self):
+        """
+        Slew to the home position.
+        """
+        self.send(self.vocabulary["DRIVE_HOME"])
+
+    def close(self):
+        self.port.close()
@@ -390,7 +390,7 @@ class commandButtons(QtGui.QWidget):
         elif self.trackToggle == TrackToggle.ON:
             self.trackToggle = TrackToggle.OFF
             print("Track Toggle OFF")
-            self.parent().srt.drive.track(tracking=False)
+            self.parent().srt.drive.stop_track()
             self.parent().srt.setStatus(Status.READY)
         self.parent().setFocus()
 
@@ -0,0 +1,58 @@
+"""
+acreroad_1420 Park
+
+Parks the telescope when the weather turns, as quickly as possible.
+This is what the `srt_park` command runs:
+
+    srt_park wind    # stow, pointing straight up
+    srt_park snow    # home, so that the bowl doesn't fill with snow
+    srt_park stop    # just stop the drives
+
+The command goes straight down the serial port through a `DriveLink`,
+without starting the full drive, which takes several seconds.
+"""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import sys
+
+from .link import DriveLink, ConnectionLost
+
+
+# What to do for each reason to park
+ACTIONS = {"wind": "stow", "snow": "home", "stop": "stop"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="srt_park", description="Park the telescope.")
+    parser.add_argument("reason", choices=sorted(ACTIONS),
+                        help="wind stows the telescope, snow sends it home, and stop stops it")
+    parser.add_argument("--device", help="The drive controller's serial device")
+    parser.add_argument("--settle", type=float, default=None,
+                        help="The longest time to wait for the controller to start after opening the port. "
+                             "Waiting costs up to this long if the controller says nothing, "
+                             "but anything sent while the Arduino is restarting is lost; "
+                             "0 sends straight away. Defaults to the configured boot time")
+    args = parser.parse_args(argv)
+
+    try:
+        link = DriveLink(args.device, settle=args.settle)
+    except ConnectionLost as e:
+        print(e, file=sys.stderr)
+        return 1
+    getattr(link, ACTIONS[args.reason])()
+    link.close()
+    if not (link.ready or args.settle == 0):
+        # It might have been starting up, and missed the command
+        print("Sent {} to the drive on {}, but the controller didn't answer, "
+              "so it may not have been received".format(ACTIONS[args.reason], link.device), file=sys.stderr)
+        return 1
+    logging.info("Parked the telescope ({}) because of {}".format(ACTIONS[args.reason], args.reason))
+    print("Sent {} to the drive on {}".format(ACTIONS[args.reason], link.device))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
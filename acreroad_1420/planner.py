@@ -0,0 +1,342 @@
+"""
+acreroad_1420 Observation planner
+
+Works out the order in which to observe a list of targets over a night
+so that as little time as possible is spent slewing between them or
+waiting for them to become observable, and produces a schedule which
+can be handed straight to the scheduler.
+
+Examples
+--------
+>>> from acreroad_1420 import drive, schedule, planner
+>>> connection = drive.Drive('/dev/ttyACM0', 9600, simulate=0)
+>>> jobs = schedule.Scheduler(drive=connection)
+>>> night = planner.Planner(drive=connection)
+>>> plan = night.plan(positions, dwell=600, start=dusk, end=dawn)
+>>> night.to_schedule(jobs, plan, script='/home/astro/srt2016/observing.py')
+"""
+
+from . import CONFIGURATION as config
+import datetime
+import random
+import time
+
+import numpy as np
+from astropy.coordinates import SkyCoord, EarthLocation, ICRS, CIRS
+from astropy.time import Time
+import astropy.units as u
+
+from .slew import SlewModel
+
+
+class Planner():
+    """
+    Plans the order of a night's observations.
+
+    The positions of every target are calculated on a grid of times
+    across the night in one vectorised pass, and the cost of a
+    slew between targets at any time on the grid is given by the slew
+    model. An initial order is found greedily, by always moving to the
+    target which can be started soonest, and this is then refined by
+    2-opt moves for as long as the time budget allows.
+
+    Parameters
+    ----------
+    drive : Drive object
+       The telescope drive. Its location, slew model, and current
+       position are used if they aren't given separately.
+    location : astropy.coordinates.EarthLocation
+       The location of the telescope.
+    slew_model : SlewModel
+       The model used to estimate the time taken to slew between targets.
+    step : float
+       The spacing of the time grid, in seconds.
+    min_alt : float
+       The lowest altitude, in degrees, at which a target can be observed.
+    margin : float
+       A number of seconds added to every slew, so that the scheduler's own
+       estimate of the slew time doesn't make the jobs overlap.
+    """
+    def __init__(self, drive=None, location=None, slew_model=None, step=300, min_alt=0.0, margin=10.0):
+        if not location:
+            if drive:
+                location = drive.location
+            else:
+                observatory = config.get('observatory', 'location').split()
+                location = EarthLocation(lat=float(observatory[0])*u.deg, lon=float(observatory[1])*u.deg, height=float(observatory[2])*u.m)
+        if not slew_model:
+            slew_model = drive.slew_model if drive else SlewModel.from_config(config)
+        self.drive = drive
+        self.location = location
+        self.slew_model = slew_model
+        self.step = float(step)
+        self.min_alt = min_alt
+        self.margin = margin
+
+    def plan(self, positions, dwell, start, end, windows=None, names=None, origin=None, budget=2.0):
+        """
+        Plan the order of a set of observations.
+
+        Parameters
+        ----------
+        positions : astropy SkyCoord array, or list of SkyCoord
+           The position of each target.
+        dwell : float or array
+           The minimum time, in seconds, to observe each target for.
+        start, end : datetime
+           The start and end of the night.
+        windows : list of (datetime, datetime)
+           The period in which each target may be observed. If this
+           isn't given each target can be observed at any time while
+           it's above `min_alt`.
+        names : list of str
+           A name for each target, which is carried through to the plan.
+        origin : tuple
+           The (az, alt) of the telescope at the start of the night, in
+           degrees. Defaults to the current position of the drive.
+        budget : float
+           The number of seconds to spend refining the plan.
+
+        Returns
+        -------
+        list of dict
+           The planned observations, in order, each giving the index of
+           the target, its name and position, the start and end time,
+           and the time spent slewing to it. Targets which can't be fitted
+           into the night are left out. The total dead time of the plan
+           is kept in the `dead_time` attribute of the planner.
+        """
+        if not isinstance(positions, SkyCoord):
+            positions = SkyCoord([position.transform_to(ICRS) for position in positions])
+        icrs = positions.transform_to(ICRS)
+        n = len(icrs)
+        self.icrs = icrs
+        self.dwell = np.ones(n) * dwell
+        self.names = names if names is not None else [str(i) for i in range(n)]
+        self.start = start
+
+        # Work out the position of every target at every time on the grid.
+        span = (end - start).total_seconds()
+        m = int(np.ceil(span / self.step)) + 1
+        self.times = np.arange(m) * self.step
+        self.az, self.alt = self._horizontal(icrs, Time(start, format="datetime"), self.times)
+
+        # The number of grid points before each one at which each target
+        # can't be observed, so that whether a target is observable over
+        # a period can be found by a subtraction.
+        hidden = (self.alt < self.min_alt).astype(int)
+        self.hidden = np.hstack([np.zeros((n, 1), dtype=int), np.cumsum(hidden, axis=1)])
+
+        self.window_start = np.zeros(n)
+        self.window_end = np.ones(n) * span
+        if windows is not None:
+            for i, (opens, closes) in enumerate(windows):
+                self.window_start[i] = max(0, (opens - start).total_seconds())
+                self.window_end[i] = min(span, (closes - start).total_seconds())
+
+        if origin is None and self.drive:
+            position = self.drive.position
+            origin = (position.az, position.alt)
+        self.origin = origin
+
+        order = self._greedy()
+        order = self._refine(order, budget)
+        dead, plan = self._evaluate(order)
+        self.dead_time = dead
+        return plan
+
+    def _horizontal(self, icrs, start, times):
+        """
+        Calculate the horizontal coordinates of a set of targets on a grid
+        of times.
+
+        Precession, nutation and aberration change very little over a 
+        night, so the targets are transformed to CIRS once, in a single
+        transformation at the middle of the night, and the rotation of the
+        Earth is then applied to the whole grid at once.
+
+        Returns
+        -------
+        az, alt : array
+           The azimuth and altitude of each target (rows) at each time 
+           (columns), in degrees.
+        """
+        cirs = icrs.transform_to(CIRS(obstime=start + times.mean()*u.second))
+        ra, dec = cirs.ra.radian[:, None], cirs.dec.radian[:, None]
+        lat = self.location.latitude.radian
+        # The Earth rotation angle, from UTC, which is close enough to UT1 for planning
+        jd = start.utc.jd + times / 86400.
+        era = 2*np.pi*((0.7790572732640 + 1.00273781191135448*(jd - 2451545.0)) % 1)
+        ha = era[None, :] + self.location.longitude.radian - ra
+        alt = np.arcsin(np.sin(lat)*np.sin(dec) + np.cos(lat)*np.cos(dec)*np.cos(ha))
+        az = np.arctan2(-np.cos(dec)*np.sin(ha), np.sin(dec)*np.cos(lat) - np.cos(dec)*np.sin(lat)*np.cos(ha))
+        return np.degrees(az) % 360, np.degrees(alt)
+
+    def _slot(self, t):
+        return np.clip(np.asarray(t, dtype=float) / self.step, 0, len(self.times) - 1).astype(int)
+
+    def _observable(self, targets, begin, finish):
+        """
+        Whether each target can be observed from `begin` to `finish`.
+        """
+        first, last = self._slot(begin), self._slot(finish)
+        return ((finish <= self.window_end[targets])
+                & (self.hidden[targets, last + 1] - self.hidden[targets, first] == 0))
+
+    def _next(self, targets, t, position):
+        """
+        The time at which each of a set of targets could next be started,
+        if the telescope is free at time `t`, and where it is pointing.
+        """
+        k = self._slot(t)
+        if position is None:
+            slew = np.zeros(len(targets))
+        else:
+            slew = self.slew_model.estimate(position[0], position[1], self.az[targets, k], self.alt[targets, k]) + self.margin
+        begin = np.maximum(t + slew, self.window_start[targets])
+        # Wait for a target which is below the horizon to rise
+        visible = self.alt[targets, k:] >= self.min_alt
+        rises_at = np.where(visible.any(axis=1), (k + np.argmax(visible, axis=1)) * self.step, np.inf)
+        begin = np.maximum(begin, rises_at)
+        finish = begin + self.dwell[targets]
+        return slew, begin, finish, self._observable(targets, begin, finish)
+
+    def _greedy(self):
+        """
+        Build an initial order by always observing the target which can
+        be started soonest.
+        """
+        remaining = np.arange(len(self.dwell))
+        order = []
+        t, position = 0.0, self.origin
+        while len(remaining):
+            slew, begin, finish, ok = self._next(remaining, t, position)
+            if not ok.any():
+                break
+            choice = np.flatnonzero(ok)[np.argmin(begin[ok])]
+            target = remaining[choice]
+            order.append(target)
+            t = finish[choice]
+            k = self._slot(t)
+            position = (self.az[target, k], self.alt[target, k])
+            remaining = np.delete(remaining, choice)
+        # Targets which can't be fitted in are kept at the end of the
+        # order, in case the refinement finds room for them.
+        return order + list(remaining)
+
+    def _walk(self, order, first=0, state=None):
+        """
+        Step through an order, skipping any targets which can't be 
+        observed when their turn comes.
+
+        Parameters
+        ----------
+        order : list
+           The order of the targets.
+        first : int
+           The position in the order to start from.
+        state : tuple
+           The (time, position, dead time) before the target at `first`.
+
+        Returns
+        -------
+        list
+           The (time, position, dead time) before each target from 
+           `first` onwards, and after the last. The dead time includes a 
+           penalty of the length of the night for each target which is 
+           left out.
+        """
+        t, position, dead = state or (0.0, self.origin, 0.0)
+        states = [(t, position, dead)]
+        for target in order[first:]:
+            slew, begin, finish, ok = self._next(np.array([target]), t, position)
+            if ok[0]:
+                dead += begin[0] - t
+                t = finish[0]
+                k = self._slot(t)
+                position = (self.az[target, k], self.alt[target, k])
+            else:
+                dead += self.times[-1]
+            states.append((t, position, dead))
+        return states
+
+    def _evaluate(self, order):
+        """
+        Work out the dead time of an order, and the observations it makes.
+
+        Returns
+        -------
+        dead : float
+           The dead time, in seconds, spent slewing or waiting.
+        plan : list of dict
+           The observations in the plan.
+        """
+        plan = []
+        dead = 0.0
+        for target, (t, position, _) in zip(order, self._walk(order)):
+            slew, begin, finish, ok = self._next(np.array([target]), t, position)
+            if not ok[0]:
+                continue
+            dead += begin[0] - t
+            plan.append({'target': target, 'name': self.names[target], 'position': self.icrs[target],
+                         'start': self.start + datetime.timedelta(seconds=float(begin[0])),
+                         'end': self.start + datetime.timedelta(seconds=float(finish[0])),
+                         'slew': float(slew[0])})
+        return dead, plan
+
+    def _refine(self, order, budget, window=10):
+        """
+        Improve an order with random 2-opt moves, reversing a section of
+        the order whenever that reduces the dead time, until the time
+        budget runs out. 
+
+        Half of the moves reverse short sections of up to `window` 
+        targets, which are the most likely to help. Only the part of the
+        order after the start of the section needs to be re-walked.
+        """
+        order = list(order)
+        n = len(order)
+        if n < 3 or budget <= 0:
+            return order
+        states = self._walk(order)
+        deadline = time.time() + budget
+        while time.time() < deadline:
+            i = random.randrange(n - 1)
+            if random.random() < 0.5:
+                j = random.randint(i + 1, min(n - 1, i + window))
+            else:
+                j = random.randint(i + 1, n - 1)
+            candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+            walked = self._walk(candidate, i, states[i])
+            if walked[-1][2] < states[-1][2]:
+                order, states = candidate, states[:i] + walked
+        return order
+
+    def to_schedule(self, scheduler, plan, script, args=None, then=None):
+        """
+        Add a plan to a scheduler.
+
+        Parameters
+        ----------
+        scheduler : Scheduler object
+           The scheduler the jobs should be added to.
+        plan : list of dict
+           A plan produced by `plan()`.
+        script : str
+           The filepath of the script which will conduct each observation.
+        args : str
+           The command-line arguments for the script.
+        then : {python callable, str}
+           An instruction to carry out after each observation.
+
+        Returns
+        -------
+        list
+           The job numbers assigned to the observations.
+        """
+        if not plan:
+            return []
+        positions = SkyCoord(ra=[obs['position'].ra.value for obs in plan]*u.deg,
+                             dec=[obs['position'].dec.value for obs in plan]*u.deg, frame=ICRS)
+        return scheduler.at_many([obs['start'] for obs in plan], script=script, args=args, positions=positions,
+                                 until=[obs['end'] for obs in plan], then=then)
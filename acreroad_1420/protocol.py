@@ -0,0 +1,128 @@
+"""
+acreroad_1420 qp protocol
+
+Decoders for the lines which the "qp" drive controller sends over the
+serial connection. Each kind of line is picked out by its prefix, using
+a table which is built once, and is decoded into a record.
+
+Examples
+--------
+>>> protocol.decode("s 1234,1.5e0,0.3e0\\n")
+Status(time='1234', az=1.5, alt=0.3)
+"""
+
+import collections
+
+
+# The records which the lines are decoded into. Angles are in radians,
+# as the controller sends them.
+Status = collections.namedtuple('Status', 'time az alt')
+Click = collections.namedtuple('Click', 'axis az alt')
+StatusReport = collections.namedtuple('StatusReport', 'fields')
+Arrived = collections.namedtuple('Arrived', 'text')
+Endstop = collections.namedtuple('Endstop', 'text')
+Calibration = collections.namedtuple('Calibration', 'values')
+Reply = collections.namedtuple('Reply', 'text')
+Error = collections.namedtuple('Error', 'text')
+Comment = collections.namedtuple('Comment', 'text')
+
+
+def parse_float(string):
+    """
+    Parse a float from the controller, which may have a floating-point
+    exponent, which python doesn't allow.
+    """
+    try:
+        return float(string)
+    except ValueError:
+        mantissa, exponent = string.split('e')
+        return float(mantissa) * 10**float(exponent)
+
+def _status(line):
+    # s <time>,<az>,<alt>
+    fields = line[2:].rstrip('\r\n').split(',')
+    if len(fields) != 3:
+        return None
+    return Status(fields[0], parse_float(fields[1]), parse_float(fields[2]))
+
+def _click(line):
+    # az,...,<az>,<alt> or al,...,<az>,<alt>
+    fields = line.split(',')
+    return Click(line[1], parse_float(fields[3]), parse_float(fields[4]))
+
+def _status_report(line):
+    # >S key=value key=value ...
+    return StatusReport(dict(field.split('=', 1) for field in line[2:].split()))
+
+def _arrived(line):
+    return Arrived(line[4:].strip())
+
+def _endstop(line):
+    return Endstop(line[4:].strip())
+
+def _calibration(line):
+    return Calibration(line[2:].strip())
+
+def _reply(line):
+    return Reply(line[1:].strip())
+
+def _error(line):
+    return Error(line[1:].strip())
+
+def _comment(line):
+    return Comment(line[1:].strip())
+
+# The decoders for each kind of line, keyed by prefix. The prefixes of
+# any one length are tried before shorter ones.
+DECODERS = {
+    's': _status,
+    'az': _click,
+    'al': _click,
+    '>S': _status_report,
+    '>g A': _arrived,
+    '>g E': _endstop,
+    '>c': _calibration,
+    '>': _reply,
+    '!': _error,
+    '#': _comment,
+}
+
+def _table(decoders):
+    """
+    Arrange the decoders by the first character of their prefix, longest
+    prefix first, so a line only has to be compared with a few prefixes.
+    """
+    table = {}
+    for prefix in sorted(decoders, key=len, reverse=True):
+        table.setdefault(prefix[0], []).append((prefix, decoders[prefix]))
+    return table
+
+_TABLE = _table(DECODERS)
+
+def decode(line):
+    """
+    Decode a line from the controller.
+
+    Parameters
+    ----------
+    line : str or bytes
+       The line, as read from the serial connection.
+
+    Returns
+    -------
+    record or None
+       The decoded line, or None if it's empty, or isn't understood.
+
+    Raises
+    ------
+    ValueError, IndexError
+       If the line is malformed.
+    """
+    if not line:
+        return None
+    if not isinstance(line, str):
+        line = line.decode('ascii', 'replace')
+    for prefix, decoder in _TABLE.get(line[0], ()):
+        if line.startswith(prefix):
+            return decoder(line)
+    return None
@@ -5,6 +5,7 @@ Contact: frith.ronnie@gmail.com
 """
 
 from . import CONFIGURATION as config
+from . import transforms
 import astropy, math
 from astropy.time import Time
 from astropy import units as u
@@ -31,8 +32,12 @@ class RadioSource():
 
 
         self.location = location
+        self.site = transforms.site(location)
 
         self.exists = False
+        # The resolved position of the source, which is looked up once
+        self.source = None
+        self.time = None
         
         self.acreRoadPyEphem = ephem.Observer()
         self.acreRoadPyEphem.lon, self.acreRoadPyEphem.lat = '-4.3', '55.9'   #glasgow
@@ -52,6 +57,7 @@ class RadioSource():
         alt = float(repr(sun.alt))*(180/math.pi)
         self.pos = (az,alt)
         now = self.current_time_local()
+        self.time = now.unix
         altazframe = AltAz(az=az*u.degree, alt=alt*u.degree, obstime=now,location=self.location)
         self.skycoord = SkyCoord(altazframe)
         self.exists = True
@@ -64,6 +70,7 @@ class RadioSource():
         alt = float(repr(moon.alt))*(180/math.pi)
         self.pos = (az,alt)
         now = self.current_time_local()
+        self.time = now.unix
         altazframe = AltAz(az=az*u.degree, alt=alt*u.degree, obstime=now,location=self.location)
         self.skycoord = SkyCoord(altazframe)
         self.exists = True
@@ -75,17 +82,24 @@ class RadioSource():
         """
         self.exists = False
         try:
-            source = SkyCoord.from_name(self.name)
+            self.source = SkyCoord.from_name(self.name)
         except astropy.coordinates.name_resolve.NameResolveError:
             return False
         self.exists = True
-        now = self.current_time_local()
-        altazframe = AltAz(obstime=now,location=self.location)
-        sourcealtaz = source.transform_to(altazframe)
-        self.pos = (float(sourcealtaz.az.degree),float(sourcealtaz.alt.degree))
-        self.skycoord = sourcealtaz
+        self._locate()
         return True
 
+    def _locate(self):
+        """
+        Work out the horizontal position of the source now, through the
+        shared transform cache.
+        """
+        self.time = time.time()
+        az, alt = transforms.CACHE.altaz(self.source, self.time, self.location)
+        self.pos = (az, alt)
+        self.skycoord = SkyCoord(AltAz(az=az*u.degree, alt=alt*u.degree,
+                                       obstime=Time(self.time, format='unix'), location=self.location))
+
     def update(self):
         """
         Update current position of the source.
@@ -95,12 +109,9 @@ class RadioSource():
         elif self.name.lower() == "moon":
             self.moon()
         else:
-            source = SkyCoord.from_name(self.name)
-            now = self.current_time_local()
-            altazframe = AltAz(obstime=now,location=self.location)
-            sourcealtaz = source.transform_to(altazframe)
-            self.pos = (float(sourcealtaz.az.degree),float(sourcealtaz.alt.degree))
-            self.skycoord = sourcealtaz
+            if self.source is None:
+                self.source = SkyCoord.from_name(self.name)
+            self._locate()
 
     def isVisible(self):
         """
@@ -160,16 +171,14 @@ class GalacticPlane():
 
     def update(self, n=72):
         # We want to calculate the AltAz positions of the galactic plane
-        
-        c = SkyCoord([i for i in np.linspace(0, 360, n)], [0 for i in np.linspace(-90, 90.0, n)], frame="galactic", unit="deg", obstime = self.time, location=self.location)
-        c = c.transform_to(AltAz(obstime=self.time,location=self.location))
+        t = time.time() if self.time is None else self.time.unix
+        az, alt = transforms.CACHE.convert('galactic', np.linspace(0, 360, n), np.zeros(n), 'altaz',
+                                           t, transforms.site(self.location))
 
         points = []
-        for point in c:
-            if point.alt.value > -10:
-                points.append((point.az.value, point.alt.value))
+        for point in zip(az, alt):
+            if point[1] > -10:
+                points.append(point)
         
         #print points
         self.points = points
-
-                
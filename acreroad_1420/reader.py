@@ -0,0 +1,175 @@
+"""
+acreroad_1420 Serial reader
+
+Reads the lines which the drive controller sends, in two stages, so that
+reading from the serial port is never held up by parsing the lines.
+
+The reading thread takes whatever bytes are waiting on the port, splits
+them into lines, and puts the lines into a bounded buffer. A second
+thread takes lines out of the buffer and parses them. If the parser
+falls so far behind that the buffer fills up the oldest lines are
+dropped, and counted, rather than letting bytes back up in the port.
+
+Anything which might wait on the disk, that is writing lines to the
+capture and logging failed reads, is left to the parsing thread too.
+"""
+
+import collections
+import logging
+import threading
+
+from .capture import monotonic
+
+
+class LineReader():
+    """
+    A reader for a line-based serial protocol.
+
+    Parameters
+    ----------
+    port : serial.Serial
+       The open serial port. Reads from it should have a timeout.
+    handler : callable
+       The function which is given each complete line, as bytes.
+    size : int
+       The most lines which can wait in the buffer to be parsed.
+    max_line : int
+       The longest line which is expected, in bytes. Longer lines are
+       assumed to be garbage, and are dropped.
+    recorder : capture.Recorder
+       If given, each line is recorded, with the time it was read, as
+       it's parsed. Lines lost when the buffer overflows aren't recorded.
+
+    Examples
+    --------
+    >>> reader = LineReader(connection.ser, connection.parse)
+    >>> reader.start()
+    >>> reader.stats()
+    {'lines': 1520, 'overflowed': 0, 'dropped': 0, 'errors': 0, 'waiting': 0}
+    """
+    def __init__(self, port, handler, size=4096, max_line=1024, recorder=None):
+        self.port = port
+        self.handler = handler
+        self.max_line = max_line
+        self.recorder = recorder
+        self.running = False
+        self.threads = []
+        # Counters
+        self.lines = 0
+        self.overflowed = 0
+        self.dropped = 0
+        self.errors = 0
+        self._buffer = collections.deque(maxlen=size)
+        self._ready = threading.Condition()
+        self._partial = bytearray()
+
+    def start(self):
+        """
+        Start the reading and parsing threads.
+        """
+        self.running = True
+        self.threads = [threading.Thread(target=self._read), threading.Thread(target=self._parse)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self, timeout=1.0):
+        """
+        Stop the reading and parsing threads, waiting up to `timeout`
+        seconds for each of them to finish. The reading thread finishes
+        once its read returns, which can take as long as the port's timeout.
+        """
+        with self._ready:
+            self.running = False
+            self._ready.notify()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def _waiting(self):
+        # pySerial 3 has in_waiting; older versions have inWaiting()
+        waiting = getattr(self.port, 'in_waiting', None)
+        return waiting if waiting is not None else self.port.inWaiting()
+
+    def _read(self):
+        while self.running:
+            try:
+                # If nothing is waiting this blocks for a byte, up to the
+                # port's timeout, rather than spinning.
+                chunk = self.port.read(self._waiting() or 1)
+            except Exception as e:
+                self.errors += 1
+                # The failure is logged by the parsing thread
+                with self._ready:
+                    self._buffer.append((monotonic(), e))
+                    self._ready.notify()
+                continue
+            if chunk:
+                self.feed(chunk)
+
+    def feed(self, chunk):
+        """
+        Split bytes which have been read into lines, and queue the
+        complete lines for parsing.
+        """
+        self._partial.extend(chunk)
+        if b"\n" not in chunk:
+            if len(self._partial) > self.max_line:
+                self.dropped += 1
+                del self._partial[:]
+            return
+        lines = self._partial.split(b"\n")
+        self._partial = bytearray(lines.pop())
+        now = monotonic()
+        complete = []
+        for line in lines:
+            if len(line) > self.max_line:
+                self.dropped += 1
+                continue
+            complete.append((now, bytes(line) + b"\n"))
+        with self._ready:
+            for entry in complete:
+                if len(self._buffer) == self._buffer.maxlen:
+                    self.overflowed += 1
+                self._buffer.append(entry)
+            self._ready.notify()
+
+    def _parse(self):
+        while True:
+            with self._ready:
+                while self.running and not self._buffer:
+                    self._ready.wait()
+                if not self.running:
+                    return
+            self.drain()
+
+    def drain(self):
+        """
+        Parse the lines which are waiting in the buffer. This is done by
+        the parsing thread, but can be called directly if the reader
+        isn't started, and the caller feeds it the bytes.
+        """
+        with self._ready:
+            entries = list(self._buffer)
+            self._buffer.clear()
+        for read, line in entries:
+            if isinstance(line, Exception):
+                logging.error("Failed to read from the drive: {}".format(line))
+                continue
+            if self.recorder:
+                self.recorder.line(line, read)
+            self.lines += 1
+            try:
+                self.handler(line)
+            except Exception as e:
+                self.errors += 1
+                logging.error("Parser error, continuing. \n {} {}".format(line, e))
+
+    def stats(self):
+        """
+        The number of lines which have been parsed, lost because the
+        buffer `overflowed`, or `dropped` as garbage, the number of
+        `errors`, and the number of lines `waiting` to be parsed.
+        """
+        return {'lines': self.lines, 'overflowed': self.overflowed, 'dropped': self.dropped,
+                'errors': self.errors, 'waiting': len(self._buffer)}
@@ -0,0 +1,272 @@
+"""
+acreroad_1420 Satellites
+
+Tracks satellites, and anything else which crosses the sky too fast for
+the ordinary tracker, from their two-line elements (TLEs).
+
+The whole of a pass is worked out before it starts, with pyephem, as a
+table of positions a fraction of a second apart. While the satellite is
+up the drive is sent, at a short cadence, the position the satellite
+will be at once the command has got through and the telescope has
+moved, rather than the position it's at now.
+
+Examples
+--------
+>>> tle = ["ISS (ZARYA)",
+...        "1 25544U 98067A   08264.51782528 -.00002182  00000-0 -11606-4 0  2927",
+...        "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537"]
+>>> connection.track_satellite(tle)
+"""
+
+import logging
+import math
+import time
+
+import ephem
+import numpy as np
+
+from .tracking import Tracker, Trajectory
+
+
+# The unix epoch, as a pyephem date
+UNIX_EPOCH = ephem.Date('1970/1/1')
+
+
+class PassError(ValueError):
+    """
+    The satellite doesn't rise and set at the telescope, for example
+    because it's geostationary, and is always up, or never up.
+    """
+    pass
+
+
+def unix(date):
+    """
+    Convert a pyephem date to seconds since 1970.
+    """
+    return (float(date) - UNIX_EPOCH) * 86400.
+
+def body(tle):
+    """
+    A pyephem body for a satellite.
+
+    Parameters
+    ----------
+    tle : str or list of str
+       The two-line elements, with the name as the first line.
+    """
+    if isinstance(tle, str):
+        tle = tle.strip().splitlines()
+    name, line1, line2 = [line.strip() for line in tle]
+    return ephem.readtle(name, line1, line2)
+
+def observer(location):
+    """
+    A pyephem observer at the telescope.
+
+    Parameters
+    ----------
+    location : astropy.coordinates.EarthLocation
+       The location of the telescope.
+    """
+    site = ephem.Observer()
+    site.lat = location.latitude.radian
+    site.lon = location.longitude.radian
+    site.elevation = location.height.value
+    # The positions are geometric, as they are for the rest of the drive
+    site.pressure = 0
+    return site
+
+def next_pass(tle, location, start=None):
+    """
+    The times at which a satellite next rises and sets.
+
+    Parameters
+    ----------
+    tle : str or list of str
+       The two-line elements of the satellite.
+    location : astropy.coordinates.EarthLocation
+       The location of the telescope.
+    start : float
+       The time to look from, in seconds since 1970. Defaults to now.
+
+    Returns
+    -------
+    rise, set : float
+       In seconds since 1970. If the satellite is already up, `rise`
+       is `start`.
+
+    Raises
+    ------
+    PassError
+       If the satellite never rises or never sets.
+    """
+    start = time.time() if start is None else start
+    site = observer(location)
+    site.date = ephem.Date(UNIX_EPOCH + start/86400.)
+    satellite = body(tle)
+    try:
+        # A stale TLE fails as soon as it's computed
+        satellite.compute(site)
+        try:
+            # The next rising and the next setting, which belongs to this
+            # pass if the satellite is already up
+            rising, _, _, _, setting, _ = site.next_pass(satellite, singlepass=False)
+        except TypeError:
+            # Older versions of pyephem always work this way
+            rising, _, _, _, setting, _ = site.next_pass(satellite)
+    except ValueError as e:
+        # Including pyephem's CircumpolarError and NeverUpError
+        raise PassError("{} doesn't pass over the telescope: {}".format(satellite.name, e))
+    if setting is None or (rising is None and satellite.alt <= 0):
+        # Newer versions of pyephem give None rather than raising
+        raise PassError("{} doesn't pass over the telescope; it's always {}".format(
+            satellite.name, "up" if satellite.alt > 0 else "down"))
+    if satellite.alt > 0:
+        return start, unix(setting)
+    return unix(rising), unix(setting)
+
+
+class PassTrajectory(Trajectory):
+    """
+    The path of a satellite across the sky.
+
+    Parameters
+    ----------
+    tle : str or list of str
+       The two-line elements of the satellite.
+    location : astropy.coordinates.EarthLocation
+       The location of the telescope.
+    start : float
+       The start of the period, in seconds since 1970.
+    duration : float
+       The length of the period, in seconds.
+    step : float
+       The spacing, in seconds, of the times at which the satellite's
+       position is calculated.
+    """
+    def __init__(self, tle, location, start, duration, step=0.2):
+        self.start = start
+        self.end = start + duration
+        self.times = start + np.arange(0, duration + step, step, dtype=float)
+        site = observer(location)
+        satellite = body(tle)
+        az = np.empty(len(self.times))
+        alt = np.empty(len(self.times))
+        dates = UNIX_EPOCH + self.times/86400.
+        for i, date in enumerate(dates):
+            site.date = date
+            satellite.compute(site)
+            az[i], alt[i] = satellite.az, satellite.alt
+        # Unwrapped, so that the azimuth can be interpolated across north
+        self.az = np.degrees(np.unwrap(az))
+        self.alt = np.degrees(alt)
+
+
+class SatelliteTracker(Tracker):
+    """
+    Follows a satellite through a pass by sending the drive to where the
+    satellite is about to be.
+
+    Parameters
+    ----------
+    drive : Drive
+       The telescope drive.
+    tle : str or list of str
+       The two-line elements of the satellite.
+    cadence : float
+       The time between commands, in seconds.
+    lead : float
+       How far ahead, in seconds, of the satellite's present position
+       the drive is sent, to make up for the time taken to send the
+       command and for the telescope to move.
+    step : float
+       The spacing, in seconds, of the positions in the pass table.
+    tolerance : float
+       The distance, in degrees, which the satellite has to move from
+       the last position sent before a new one is sent.
+    min_alt : float
+       The lowest altitude, in degrees, which the drive is sent to.
+    start : float
+       The time to track the next pass from, in seconds since 1970.
+       Defaults to now.
+    clock : callable
+       Gives the time, in seconds since 1970.
+    """
+    def __init__(self, drive, tle, cadence=0.5, lead=0.6, step=0.2, tolerance=0.05, min_alt=0.0,
+                 start=None, clock=time.time):
+        Tracker.__init__(self, drive, tle, cadence=cadence, step=step, tolerance=tolerance, clock=clock)
+        self.lead = lead
+        self.min_alt = min_alt
+        self.commands = 0
+        self._sent = None
+        rise, setting = next_pass(tle, drive.location, clock() if start is None else start)
+        self.rise, self.set = rise, setting
+        self.trajectory = PassTrajectory(tle, drive.location, rise, setting - rise, step)
+        self.trajectories = 1
+
+    def position(self, t=None):
+        """
+        The position of the satellite at a time, which defaults to now, in
+        degrees.
+        """
+        return self.trajectory.at(self.clock() if t is None else t)
+
+    def _run(self):
+        # Wait at the point where the satellite will rise
+        if self.clock() < self.rise - self.lead:
+            az, alt = self.position(self.rise)
+            self._send(self.drive._slew_to, az, max(alt, self.min_alt))
+            self._stopped.wait(self.rise - self.lead - self.clock())
+        while self.running and self.clock() < self.set:
+            try:
+                self.correct()
+            except Exception as e:
+                logging.error("Satellite tracking failed: {}".format(e))
+            self._stopped.wait(self.cadence)
+        self.running = False
+        # The drive may have been given another tracker since
+        if self.drive.tracker is self:
+            self.drive.tracking = False
+
+    def correct(self):
+        """
+        Send the drive to where the satellite will be in `lead` seconds.
+
+        Returns
+        -------
+        float
+           The distance, in degrees, between the telescope and where the
+           satellite is now.
+        """
+        t = self.clock()
+        az, alt = self.position(t + self.lead)
+        if not self.trajectory.covers(t) or alt < self.min_alt:
+            return None
+        if self._sent is None or _separation(self._sent, (az, alt)) > self.tolerance:
+            if not self._send(self.drive._slew_to, az, alt):
+                return None
+            self._sent = (az, alt)
+            self.commands += 1
+            if self.drive.sim:
+                # There's no telescope to move, so it's taken to get
+                # there straight away
+                self.drive._stat_update(az, alt)
+        current = self.drive.position
+        self.error = _separation((current.az, current.alt), self.position(t))
+        self.max_error = max(self.max_error, self.error)
+        return self.error
+
+    def stats(self):
+        stats = Tracker.stats(self)
+        stats.update({'commands': self.commands, 'rise': self.rise, 'set': self.set})
+        return stats
+
+def _separation(first, second):
+    """
+    The angle between two horizontal positions, in degrees.
+    """
+    az1, alt1 = np.radians(first)
+    az2, alt2 = np.radians(second)
+    cos = math.sin(alt1)*math.sin(alt2) + math.cos(alt1)*math.cos(alt2)*math.cos(az1 - az2)
+    return math.degrees(math.acos(min(1.0, max(-1.0, cos))))
@@ -1,3 +1,4 @@
+from __future__ import print_function
 from astropy.coordinates import SkyCoord
 import astropy.units as u
 
@@ -8,19 +9,31 @@ from astropy.coordinates import SkyCoord
 from astropy.coordinates import ICRS, Galactic, AltAz
 from astropy.time import Time
 import astropy.units as u
+import logging
 import os
 from subprocess import Popen
 import threading
 import shlex
 import time
+import heapq
+import bisect
+import itertools
+import collections
+import numpy as np
+
+from . import CONFIGURATION as config
+from .journal import Journal, Orphan, check_callable, process_alive, resolve_callable
+from .clock import SystemClock
+from .supervisor import Supervisor
+from .workers import WorkerPool, Plugin, plugin_name
+from .flowgraphs import FlowgraphCache
+from .drive import ControllerException
 
 import warnings
 warnings.filterwarnings("ignore")
 
 class Scheduler():
-    schedule = []
-    next_id = 1
-    def __init__(self, rootdir=os.expanduser("~"), drive=None):
+    def __init__(self, rootdir=os.path.expanduser("~"), drive=None, journal=None, clock=None, launcher=Popen, start=True, supervisor=None, workers=None, flowgraphs=None):
         """
         A pythonic event scheduler for radio telescopes.
         The scheduler allows the driving and observations to be controlled for a radio telescope.
@@ -29,106 +42,398 @@ class Scheduler():
         ----------
         drive : Drive object
            The connection to the telescope drive, which will be used to control the pointing of the telescope.
+        journal : str
+           The path to a journal file in which the schedule is recorded. If the
+           journal already exists the jobs in it are restored, so that the 
+           schedule survives the scheduler being restarted.
+        clock : clock object
+           The clock the scheduler takes the time from. Defaults to the 
+           system clock; see `acreroad_1420.clock`.
+        launcher : callable
+           The function used to start observation scripts and `then`
+           commands, which is given the command as a list, and must return
+           an object with the same interface as a `subprocess.Popen`.
+        start : bool
+           Whether to start the scheduler thread. If this is False the
+           events must be run by the caller with `step()`, as the 
+           simulator does.
+        supervisor : Supervisor
+           The supervisor which runs the observation scripts and `then`
+           commands. By default one is made which uses `launcher`, and 
+           writes the output of each job to a log in `rootdir`/logs.
+        workers : WorkerPool
+           The pool of warm workers which observation plugins are run in.
+           By default the number of workers set in the `[workers]` 
+           section of the configuration are kept ready.
+        flowgraphs : FlowgraphCache
+           The cache of compiled GNU Radio flowgraphs. By default this is
+           kept in `rootdir`/flowgraphs.
         
         """
         # In the initialisation we should probably load at least the drive object!
         self.drive = drive
         self.rootdir = rootdir
+        self.clock = clock or SystemClock()
+        self.workers = workers or WorkerPool(int(config.get('workers', 'size')), launcher=launcher)
+        self.flowgraphs = flowgraphs or FlowgraphCache(os.path.join(rootdir, "flowgraphs"))
+        self.supervisor = supervisor or Supervisor(os.path.join(rootdir, "logs"), launcher=self.workers.launch)
         self.drive.home()
 
+        self.schedule = ScheduleIndex()
+        self.next_id = 1
+        self.processes = {}
+        # The slews for jobs which haven't ended
+        self.slews = {}
+        # The exit codes of the observation scripts which have finished
+        self.exits = {}
+
+        # The timer heap holds (deadline, sequence, action, job id)
+        # tuples, so the next thing which needs doing is always at
+        # the top. The condition variable lets the scheduler thread
+        # sleep until that deadline, and lets `at()` wake it early
+        # if an earlier job is added.
+        self._timers = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._actions = {'slew': self._slew_job,
+                         'start': self._start_job,
+                         'end': self._end_job}
+
+        # How late each timer fired, in seconds, as (action, job id, lateness)
+        self.lateness = collections.deque(maxlen=1000)
+
+        self.journal = None
+        if journal:
+            self.journal = Journal(journal)
+            self._replay()
+
         # We should now run the scheduler in a subthread, so that it's still possible to edit the queue
         # while it's running
-
+        self.running = True
         self.sched_thread = threading.Thread(target=self._run)
-        self.sched_thread.start()
+        if start:
+            self.sched_thread.start()
         
     
     def _run(self):
         """
         Run the scheduler.
-        The scheduler checks whether it's time to start either a slew event, or an observation
-        event by looking at the observation shedule. If it is time to start one it spawns a 
-        process to run the script, and allows it to run until the end of the scheduled observation
-        time.
+        The scheduler sleeps until the next deadline in its timer heap, 
+        which is either the start of a slew, the start of an observation,
+        or the end of an observation. When the deadline arrives it 
+        carries out the action, for example spawning a process to run 
+        the observation script, which is allowed to run until the end of 
+        the scheduled observation time.
         
         """
-        # Make sure that the schedule is correctly sorted, so the first entry will be the 
-        # next scheduled observation
+        print("Scheduler running...")
+        while self.running:
+            with self._condition:
+                event = self._next_event()
+            if event:
+                self.dispatch(*event)
 
-        print "Scheduler running..."
+    def next_event(self, until=None):
+        """
+        Wait on the scheduler's clock for the next timer to be due, and 
+        take it from the heap, without carrying it out. This is for 
+        running a schedule from outside, when the scheduler thread 
+        hasn't been started; see `step()`.
 
-        self.sort()
-        
-        
-        #print "There are {} jobs in the queue.".format(len(schedule))
-        pointed = False
-        current_job = None
-        current_slew = False
-        while True:
-            schedule = self.schedule
-            self.running = True
-            if len(schedule)<1:
+        Parameters
+        ----------
+        until : datetime
+           Don't take timers which are due after this time.
+
+        Returns
+        -------
+        tuple or None
+           The (deadline, action, job) of the timer, to be given to 
+           `dispatch()`, or None if there are no more timers, or none 
+           due by `until`.
+        """
+        with self._condition:
+            return self._next_event(block=False, until=until)
+
+    def step(self, until=None):
+        """
+        Carry out the next timer action, after waiting on the scheduler's
+        clock for it to be due. With a `VirtualClock` this runs through
+        the schedule without waiting.
+
+        Parameters
+        ----------
+        until : datetime
+           Don't carry out timers which are due after this time.
+
+        Returns
+        -------
+        tuple or None
+           The (deadline, action, job) which was carried out, or None if
+           there was nothing to do.
+        """
+        event = self.next_event(until)
+        if event:
+            self.dispatch(*event)
+        return event
+
+    def _next_event(self, block=True, until=None):
+        """
+        Wait until the earliest timer in the heap is due, and return it.
+        This must be called while holding the scheduler's condition.
+
+        Parameters
+        ----------
+        block : bool
+           Whether to wait for `at()` to add a job if nothing is scheduled.
+        until : datetime
+           Don't wait for timers which are due after this time.
+
+        Returns
+        -------
+        tuple or None
+           The (deadline, action, job) of the due timer, or None if the 
+           scheduler has been stopped, or there is nothing to do and
+           `block` is False, or the next timer is after `until`.
+        """
+        while self.running:
+            if not self._timers:
+                if not block: return None
+                # Nothing is scheduled, so sleep until `at()` adds something.
+                self.clock.wait(self._condition)
                 continue
-            #else:
-            #    print "There are no jobs in the queue, so the scheduler is stopping."
-                #self.running = False
-                #self.sched_thread.stop()
-            #    break
-            # Need an infinite loop to continuously check the time
-            #print schedule[0]['slewstart']
-
-            if (datetime.datetime.now() > schedule[0]['start']) & (not current_job) & (not current_slew):
-                # The slew has completed (or there wasn't one), but there are no
-                # on-going jobs, so we're free to start the script
-                print "Starting observation"
-                current_job = Popen(schedule[0]['command'])
-                print "There are {} jobs in the queue".format(len(schedule))
-                
-            if (datetime.datetime.now() > schedule[0]['slewstart']) & (not current_slew) & (not current_job) & (not self.drive.slewing) & (not pointed ):
-                # If nothing's happening already, but it's time something should be
-                # then start the slew
-                current_slew = True
-                
-                print "\t Starting to slew"
-                self.drive.goto(schedule[0]['position'], track=False)
-                # The next few lines might, conceivably, not be the best way to do this
-                while self.drive.slewing:
-                    #print "Slewing... {}".format(self.drive.slewing)
-                    time.sleep(1)
-                    continue
-                #time.sleep(100)
-                print "Slew Complete"
-                current_slew = False
-                pointed = True
-                
-            elif (datetime.datetime.now() > schedule[0]['end']):
-                # It's time to stop the observation, so let's send a SIGTERM
-                current_job.terminate()
-                current_job = None
-                print "Job ended"
-                pointed = False
-                # if a 'then' directive has been added this should now be acted upon.
-                if schedule[0]['then']:
-                    procs = schedule[0]['then']
-                    if procs is list:
-                        for proc in procs:
-                            if proc is str:
-                                Popen(proc)
-                            else:
-                                proc[0](proc[1])
-                        else:
-                            if proc is str:
-                                Popen(procs)
-                            else:
-                                proc[0](proc[1])
-                
-                # And let's remove the job from the scheduler
-                # but only remove it if the start date is in the past, to avoid removing future jobs!
-                print "There are {} jobs in the queue".format(len(schedule))
-                if schedule[0]['start'] < datetime.datetime.now(): 
-                    print "Removing job which started at {}".format(schedule[0]['start'])
-                    self.schedule.pop(0)
-                print "There are {} jobs in the queue".format(len(schedule))
+            deadline, _, action, idn = self._timers[0]
+            if until is not None and deadline > until:
+                return None
+            delay = (deadline - self.clock.now()).total_seconds()
+            if delay > 0:
+                self.clock.wait(self._condition, delay)
+                continue
+            heapq.heappop(self._timers)
+            if idn not in self.schedule:
+                # The job has been removed since the timer was set
+                continue
+            return deadline, action, self.schedule.get(idn)
+        return None
+
+    def dispatch(self, deadline, action, job):
+        """
+        Carry out a timer action, recording how late it was. If the
+        action fails the job is ended, so that the rest of the schedule
+        carries on.
+        """
+        late = (self.clock.now() - deadline).total_seconds()
+        self.lateness.append((action, job['id'], late))
+        try:
+            self._actions[action](job)
+        except Exception as e:
+            logging.exception("The {} of job {} failed: {}".format(action, job['id'], e))
+            self._abandon(job)
+
+    def _abandon(self, job):
+        """
+        End a job which has gone wrong, without running its `then` 
+        instructions.
+        """
+        process = self.processes.pop(job['id'], None)
+        if process:
+            self.supervisor.stop(process)
+        else:
+            # Release anything waiting for the observation to start
+            handle = self.supervisor.find(job['id'])
+            if handle and not handle.done():
+                handle.add_done_callback(self._exited)
+                handle._fail(SchedulerException("Job {} was abandoned before it started".format(job['id'])))
+        self.slews.pop(job['id'], None)
+        with self._condition:
+            self.schedule.remove(job['id'])
+        self._record(job['id'], 'ended')
+
+    def _push(self, deadline, action, idn):
+        heapq.heappush(self._timers, (deadline, next(self._sequence), action, idn))
+
+    def _record(self, idn, state, pid=None):
+        if self.journal:
+            self.journal.state(idn, state, pid)
+
+    def _replay(self):
+        """
+        Restore the schedule from the journal.
+
+        Jobs which have already finished are dropped, along with any of
+        their observation scripts which are still running. Observations 
+        which were running when the scheduler stopped, and which are still
+        running, are picked back up so that they can be ended on time; 
+        everything else is scheduled again from the start. A process is 
+        only taken to be an observation script if it has the process id
+        and the start time which were journaled for it.
+        """
+        now = self.clock.now()
+        for job, state, pid, started in self.journal.replay(self.drive.location):
+            idn = job['id']
+            self.next_id = max(self.next_id, idn + 1)
+            alive = state == 'running' and process_alive(pid, started)
+            if state == 'ended' or job['end'] < now:
+                if alive: Orphan(pid, started).terminate()
+                if state != 'ended': self._record(idn, 'ended')
+                continue
+            job['then'] = [resolve_callable(then, self.drive) if isinstance(then, tuple) else then
+                           for then in job['then']]
+            self.schedule.add(job)
+            if alive:
+                self.processes[idn] = self.supervisor.adopt(idn, Orphan(pid, started))
+                self.processes[idn].add_done_callback(self._exited)
+            else:
+                self._push(job['slewstart'], 'slew', idn)
+                self._push(job['start'], 'start', idn)
+            self._push(job['end'], 'end', idn)
+        self.journal.compact()
+
+    def _slew_job(self, job):
+        """
+        Point the telescope at the position for a job.
+        """
+        print("\t Starting to slew")
+        self._record(job['id'], 'slewing')
+        slew = self.drive.goto(job['position'], track=False)
+        # Hear when the controller reports that the telescope has 
+        # arrived, without holding up the scheduler thread
+        self.slews[job['id']] = slew
+        slew.add_done_callback(self._slewed)
+
+    def _slewed(self, slew):
+        try:
+            slew.wait(0)
+            print("Slew Complete")
+        except ControllerException as e:
+            print("The slew failed: {}".format(e))
+
+    def _start_job(self, job):
+        """
+        Start the observation script for a job.
+        """
+        print("Starting observation")
+        handle = self.supervisor.handle(job['id'])
+        handle.add_done_callback(self._exited)
+        try:
+            self.supervisor.start(job['id'], self.flowgraphs.command(job['command']))
+        except Exception as e:
+            # Anything waiting on the job gets the failure, rather than
+            # waiting for a process which will never run
+            handle._fail(e)
+            raise
+        self.processes[job['id']] = handle
+        self._record(job['id'], 'running', handle.pid)
+        print("There are {} jobs in the queue".format(len(self.schedule)))
+
+    def _end_job(self, job):
+        """
+        Stop the observation script for a job, run its `then` 
+        instructions, and remove it from the schedule.
+        """
+        # It's time to stop the observation, so let's send a SIGTERM,
+        # which the supervisor follows up with a SIGKILL if it's ignored
+        process = self.processes.pop(job['id'], None)
+        if process:
+            self.supervisor.stop(process)
+        slew = self.slews.pop(job['id'], None)
+        if slew and not slew.done():
+            print("The telescope was still slewing at the end of the job")
+        print("Job ended")
+        # if a 'then' directive has been added this should now be acted upon.
+        for proc in job['then']:
+            if hasattr(proc, '__call__'):
+                proc()
+            else:
+                self.supervisor.then(proc)
+
+        with self._condition:
+            self.schedule.remove(job['id'])
+        self._record(job['id'], 'ended')
+        print("There are {} jobs in the queue".format(len(self.schedule)))
+
+    def _exited(self, handle):
+        print("The observation for job {} exited with code {}".format(handle.name, handle.returncode))
+        with self._condition:
+            self.exits[handle.name] = handle.returncode
+            self.supervisor.forget(handle.name)
+
+    def wait(self, idn, timeout=None):
+        """
+        Wait for the observation script of a job to finish.
+
+        Parameters
+        ----------
+        idn : int
+           The job number.
+        timeout : float
+           The longest time to wait, in seconds. By default there's no limit.
+
+        Returns
+        -------
+        int or None
+           The exit code of the observation script, or None if it hadn't 
+           finished before the timeout.
+
+        Raises
+        ------
+        KeyError
+           If there's no such job.
+        """
+        with self._condition:
+            if idn in self.exits:
+                return self.exits[idn]
+            handle = self.supervisor.find(idn)
+            if handle is None:
+                if idn not in self.schedule:
+                    raise KeyError("There's no job {}".format(idn))
+                handle = self.supervisor.handle(idn)
+        returncode = handle.wait(timeout)
+        if returncode is not None:
+            # The exit is only recorded once the handle's callbacks have run
+            with self._condition:
+                self.exits[idn] = returncode
+        return returncode
+
+    def stop(self, timeout=5):
+        """
+        Stop the scheduler thread, and any workers which are waiting for 
+        a job, and close the journal once everything has been written to 
+        it. Any running observations are left to finish on their own.
+
+        Parameters
+        ----------
+        timeout : float
+           The longest time to wait, in seconds, for the scheduler thread
+           to finish what it's doing, and for the journal to be written.
+        """
+        with self._condition:
+            self.running = False
+            self._condition.notify()
+        if self.sched_thread.is_alive() and self.sched_thread is not threading.current_thread():
+            self.sched_thread.join(timeout)
+        self.workers.close()
+        if self.journal:
+            self.journal.close(timeout)
+
+    def lateness_stats(self, action='start'):
+        """
+        Summarise how late the scheduler has been in carrying out its timers.
+
+        Parameters
+        ----------
+        action : {'start', 'slew', 'end'}
+           The type of timer to summarise. Defaults to observation starts.
+
+        Returns
+        -------
+        dict
+           The number of timers, and the mean and maximum lateness in seconds.
+        """
+        late = [l for a, _, l in self.lateness if a == action]
+        if not late:
+            return {'count': 0, 'mean': 0.0, 'max': 0.0}
+        return {'count': len(late), 'mean': sum(late)/len(late), 'max': max(late)}
         
     def at(self, time, script=None, args=None, position=None, until=None, forsec=None, then=None):
         """
@@ -141,10 +446,12 @@ class Scheduler():
            the time when the script will be executed.
            If the time is given as a string, it should be in the format 17 06 2015 13:14.
            
-        script : str
+        script : str or python callable
            The filepath of the script which will conduct the 
            observation. This can currently be a Python script, any script with a Shebang
-           or a GNU Radio flowchart.
+           or a GNU Radio flowchart. It can also be an observation plugin,
+           given as a function or as "module:function", which is run in a 
+           warm worker; see `acreroad_1420.workers`.
         
         args : str
            The command-line arguments for the script given in `script`.
@@ -196,11 +503,13 @@ class Scheduler():
         
         The scheduler operates using a thread dedicated to maintaining and 
         checking the schedule. Every time a new item is added to the schedule 
-        it is sorted, and the scheduler checks whether it is due to start an 
-        observation. In order to ensure that an observation can start on time 
-        the scheduler will move the telescope in advance, and so up to 2 minutes' 
+        its slew, start, and end times are added to a timer heap, and the 
+        scheduler thread is woken so that it can check whether it is due to 
+        start an observation. In order to ensure that an observation can start on time 
+        the scheduler will move the telescope in advance, and so some 
         leeway is required between observations to allow this process to occur. 
-        The scheduler attempts to predict this movement time in order to avoid 
+        The scheduler predicts this movement time from the drive's slew model, 
+        starting from the position of the preceding job, in order to avoid 
         excessive outages during small movements.
 
         """
@@ -210,9 +519,6 @@ class Scheduler():
         # line to the schedule.
         
 
-        self.sort
-        schedule = self.schedule
-
         # Parse the start time if it's a string
         if isinstance(time, str):
             start = datetime.datetime.strptime(time, '%d %m %Y %H:%M:%S')
@@ -240,101 +546,599 @@ class Scheduler():
                 elif position[0]=='h':
                     position = SkyCoord(position[1:], frame = AltAz(obstime=start,location=self.drive.location), unit=(u.deg, u.deg))
                 elif position[0]=='e':
-                    c = SkyCoord(position[1:], ICRS, unit=(u.deg, u.deg))
+                    position = SkyCoord(position[1:], ICRS, unit=(u.deg, u.deg))
                 else:
-                    c = SkyCoord(position, ICRS, unit=(u.deg, u.deg))
+                    position = SkyCoord(position, ICRS, unit=(u.deg, u.deg))
         elif not position:
                 # For a None position, assume the zenith
                 pass
 
                 
         # We can't schedule events in the past:
-        if (end - datetime.datetime.now()).total_seconds() < 0:
-            print "End time of job is in the past, the job has been rejected."
+        if (end - self.clock.now()).total_seconds() < 0:
+            print("End time of job is in the past, the job has been rejected.")
             return 0
         
         # We need to calculate the amount of time the telescope will require to
-        # slew to the new location
+        # slew to the new location, from wherever it will be pointing beforehand
+        altaz = None
         if self.drive:
-            #speed = 0.007\float(self.drive.calibration.split()[0])
-            #speed = (speed / 3.141)*180
-            slewtime  = 100 #drive.skycoord.separation(position).value / speed
+            altaz = self._altaz(position, start)
+            origin = self._origin(start)
+            slewtime = float(self.drive.slew_model.estimate(origin[0], origin[1], altaz[0], altaz[1]))
         else: 
             slewtime = 0
         slewtime = datetime.timedelta(seconds=slewtime)
             
         slewstart = start - slewtime    
         # Check if this observation overlaps one already in the schedule,
-        # see http://stackoverflow.com/a/9044111
-        for item in self.schedule:
-            latest_start = max(slewstart, item['start'])
-            earliest_end = min(end, item['end'])
-            overlap = (earliest_end - latest_start).total_seconds()
-            if overlap > 0 and len(self.schedule)>0:
-                if position.separation(item['position'])<1*u.deg:
-                    # This observation is within the beam of the pre-exisiting 
-                    # observation, so it can be carried-out simultaneously
-                    # with the existing one
-                    pass
-                else:
-                    print "The requested observation period overlaps with  \n\
-                        a pre-existing scheduled observation [id={}], and this \n\
-                        request has been rejected by the scheduler.".format(item['id'])
-                    return 0
-                
+        # which the index can find without looking at every job.
+        for item in self.schedule.overlapping(slewstart, end):
+            if position.separation(item['position'])<1*u.deg:
+                # This observation is within the beam of the pre-exisiting 
+                # observation, so it can be carried-out simultaneously
+                # with the existing one
+                pass
+            else:
+                print("The requested observation period overlaps with  \n\
+                    a pre-existing scheduled observation [id={}], and this \n\
+                    request has been rejected by the scheduler.".format(item['id']))
+                return 0
+            
         # Now time to verify the script which has been requested
-        if os.path.isfile(script) and os.access(script, os.R_OK):
-            command = script
-            if script[-2:len(script)] == 'py':
-                # This is a python script, so we should preface it with "python"
-                if args:
-                    argumentsadd = args
+        try:
+            plugin = plugin_name(script)
+        except ValueError as e:
+            print("{} The job has been rejected.".format(e))
+            return 0
+        script = plugin or script
+        if script and (script[-2:len(script)] == 'py' or plugin):
+            outfile_pos = position.transform_to(ICRS)
+            outfile_pos = (outfile_pos.ra.value, outfile_pos.dec.value)
+        else:
+            outfile_pos = None
+        command = self._script_command(script, args, start, outfile_pos, duration=(end - start).total_seconds(), plugin=bool(plugin))
+        if not command:
+            print("There seems to be something wrong with the script file, or it couldn't be found.")
+            return 0
+
+        # Then statements: Now time to verify the script which has been
+        # requested for the then statements
+        try:
+            thencommands = self._then_commands(then)
+        except ValueError as e:
+            print("{} The job has been rejected.".format(e))
+            return 0
+    
+        with self._condition:
+            # There's no apparent overlap, so it's safe to add this job to the schedule.
+            idn = self._insert({'command':command, 'slewstart': slewstart, 'start':start, 'end':end, 'position':position, 'script': script, 'then': thencommands, 'altaz': altaz})
+            # Wake the scheduler thread in case this job is due before
+            # the one it's currently waiting for
+            self._condition.notify()
+        # Print the confirmation that the job has been added
+        print("Event scheduled for {}".format(time))
+        return idn
+
+    def at_many(self, times, script=None, args=None, positions=None, until=None, forsec=None, then=None):
+        """
+        Schedule a batch of observations at once, for example a raster 
+        grid, or a drift scan repeated over several days.
+
+        The batch is checked as a whole: the positions are parsed into a 
+        single array-valued SkyCoord, transformed to ICRS in one go, and 
+        checked for overlaps against the schedule and each other in a 
+        vectorised pass. Either every job is added to the schedule, or 
+        none are.
+
+        Parameters
+        ----------
+        times : list of str or datetime, or astropy Time array
+           The start times of the observations, in any of the formats
+           accepted by `at()`.
+        script : str or python callable
+           The filepath of the script which will conduct each observation,
+           or an observation plugin.
+        args : str
+           The command-line arguments for the script given in `script`.
+        positions : list of str, or astropy SkyCoord array
+           The sky positions for each observation, in any of the formats
+           accepted by `at()`. A single position is used for every 
+           observation.
+        until : list of str or datetime, or astropy Time array
+           The times at which each observation should be ended.
+        forsec : float or array of floats
+           The number of seconds each observation should run for.
+        then : {python callable, str}
+           An instruction to carry out after each observation.
+
+        Returns
+        -------
+        list
+           The job numbers assigned to the observations.
+
+        Raises
+        ------
+        SchedulerException
+           If any of the observations can't be scheduled, in which case 
+           none of them are added to the schedule. The `reasons` attribute
+           of the exception gives the reason for each rejected row.
+
+        Examples
+        --------
+        >>> day = datetime.timedelta(days=1)
+        >>> start = datetime.datetime(2016, 3, 8, 17, 10)
+        >>> jobs.at_many([start + i*day for i in range(30)],
+        ...              script='/home/astro/srt2016/observing.py',
+        ...              positions="h180.0 +56.08", forsec=3600)
+        """
+        starts = self._parse_times(times)
+        n = len(starts)
+        if forsec is not None:
+            ends = [start + datetime.timedelta(seconds=float(sec)) for start, sec in zip(starts, np.ones(n)*forsec)]
+        else:
+            ends = self._parse_times(until)
+        coords, icrs = self._parse_positions(positions, starts)
+
+        reasons = {}
+        now = self.clock.now()
+        for i in range(n):
+            if ends[i] < now:
+                reasons[i] = "The end time of the job is in the past."
+
+        start_s = np.array([_seconds(start) for start in starts])
+        end_s = np.array([_seconds(end) for end in ends])
+        slewtimes, altaz = self._slewtimes(icrs, starts)
+        slewstart_s = start_s - slewtimes
+
+        # Check for overlaps with the existing schedule...
+        rows, jobs = self.schedule.overlapping_many(slewstart_s, end_s)
+        if len(rows):
+            other = np.array([self._icrs(job) for job in jobs])
+            clash = _separation(icrs[rows, 0], icrs[rows, 1], other[:, 0], other[:, 1]) >= 1
+            for row, job in zip(rows[clash], np.array(jobs, dtype=object)[clash]):
+                reasons.setdefault(row, "The observation overlaps a pre-existing scheduled observation [id={}].".format(job['id']))
+
+        # ...and with the rest of the batch.
+        order = np.argsort(start_s, kind='mergesort')
+        longest = (end_s - start_s).max() if n else 0
+        lo = np.searchsorted(start_s[order], slewstart_s - longest, side='left')
+        hi = np.searchsorted(start_s[order], end_s, side='left')
+        rows = np.repeat(np.arange(n), hi - lo)
+        if len(rows):
+            others = order[np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)])]
+            pair = (others != rows) & (end_s[others] > slewstart_s[rows])
+            rows, others = rows[pair], others[pair]
+            clash = _separation(icrs[rows, 0], icrs[rows, 1], icrs[others, 0], icrs[others, 1]) >= 1
+            for row, other in zip(rows[clash], others[clash]):
+                reasons.setdefault(row, "The observation overlaps row {} of the batch.".format(other))
+
+        # Work out the commands which will be run
+        isots = Time(starts, format="datetime").isot if n else []
+        try:
+            plugin = plugin_name(script)
+        except ValueError as e:
+            raise SchedulerException(str(e), dict((i, str(e)) for i in range(n)))
+        script = plugin or script
+        commands = [self._script_command(script, args, start, tuple(pos), isot, (end - start).total_seconds(), bool(plugin))
+                    for start, end, pos, isot in zip(starts, ends, icrs, isots)]
+        for i, command in enumerate(commands):
+            if not command:
+                reasons.setdefault(i, "There seems to be something wrong with the script file, or it couldn't be found.")
+
+        if reasons:
+            raise SchedulerException("{} of the {} observations can't be scheduled, so none have been.".format(len(reasons), n), reasons)
+
+        try:
+            thencommands = self._then_commands(then)
+        except ValueError as e:
+            raise SchedulerException(str(e), dict((i, str(e)) for i in range(n)))
+        ids = []
+        with self._condition:
+            for i in range(n):
+                slewstart = EPOCH + datetime.timedelta(seconds=slewstart_s[i])
+                ids.append(self._insert({'command': commands[i], 'slewstart': slewstart, 'start': starts[i], 'end': ends[i],
+                                         'position': coords[i], 'script': script, 'then': thencommands,
+                                         'icrs': tuple(icrs[i]), 'altaz': altaz[i]}))
+            self._condition.notify()
+        print("{} events scheduled from {}".format(n, min(starts) if n else None))
+        return ids
+
+    def _insert(self, job):
+        """
+        Give a job an id, and add it and its timers to the schedule.
+        This must be called while holding the scheduler's condition.
+        """
+        idn = self.next_id
+        self.next_id += 1
+        job['id'] = idn
+        self.schedule.add(job)
+        self._push(job['slewstart'], 'slew', idn)
+        self._push(job['start'], 'start', idn)
+        self._push(job['end'], 'end', idn)
+        if self.journal:
+            self.journal.add(job)
+        return idn
+
+    def _parse_times(self, times):
+        """
+        Parse a list of times in any of the formats accepted by `at()`
+        into a list of datetimes.
+        """
+        if isinstance(times, Time):
+            return list(np.atleast_1d(times.datetime))
+        return [datetime.datetime.strptime(time, '%d %m %Y %H:%M:%S') if isinstance(time, str) else time
+                for time in times]
+
+    def _parse_positions(self, positions, starts):
+        """
+        Parse the positions for a batch of jobs.
+
+        Positions given as strings are grouped by their frame prefix, and 
+        each group is parsed with a single SkyCoord constructor. 
+
+        Returns
+        -------
+        coords : list of SkyCoord
+           The position of each job, in the frame it was given in.
+        icrs : array
+           The (ra, dec) of each job at its start time, in degrees.
+        """
+        n = len(starts)
+        if isinstance(positions, (str, SkyCoord)) and (isinstance(positions, str) or positions.isscalar):
+            positions = [positions]*n
+        coords = [None]*n
+        icrs = np.zeros((n, 2))
+        if isinstance(positions, SkyCoord):
+            groups = [(np.arange(n), positions)]
+        else:
+            rows = {}
+            for i, position in enumerate(positions):
+                if isinstance(position, SkyCoord):
+                    rows.setdefault(id(position), (position, []))[1].append(i)
+                else:
+                    rows.setdefault(position[0] if position[0] in "ghe" else "", ("", []))[1].append(i)
+            groups = []
+            for key, (position, group) in rows.items():
+                group = np.array(group)
+                if isinstance(position, SkyCoord):
+                    groups.append((group, position))
+                    continue
+                strings = [positions[i][1:] if key else positions[i] for i in group]
+                if key == 'g':
+                    groups.append((group, SkyCoord(strings, Galactic, unit=(u.deg, u.deg))))
+                elif key == 'h':
+                    obstime = Time([starts[i] for i in group], format="datetime")
+                    groups.append((group, SkyCoord(strings, frame=AltAz(obstime=obstime, location=self.drive.location), unit=(u.deg, u.deg))))
                 else:
-                    argumentsadd = []
-                    
+                    groups.append((group, SkyCoord(strings, ICRS, unit=(u.deg, u.deg))))
+        for group, coord in groups:
+            transformed = coord.transform_to(ICRS)
+            icrs[group, 0] = transformed.ra.value
+            icrs[group, 1] = transformed.dec.value
+            if coord.isscalar:
+                for i in group: coords[i] = coord
+            else:
+                for j, i in enumerate(group): coords[i] = coord[j]
+        return coords, icrs
+
+    def _altaz(self, position, start):
+        """
+        The (az, alt) of a position at a given time, in degrees.
+        """
+        altaz = position.transform_to(AltAz(obstime=Time(start, format="datetime"), location=self.drive.location))
+        return (float(altaz.az.value), float(altaz.alt.value))
+
+    def _origin(self, start):
+        """
+        The (az, alt) which the telescope is expected to be pointing at 
+        before a slew which starts at a given time; this is the position
+        of the preceding job, or the current position if there isn't one.
+        """
+        job = self.schedule.preceding(start)
+        if job and job.get('altaz'):
+            return job['altaz']
+        position = self.drive.position
+        return (position.az, position.alt)
+
+    def _slewtimes(self, icrs, starts):
+        """
+        The time, in seconds, to allow for slewing to each of a batch of jobs.
+
+        The target positions are found in a single transformation, and 
+        each slew is assumed to start from the preceding job, either in 
+        the schedule or in the batch.
+
+        Returns
+        -------
+        slewtimes : array
+           The slew time for each job, in seconds.
+        altaz : list
+           The (az, alt) of each job at its start time, in degrees.
+        """
+        n = len(starts)
+        if not (self.drive and n):
+            return np.zeros(n), [None]*n
+        target = SkyCoord(ra=icrs[:, 0]*u.deg, dec=icrs[:, 1]*u.deg, frame=ICRS)
+        target = target.transform_to(AltAz(obstime=Time(starts, format="datetime"), location=self.drive.location))
+        altaz = np.column_stack([target.az.value, target.alt.value])
+
+        start_s = np.array([_seconds(start) for start in starts])
+        position = self.drive.position
+        origin = np.tile([position.az, position.alt], (n, 1)).astype(float)
+        origin_s = np.ones(n) * -np.inf
+        for i, job in enumerate(self.schedule.preceding_many(start_s)):
+            if job and job.get('altaz'):
+                origin[i] = job['altaz']
+                origin_s[i] = _seconds(job['start'])
+        order = np.argsort(start_s, kind='mergesort')
+        previous, current = order[:-1], order[1:]
+        later = start_s[previous] > origin_s[current]
+        origin[current[later]] = altaz[previous[later]]
+
+        slewtimes = self.drive.slew_model.estimate(origin[:, 0], origin[:, 1], altaz[:, 0], altaz[:, 1])
+        return slewtimes, [tuple(row) for row in altaz]
+
+    def _icrs(self, job):
+        """
+        The (ra, dec) of a job's position in degrees, which is 
+        calculated the first time it's needed.
+        """
+        if 'icrs' not in job:
+            position = job['position'].transform_to(ICRS)
+            job['icrs'] = (position.ra.value, position.dec.value)
+        return job['icrs']
+
+    def _script_command(self, script, args, start, outfile_pos=None, start_isot=None, duration=None, plugin=False):
+        """
+        Work out the command line which will run an observation script.
+
+        Parameters
+        ----------
+        script : str
+           The filepath of the observation script, or the name of a plugin.
+        args : str or list
+           Additional command-line arguments for a python script or plugin.
+        start : datetime
+           The start time of the observation.
+        outfile_pos : tuple
+           The (ra, dec) of the observation, which is used to name the 
+           output file of a python script.
+        start_isot : str
+           The start time in ISOT format, if it has already been worked out.
+        duration : float
+           The length of the observation in seconds, which is given to plugins.
+        plugin : bool
+           Whether the script is a plugin, to be run in a warm worker.
+
+        Returns
+        -------
+        list or str or Plugin or None
+           The command, or None if the script can't be run.
+        """
+        if not (script and (plugin or os.path.isfile(script) and os.access(script, os.R_OK))):
+            return None
+        if plugin or script[-2:len(script)] == 'py':
+            # This is a python script, so we should preface it with "python"
+            if args:
+                argumentsadd = shlex.split(args) if isinstance(args, str) else list(args)
+            else:
+                argumentsadd = []
+
+            if not start_isot:
                 start_isot = Time(start, format="datetime").isot
-                outfile_pos = position.transform_to(ICRS)
-                outfile = "{}/ra{:.2f}dec{:.2f}time{}.dat".format(self.rootdir, outfile_pos.ra.value, outfile_pos.dec.value, start_isot)
+            outfile = "{}/ra{:.2f}dec{:.2f}time{}.dat".format(self.rootdir, outfile_pos[0], outfile_pos[1], start_isot)
 
-                outputarg = ['-o', outfile]
+            if plugin:
+                module, function = script.split(":")
+                return Plugin(module, function, outfile_pos[0], outfile_pos[1], outfile, duration, argumentsadd)
 
-                command = [script] +outputarg +argumentsadd
-            elif script[-3:len(script)] == 'grc':
-                # This is a GRC file which we'll need to compile to run
-                command = "grcc -e {}".format(script)
-            else: command = script
-        else:
-            print "There seems to be something wrong with the script file, or it couldn't be found."
+            outputarg = ['-o', outfile]
 
-        # Then statements: Now time to verify the script which has been
-        # requested for the then statements
+            return [script] +outputarg +argumentsadd
+        elif script[-3:len(script)] == 'grc':
+            # This is a GRC file which we'll need to compile to run, so
+            # start compiling it now, rather than when the job starts
+            self.flowgraphs.prepare(script)
+            return [self.flowgraphs.grcc, "-e", script]
+        else: return script
+
+    def _then_commands(self, then):
+        """
+        Verify the scripts or callables requested for the `then` 
+        statement of a job.
+
+        Raises
+        ------
+        ValueError
+           If the schedule is journaled, and a callable couldn't be 
+           found again when the journal is read back.
+        """
         thencommands = []    
         if then:
                 
-            if then is not list: then = [then]
+            if not isinstance(then, list): then = [then]
             for thenc in then:
-                if os.path.isfile(thenc) and os.access(thenc, os.X_OK):
-                    thencommands.append(thenc)
+                if hasattr(thenc, '__call__') :
+                    # The command is probably a call to a function or other callable
+                    if self.journal:
+                        check_callable(thenc, self.drive)
+                    thencommands.append( thenc )
+                elif os.path.isfile(thenc) and os.access(thenc, os.X_OK):
                     if thenc[-2:len(thenc)] == 'py':
                         # This is a python script, so we should preface it with "python"
-                        thencommands.append( "python {}".format(thenc))
+                        thencommands.append( ["python", thenc] )
                     elif thenc[-3:len(thenc)] == 'grc':
                         # This is a GRC file which we'll need to compile to run
-                        thencommands.append( "grcc -e {}".format(thenc) )
-                    else: thencommands.append( thenc )
-                elif hasattr(thenc, '__call__') :
-                    # The command is probably a call to a function or other callable
-                    thencommands.append( thenc )
-    
-        idn = self.next_id
-        self.next_id += 1
-        # There's no apparent overlap, so it's safe to add this job to the schedule.
-        self.schedule.append({'id': idn, 'command':command, 'slewstart': slewstart, 'start':start, 'end':end, 'position':position, 'script': script, 'then': thencommands})
-        self.sort()
-        # If the scheduler isn't running then start it
-        #if not self.running: self._run()
-        # Print the confirmation that the job has been added
-        print "Event scheduled for {}".format(time)
+                        thencommands.append( ["grcc", "-e", thenc] )
+                    else: thencommands.append( [thenc] )
+        return thencommands
+
     def sort(self):
-        self.schedule = sorted(self.schedule, key=lambda k: k['start']) 
-        print self.schedule
+        """
+        Sort the schedule by start time. The schedule index is kept in 
+        order as jobs are added, so this no longer needs to do anything.
+        """
+        pass
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+def _seconds(when):
+    """
+    Convert a datetime into seconds since the epoch, which are cheaper to 
+    compare and bisect than datetimes.
+    """
+    return (when - EPOCH).total_seconds()
+
+class ScheduleIndex():
+    """
+    The jobs in a schedule, kept in order of their start times.
+
+    The start and end times are kept in parallel arrays which are 
+    maintained with `bisect`, so adding a job doesn't require the 
+    schedule to be re-sorted, and the jobs which overlap a period can 
+    be found in O(log n + k) time, where k is the number of jobs 
+    starting within the longest job duration of the period.
+    """
+    def __init__(self):
+        self._keys = []   # (start, id) pairs, in order
+        self._ends = []
+        self._jobs = []
+        self._ids = {}
+        # The duration of the longest job which has been added; no job
+        # which starts earlier than this before a period can overlap it.
+        self.longest = 0.0
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def __iter__(self):
+        return iter(list(self._jobs))
+
+    def __getitem__(self, i):
+        return self._jobs[i]
+
+    def __contains__(self, idn):
+        return idn in self._ids
+
+    def __repr__(self):
+        return repr(self._jobs)
+
+    def get(self, idn):
+        """
+        Return the job with a given id, or None if it isn't in the schedule.
+        """
+        return self._ids.get(idn)
+
+    def add(self, job):
+        """
+        Add a job to the schedule, keeping it in order.
+        """
+        start, end = _seconds(job['start']), _seconds(job['end'])
+        key = (start, job['id'])
+        i = bisect.bisect(self._keys, key)
+        self._keys.insert(i, key)
+        self._ends.insert(i, end)
+        self._jobs.insert(i, job)
+        self._ids[job['id']] = job
+        self.longest = max(self.longest, end - start)
+
+    def remove(self, idn):
+        """
+        Remove the job with a given id from the schedule.
+        """
+        job = self._ids.pop(idn, None)
+        if job is None: return None
+        i = bisect.bisect_left(self._keys, (_seconds(job['start']), idn))
+        del self._keys[i], self._ends[i], self._jobs[i]
+        return job
+
+    def overlapping(self, start, end):
+        """
+        Find the jobs which overlap a period of time.
+
+        Parameters
+        ----------
+        start, end : datetime
+           The start and end of the period.
+
+        Returns
+        -------
+        list
+           The jobs which are running at some point during the period.
+        """
+        start, end = _seconds(start), _seconds(end)
+        lo = bisect.bisect_left(self._keys, (start - self.longest,))
+        hi = bisect.bisect_left(self._keys, (end,))
+        return [self._jobs[i] for i in range(lo, hi) if self._ends[i] > start]
+
+    def preceding(self, start):
+        """
+        Return the last job which starts before a given time, or None.
+        """
+        i = bisect.bisect_left(self._keys, (_seconds(start),))
+        return self._jobs[i-1] if i else None
+
+    def preceding_many(self, starts):
+        """
+        Return the last job which starts before each of an array of 
+        times, given in seconds since the epoch.
+        """
+        if not self._jobs:
+            return [None]*len(starts)
+        keys = np.array([key[0] for key in self._keys])
+        return [self._jobs[i-1] if i else None for i in np.searchsorted(keys, starts, side='left')]
+
+    def overlapping_many(self, starts, ends):
+        """
+        Find the jobs which overlap each of an array of periods.
+
+        Parameters
+        ----------
+        starts, ends : array
+           The start and end of each period, in seconds since the epoch.
+
+        Returns
+        -------
+        rows : array
+           The index of the period for each overlap which was found.
+        jobs : list
+           The job which overlaps the period, for each overlap.
+        """
+        if not self._jobs:
+            return np.array([], dtype=int), []
+        keys = np.array([key[0] for key in self._keys])
+        lo = np.searchsorted(keys, np.asarray(starts) - self.longest, side='left')
+        hi = np.searchsorted(keys, ends, side='left')
+        rows = np.repeat(np.arange(len(lo)), hi - lo)
+        if not len(rows):
+            return rows, []
+        candidates = np.concatenate([np.arange(a, b) for a, b in zip(lo, hi)])
+        overlap = np.array(self._ends)[candidates] > np.asarray(starts)[rows]
+        return rows[overlap], [self._jobs[i] for i in candidates[overlap]]
+
+
+class SchedulerException(Exception):
+    """
+    Raised when a batch of jobs can't be added to the schedule.
+
+    Attributes
+    ----------
+    reasons : dict
+       The reason each rejected row of the batch couldn't be scheduled.
+    """
+    def __init__(self, message, reasons=None):
+        super(SchedulerException, self).__init__(message)
+        self.reasons = reasons or {}
+
+def _separation(ra1, dec1, ra2, dec2):
+    """
+    The angular separation, in degrees, between arrays of positions 
+    given in degrees, using the Vincenty formula.
+    """
+    ra1, dec1, ra2, dec2 = [np.radians(a) for a in (ra1, dec1, ra2, dec2)]
+    dra = ra2 - ra1
+    num = np.hypot(np.cos(dec2)*np.sin(dra), np.cos(dec1)*np.sin(dec2) - np.sin(dec1)*np.cos(dec2)*np.cos(dra))
+    den = np.sin(dec1)*np.sin(dec2) + np.cos(dec1)*np.cos(dec2)*np.cos(dra)
+    return np.degrees(np.arctan2(num, den))
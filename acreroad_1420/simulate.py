@@ -0,0 +1,248 @@
+"""
+acreroad_1420 Schedule simulator
+
+Runs the scheduler against a simulated drive and a virtual clock, so
+that a long schedule can be played through in a fraction of the time it
+would take for real. This is useful for checking that a set of
+observations fits together, and for seeing the effect of changes to the
+scheduler.
+
+Examples
+--------
+>>> from acreroad_1420 import drive, simulate
+>>> sim = simulate.Simulator(drive.Drive(simulate=1), start=datetime.datetime(2016, 3, 8, 17, 0))
+>>> sim.at_many(times, script='/home/astro/srt2016/observing.py', positions="h180.0 +56.08", forsec=3600)
+>>> report = sim.run()
+>>> report['idle']
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import tempfile
+import threading
+
+from astropy.coordinates import AltAz
+from astropy.time import Time
+
+from .clock import VirtualClock
+from .drive import Slew
+from .schedule import Scheduler, SchedulerException
+from .supervisor import Supervisor
+from .workers import WorkerPool
+
+
+class SimulatedProcess():
+    """
+    A stand-in for an observation script's process, which provides
+    the parts of the Popen interface which the scheduler uses.
+    """
+    pid = 0
+    stdout = stderr = None
+
+    def __init__(self, command, **kwargs):
+        self.command = command
+        self.returncode = None
+        self._ended = threading.Event()
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        self._ended.wait()
+        return self.returncode
+
+    def terminate(self):
+        self._end(-15)
+
+    def kill(self):
+        self._end(-9)
+
+    def _end(self, returncode):
+        if self.returncode is None:
+            self.returncode = returncode
+        self._ended.set()
+
+
+class SimulatedDrive():
+    """
+    A wrapper around a drive in simulation mode, which takes as long to
+    slew on the virtual clock as the slew model says the real drive
+    would, and then points where it's been told to.
+
+    Everything other than `goto` is passed through to the wrapped drive.
+    """
+    def __init__(self, drive, clock, slew_model=None):
+        self._drive = drive
+        self._clock = clock
+        self._slew_model = slew_model or drive.slew_model
+
+    def __getattr__(self, name):
+        return getattr(self._drive, name)
+
+    def goto(self, skycoord, track=False):
+        altaz = skycoord.transform_to(AltAz(obstime=Time(self._clock.now()), location=self._drive.location))
+        az, alt = altaz.az.value, altaz.alt.value
+        self._clock.advance(float(self._slew_model.estimate(self._drive.az, self._drive.alt, az, alt)))
+        self._drive.target = altaz
+        self._drive.slewing = False
+        self._drive._stat_update(az, alt)
+        slew = Slew(altaz)
+        slew._finish()
+        return slew
+
+
+class Simulator():
+    """
+    Plays a schedule through on a virtual clock.
+
+    The jobs are added to, and carried out by, a real `Scheduler`, but
+    the scheduler's clock only moves when it's waiting for the next
+    event, or when the drive is slewing, and observation scripts aren't
+    actually run.
+
+    Parameters
+    ----------
+    drive : Drive object
+       A drive in simulation mode.
+    start : datetime
+       The time at which the simulation starts. Defaults to now.
+    slew_model : SlewModel
+       The model which decides how long slews actually take. This
+       defaults to the drive's own slew model, which is also what the
+       scheduler uses to plan its slews, but a different model can be
+       given to see what happens when the scheduler's estimates are wrong.
+    quiet : bool
+       Whether to hide the scheduler's output while the simulation runs.
+    rootdir : str
+       The directory the observation scripts would write their data to.
+    """
+    def __init__(self, drive, start=None, slew_model=None, quiet=True, rootdir=tempfile.gettempdir()):
+        self.clock = VirtualClock(start)
+        self.start = self.clock.now()
+        self.drive = SimulatedDrive(drive, self.clock, slew_model)
+        self.quiet = quiet
+        self.rejected = []
+        self._jobs = {}
+        with self._output():
+            self.scheduler = Scheduler(rootdir=rootdir, drive=self.drive, clock=self.clock,
+                                       supervisor=Supervisor(launcher=SimulatedProcess, max_then=None),
+                                       workers=WorkerPool(0), start=False)
+
+
+    def _output(self):
+        return _Silence() if self.quiet else _Nothing()
+
+    def at(self, *args, **kwargs):
+        """
+        Add a job to the schedule, exactly as `Scheduler.at()`, keeping
+        a note of it if it's rejected.
+        """
+        with self._output():
+            idn = self.scheduler.at(*args, **kwargs)
+        if not idn:
+            self.rejected.append({'time': args[0] if args else kwargs.get('time'), 'reason': None})
+        return idn
+
+    def at_many(self, times, *args, **kwargs):
+        """
+        Add a batch of jobs to the schedule, exactly as
+        `Scheduler.at_many()`, keeping a note of the rows which are
+        rejected rather than raising an exception.
+        """
+        try:
+            with self._output():
+                return self.scheduler.at_many(times, *args, **kwargs)
+        except SchedulerException as e:
+            for row, reason in sorted(e.reasons.items()):
+                self.rejected.append({'time': times[row], 'reason': reason})
+            return []
+
+    def _job(self, job):
+        return self._jobs.setdefault(job['id'], {'id': job['id'], 'start': job['start'], 'end': job['end']})
+
+    def _dispatch(self, deadline, action, job):
+        """
+        Carry out a timer action, recording when it happened, and how
+        long the slews took.
+        """
+        record = self._job(job)
+        now = self.clock.now()
+        if action == 'slew':
+            record['slewed'] = now
+        elif action == 'start':
+            record['started'] = now
+            record['lateness'] = (now - job['start']).total_seconds()
+        elif action == 'end':
+            record['ended'] = now
+        self.scheduler.dispatch(deadline, action, job)
+        if action == 'slew':
+            record['slew'] = (self.clock.now() - now).total_seconds()
+
+    def run(self, until=None):
+        """
+        Run the simulation.
+
+        Parameters
+        ----------
+        until : datetime
+           The time at which to stop. By default the simulation runs
+           until there is nothing left in the schedule.
+
+        Returns
+        -------
+        dict
+           A report of the simulation, giving
+           - `jobs`, a list with the id, scheduled start and end, lateness
+             and slew time of each job, and the idle time before it;
+           - `rejected`, the jobs which couldn't be scheduled, and why;
+           - the total `slew` and `idle` times, and the mean and maximum
+             `lateness`, in seconds;
+           - the `elapsed` time on the virtual clock.
+        """
+        with self._output():
+            while True:
+                event = self.scheduler.next_event(until)
+                if not event:
+                    break
+                self._dispatch(*event)
+        return self.report()
+
+    def report(self):
+        """
+        Summarise the jobs which have been simulated so far.
+        """
+        jobs = sorted(self._jobs.values(), key=lambda job: job['start'])
+        free = self.start
+        for job in jobs:
+            job.setdefault('slew', 0.0)
+            began = job.get('slewed', job.get('started'))
+            if began is None:
+                continue
+            # The time the telescope spent doing nothing before this job
+            job['idle'] = max(0.0, (began - free).total_seconds())
+            free = job.get('ended', free)
+        ran = [job for job in jobs if 'started' in job]
+        late = [job['lateness'] for job in ran]
+        return {'jobs': jobs,
+                'rejected': list(self.rejected),
+                'slew': sum(job['slew'] for job in jobs),
+                'idle': sum(job.get('idle', 0.0) for job in jobs),
+                'lateness': {'count': len(late),
+                             'mean': sum(late)/len(late) if late else 0.0,
+                             'max': max(late) if late else 0.0},
+                'elapsed': (self.clock.now() - self.start).total_seconds()}
+
+
+class _Silence():
+    def __enter__(self):
+        self.stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+
+    def __exit__(self, *exc):
+        sys.stdout.close()
+        sys.stdout = self.stdout
+
+class _Nothing():
+    def __enter__(self): pass
+    def __exit__(self, *exc): pass
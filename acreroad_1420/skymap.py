@@ -125,8 +125,8 @@ class Skymap(QtGui.QWidget):
             self.parent().updateStatusBar("Status: Tracking")
 
     def getCurrentPos(self):
-        skycoord =  self.drive.current_position
-        return (skycoord.az.value, skycoord.alt.value)
+        position = self.drive.position
+        return (position.az, position.alt)
 
     def setTargetPos(self,pos):
         if isinstance(pos, tuple):
@@ -0,0 +1,135 @@
+"""
+acreroad_1420 Slew-time model
+
+A physical model of the time the telescope takes to slew between two
+horizontal positions. This is used by the scheduler to decide how far
+in advance of an observation the telescope needs to start moving.
+
+The model is deliberately cheap, and works on numpy arrays as well as
+single positions, so that it can be evaluated for every candidate job.
+"""
+
+try:
+    import ConfigParser
+except ImportError:
+    import configparser as ConfigParser
+
+import numpy as np
+
+
+class SlewModel():
+    """
+    A model of the time taken by the drive to slew between two positions.
+
+    Each axis accelerates at a constant rate up to its maximum speed,
+    cruises, and then decelerates to a stop. Both axes move at the same
+    time, so the slew takes as long as the slower of the two, plus a
+    fixed time for the telescope to settle.
+
+    Parameters
+    ----------
+    speeds : tuple of float, rad/sec
+       The maximum speed of the azimuth and altitude axes.
+    acceleration : float, rad/sec^2
+       The acceleration of each axis.
+    settle : float, sec
+       The time allowed for the telescope to settle after a slew.
+    max_speed : float, rad/sec
+       The maximum speed the drive can be commanded to run at; neither
+       axis speed is allowed to exceed this.
+    learning_rate : float
+       The weight given to each measured slew when refining the model.
+
+    Examples
+    --------
+    >>> model = SlewModel(speeds=(0.034, 0.034))
+    >>> model.estimate(180, 10, 90, 45)
+    """
+
+    def __init__(self, speeds=(0.034, 0.034), acceleration=0.02, settle=2.0, max_speed=None, learning_rate=0.2):
+        speeds = np.array(speeds, dtype=float)
+        if max_speed:
+            speeds = np.minimum(speeds, max_speed)
+        self.speeds = speeds
+        self.acceleration = float(acceleration)
+        self.settle = float(settle)
+        self.learning_rate = learning_rate
+        # The ratio of measured to modelled slew times, which is refined
+        # as slews are observed.
+        self.scale = 1.0
+        self.observations = 0
+
+    @classmethod
+    def from_config(cls, config, max_speed=None):
+        """
+        Create a slew model from the `[calibration]` section of the
+        package configuration.
+        """
+        speeds = [float(speed) for speed in config.get('calibration', 'speeds').split()]
+        kwargs = {}
+        for option in ('acceleration', 'settle'):
+            try:
+                kwargs[option] = float(config.get('calibration', option))
+            except (ConfigParser.NoOptionError, ValueError):
+                # Keep the default for anything which isn't set properly
+                pass
+        return cls(speeds=speeds, max_speed=max_speed, **kwargs)
+
+    def _axis_time(self, distance, speed):
+        """
+        The time taken for a single axis to move a distance, in radians,
+        with a trapezoidal speed profile.
+        """
+        distance = np.abs(distance)
+        a = self.acceleration
+        # The distance taken up by accelerating to full speed and stopping again
+        ramp = speed**2 / a
+        return np.where(distance < ramp,
+                        2*np.sqrt(distance / a),
+                        distance / speed + speed / a)
+
+    def _model(self, az0, alt0, az1, alt1):
+        daz = (np.asarray(az1, dtype=float) - az0 + 180) % 360 - 180
+        dalt = np.asarray(alt1, dtype=float) - alt0
+        t = np.maximum(self._axis_time(np.radians(daz), self.speeds[0]),
+                       self._axis_time(np.radians(dalt), self.speeds[1]))
+        return np.where(t > 0, t + self.settle, 0.0)
+
+    def estimate(self, az0, alt0, az1, alt1):
+        """
+        Estimate the time needed to slew between two positions.
+
+        Parameters
+        ----------
+        az0, alt0 : float or array, degrees
+           The starting azimuth and altitude.
+        az1, alt1 : float or array, degrees
+           The destination azimuth and altitude.
+
+        Returns
+        -------
+        float or array
+           The slew time, in seconds.
+        """
+        return self.scale * self._model(az0, alt0, az1, alt1)
+
+    def observe(self, az0, alt0, az1, alt1, duration):
+        """
+        Refine the model using the measured duration of a slew.
+
+        Parameters
+        ----------
+        az0, alt0 : float, degrees
+           The position the slew started from.
+        az1, alt1 : float, degrees
+           The position the slew finished at.
+        duration : float, seconds
+           The measured duration of the slew.
+        """
+        predicted = float(self._model(az0, alt0, az1, alt1))
+        # Very short slews are dominated by the latency of the
+        # controller, and don't tell us much about the drive.
+        if predicted < 2*self.settle or duration <= 0:
+            return
+        self.scale += self.learning_rate * (duration / predicted - self.scale)
+        self.observations += 1
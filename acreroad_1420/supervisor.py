@@ -0,0 +1,334 @@
+"""
+acreroad_1420 Process supervisor
+
+Starts, watches, and stops the processes which the scheduler runs, that
+is the observation scripts and any `then` commands.
+
+Each process has a reaper thread which blocks until the process exits,
+so its exit code is known as soon as it finishes, without the scheduler
+having to poll it. Stopping a process sends it a SIGTERM, and a SIGKILL
+if it's still running after a grace period. The output of each job is
+written to its own rotating log file, and the `then` commands share
+one. Only a limited number of `then` commands are allowed to run at
+once; any more are queued.
+"""
+
+import collections
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from subprocess import Popen, PIPE
+
+
+# The exit code given to a process which couldn't be started, as a shell does
+FAILED = 127
+
+
+class ProcessHandle():
+    """
+    A handle on a supervised process, which can be waited on.
+
+    The handle exists before the process is started, so it's possible to
+    wait on a job which hasn't started yet. It provides the parts of the
+    Popen interface which the scheduler uses.
+
+    Examples
+    --------
+    >>> handle = jobs.supervisor.handle(idn)
+    >>> handle.wait(timeout=60)
+    0
+
+    Attributes
+    ----------
+    error : Exception
+       Why the process couldn't be started, if it couldn't; its exit
+       code is then `FAILED`.
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.process = None
+        self.returncode = None
+        self.error = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def done(self):
+        """
+        Whether the process has been started and has exited.
+        """
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the process to exit.
+
+        Parameters
+        ----------
+        timeout : float
+           The longest time to wait, in seconds. By default there's no limit.
+
+        Returns
+        -------
+        int or None
+           The exit code of the process, or None if it hadn't exited
+           before the timeout.
+        """
+        self._done.wait(timeout)
+        return self.returncode
+
+    def add_done_callback(self, function):
+        """
+        Call a function, with the handle as its argument, when the
+        process exits. If it already has, the function is called straight away.
+        """
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(function)
+                return
+        function(self)
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        if self.process and not self.done():
+            self.process.terminate()
+
+    def kill(self):
+        if self.process and not self.done():
+            self.process.kill()
+
+    def _fail(self, error):
+        self.error = error
+        self._finish(FAILED)
+
+    def _finish(self, returncode):
+        with self._lock:
+            self.returncode = returncode
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for function in callbacks:
+            try:
+                function(self)
+            except Exception as e:
+                logging.error("Callback for process {} failed: {}".format(self.name, e))
+
+
+class Supervisor():
+    """
+    Runs and supervises the scheduler's processes.
+
+    Parameters
+    ----------
+    logdir : str
+       The directory to write the output of each job to. If this isn't
+       given the processes write to the scheduler's own output.
+    launcher : callable
+       The function used to start processes, which is given the command
+       as a list, and must return an object with the same interface as a
+       `subprocess.Popen`.
+    grace : float
+       How long, in seconds, a process is given to exit after it's sent
+       a SIGTERM, before it's killed.
+    max_then : int
+       The most `then` commands which may run at once. None for no limit.
+    log_size : int
+       The size, in bytes, at which a job's log file is rotated.
+    log_count : int
+       The number of old log files to keep for each job.
+    drain : float
+       How long, in seconds, to wait for the rest of a process's output
+       once it has exited, before its exit is reported.
+    """
+    def __init__(self, logdir=None, launcher=Popen, grace=10, max_then=2, log_size=1<<20, log_count=3,
+                 drain=5):
+        self.logdir = logdir
+        self.grace = grace
+        self.drain = drain
+        self.max_then = max_then
+        self.log_size = log_size
+        self.log_count = log_count
+        self._launch = launcher
+        self._handles = {}
+        self._lock = threading.Lock()
+        self._then_running = 0
+        self._then_queue = collections.deque()
+        self._shared_logs = {}
+        if logdir and not os.path.isdir(logdir):
+            os.makedirs(logdir)
+
+    def handle(self, idn):
+        """
+        Get the handle on a job's observation process, whether or not it
+        has been started.
+        """
+        with self._lock:
+            if idn not in self._handles:
+                self._handles[idn] = ProcessHandle(idn)
+            return self._handles[idn]
+
+    def find(self, idn):
+        """
+        Get the handle on a job's observation process if there is one,
+        without making one.
+        """
+        with self._lock:
+            return self._handles.get(idn)
+
+    def forget(self, idn):
+        """
+        Drop the handle on a job, once nothing needs to wait on it.
+        """
+        with self._lock:
+            self._handles.pop(idn, None)
+
+    def start(self, idn, command):
+        """
+        Start the observation script for a job.
+
+        Returns
+        -------
+        ProcessHandle
+           The handle on the job's process.
+        """
+        handle = self.handle(idn)
+        self._spawn(handle, command, "job-{}".format(idn))
+        return handle
+
+    def adopt(self, idn, process):
+        """
+        Supervise a process which this supervisor didn't start, such as
+        an observation which was left running when the scheduler was
+        restarted. This can't be waited on directly, so it's polled.
+        """
+        handle = self.handle(idn)
+        handle.process = process
+        self._thread(self._poll, handle)
+        return handle
+
+    def stop(self, handle, grace=None):
+        """
+        Ask a process to stop with a SIGTERM, and kill it if it hasn't
+        stopped by the end of the grace period. This doesn't wait for the
+        process to exit.
+        """
+        if handle.done():
+            return handle
+        handle.terminate()
+        grace = self.grace if grace is None else grace
+        self._thread(self._escalate, handle, grace)
+        return handle
+
+    def then(self, command):
+        """
+        Run a `then` command, or queue it if too many are running already.
+        """
+        handle = ProcessHandle(" ".join(command))
+        handle.add_done_callback(self._then_finished)
+        with self._lock:
+            if self.max_then is not None and self._then_running >= self.max_then:
+                self._then_queue.append((handle, command))
+                return handle
+            self._then_running += 1
+        self._spawn_then(handle, command)
+        return handle
+
+    def _then_finished(self, handle):
+        with self._lock:
+            if not self._then_queue:
+                self._then_running -= 1
+                return
+            handle, command = self._then_queue.popleft()
+        self._spawn_then(handle, command)
+
+    def _spawn_then(self, handle, command):
+        """
+        Start a `then` command in the slot which has been kept for it. If
+        it can't be started its handle fails, which frees the slot.
+        """
+        try:
+            self._spawn(handle, command, "then", shared=True)
+        except Exception as e:
+            logging.error("Couldn't start the then command {}: {}".format(handle.name, e))
+            handle._fail(e)
+
+    def _spawn(self, handle, command, logname, shared=False):
+        """
+        Start a process, copying its output into the named log. Every
+        process started with `shared` writes to the same log file, through
+        one handler, so that they don't rotate it from under each other.
+        """
+        if self.logdir:
+            handle.process = self._launch(command, stdout=PIPE, stderr=PIPE)
+            log = self._shared_log(logname) if shared else self._log(logname)
+            streams = [stream for stream in (handle.process.stdout, handle.process.stderr) if stream]
+            pumps = [self._thread(self._pump, stream, log, level)
+                     for stream, level in zip(streams, (logging.INFO, logging.ERROR))]
+        else:
+            handle.process = self._launch(command)
+            log, pumps = None, []
+        self._thread(self._reap, handle, None if shared else log, pumps)
+
+    def _shared_log(self, name):
+        with self._lock:
+            if name not in self._shared_logs:
+                self._shared_logs[name] = self._log(name)
+            return self._shared_logs[name]
+
+    def _log(self, name):
+        log = logging.handlers.RotatingFileHandler(os.path.join(self.logdir, "{}.log".format(name)),
+                                                   maxBytes=self.log_size, backupCount=self.log_count)
+        log.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        return log
+
+    def _thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _pump(self, stream, log, level):
+        """
+        Copy the lines a process writes to one of its streams into its log.
+        """
+        for line in iter(stream.readline, b''):
+            if not isinstance(line, str):
+                line = line.decode('utf-8', 'replace')
+            log.handle(logging.makeLogRecord({'msg': line.rstrip(), 'levelno': level,
+                                              'levelname': logging.getLevelName(level)}))
+        stream.close()
+
+    def _reap(self, handle, log, pumps):
+        """
+        Wait for a process to exit, and then for the rest of its output,
+        closing its log if it has one of its own.
+        """
+        returncode = handle.process.wait()
+        # Anything waiting on the process expects its output to be logged
+        # by the time it's done, but children of the process may hold its
+        # streams open long after it exits, so that's only waited for so long.
+        deadline = time.time() + self.drain
+        for pump in pumps:
+            pump.join(max(0, deadline - time.time()))
+        handle._finish(returncode)
+        for pump in pumps:
+            pump.join()
+        if log:
+            log.close()
+
+    def _poll(self, handle):
+        while handle.process.poll() is None:
+            time.sleep(1)
+        handle._finish(handle.process.returncode)
+
+    def _escalate(self, handle, grace):
+        if handle.wait(grace) is None:
+            logging.warning("Process {} ignored SIGTERM, killing it".format(handle.name))
+            handle.kill()
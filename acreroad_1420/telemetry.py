@@ -0,0 +1,214 @@
+"""
+acreroad_1420 Telemetry
+
+A record of where the telescope has been pointing, so that the position
+at any moment, for example the moment a spectrum was taken, can be
+looked up afterwards.
+
+The positions are kept in a fixed-size ring buffer, so recording one
+doesn't allocate any memory. Once the buffer is full the oldest
+positions are overwritten, unless the history is given a file to spill
+them to.
+"""
+
+import os
+import time
+import datetime
+
+import numpy as np
+
+
+monotonic = getattr(time, 'monotonic', time.time)
+
+# Flags recorded with each position
+SLEWING = 1
+TRACKING = 2
+
+RECORD = np.dtype([('monotonic', 'f8'), ('utc', 'f8'), ('az', 'f8'), ('alt', 'f8'), ('flags', 'u4')])
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def unix_times(times):
+    """
+    Convert times to seconds since 1970, which is how the history records
+    them in UTC. The times can be datetimes, an astropy Time, or numbers
+    which are already seconds since 1970.
+    """
+    if hasattr(times, 'unix'):
+        return np.atleast_1d(times.unix)
+    times = np.atleast_1d(times)
+    if times.dtype == object:
+        return np.array([(t - EPOCH).total_seconds() for t in times])
+    return times.astype(float)
+
+
+class PositionHistory():
+    """
+    A history of the telescope's position.
+
+    Parameters
+    ----------
+    size : int
+       The number of positions which are kept in memory.
+    spill : str
+       The path to a file which positions are written to before they're
+       overwritten in memory. They can be read back with `load()`.
+    chunk : int
+       The number of positions written to the spill file at a time.
+
+    Examples
+    --------
+    >>> history = PositionHistory()
+    >>> history.append(180.0, 45.0)
+    >>> history.at([datetime.datetime.utcnow()])
+    (array([ 180.]), array([ 45.]))
+    """
+    def __init__(self, size=65536, spill=None, chunk=4096):
+        self.size = size
+        self.spill = spill
+        self.chunk = min(chunk, size)
+        self.count = 0
+        # The number of positions which have been written to the spill file
+        self.spilled = 0
+        self._data = np.zeros(size, dtype=RECORD)
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def append(self, az, alt, flags=0, utc=None):
+        """
+        Record a position.
+
+        Parameters
+        ----------
+        az, alt : float
+           The position of the telescope, in degrees.
+        flags : int
+           Any of the `SLEWING` and `TRACKING` flags.
+        utc : float
+           The time, in seconds since 1970. Defaults to now.
+        """
+        row = self.count % self.size
+        if self.spill and self.count - self.spilled >= self.size:
+            # The oldest position is about to be overwritten
+            self._spill(self.spilled + self.chunk)
+        record = self._data[row]
+        record['monotonic'] = monotonic()
+        record['utc'] = time.time() if utc is None else utc
+        record['az'] = az
+        record['alt'] = alt
+        record['flags'] = flags
+        # The position is only visible to readers once it's complete
+        self.count += 1
+
+    def _spill(self, end):
+        """
+        Write the positions up to `end`, counting from the first one
+        recorded, to the spill file.
+        """
+        first = self.spilled % self.size
+        last = first + end - self.spilled
+        with open(self.spill, 'ab') as spill:
+            self._data[first:min(last, self.size)].tofile(spill)
+            if last > self.size:
+                self._data[:last - self.size].tofile(spill)
+        self.spilled = end
+
+    def flush(self):
+        """
+        Write any positions which haven't been spilled yet to the spill
+        file, for example when the telescope is shut down.
+        """
+        if self.spill and self.count > self.spilled:
+            self._spill(self.count)
+
+    def _ordered(self, count=None):
+        """
+        The two segments of the buffer, oldest first.
+        """
+        count = self.count if count is None else count
+        if count <= self.size:
+            return self._data[:count], self._data[:0]
+        head = count % self.size
+        return self._data[head:], self._data[:head]
+
+    def records(self):
+        """
+        A copy of the positions in the buffer, oldest first.
+        """
+        return np.concatenate(self._ordered())
+
+    def latest(self):
+        """
+        The most recent position, or None if nothing is recorded.
+        """
+        count = self.count
+        if not count:
+            return None
+        return self._data[(count - 1) % self.size].copy()
+
+    def at(self, times, monotonic=False):
+        """
+        The position of the telescope at some times, interpolated
+        between the recorded positions.
+
+        Parameters
+        ----------
+        times : array of float, list of datetimes or astropy Time
+           The times, in UTC. If `monotonic` is True these should be
+           values of the monotonic clock instead.
+        monotonic : bool
+           Whether the times are from the monotonic clock.
+
+        Returns
+        -------
+        az, alt : arrays
+           The position at each of the times, in degrees. This is NaN for
+           times outside the history.
+        """
+        field = 'monotonic' if monotonic else 'utc'
+        times = np.atleast_1d(np.asarray(times, dtype=float)) if monotonic else unix_times(times)
+        older, newer = self._ordered()
+        n = len(older) + len(newer)
+        az = np.full(len(times), np.nan)
+        alt = np.full(len(times), np.nan)
+        if n == 0:
+            return az, alt
+        # Count the recorded positions up to each time, searching each
+        # half of the ring separately so that nothing is copied.
+        if len(newer):
+            k = np.where(times < newer[field][0],
+                         np.searchsorted(older[field], times, side='right'),
+                         len(older) + np.searchsorted(newer[field], times, side='right'))
+        else:
+            k = np.searchsorted(older[field], times, side='right')
+        inside = (k > 0) & ((k < n) | (times == self._at(older, newer, n - 1, field)))
+        before, after = np.clip(k - 1, 0, n - 1), np.clip(k, 0, n - 1)
+        t0, t1 = self._at(older, newer, before, field), self._at(older, newer, after, field)
+        span = np.where(t1 > t0, t1 - t0, 1)
+        weight = np.clip((times - t0) / span, 0, 1)
+        az0, az1 = self._at(older, newer, before, 'az'), self._at(older, newer, after, 'az')
+        alt0, alt1 = self._at(older, newer, before, 'alt'), self._at(older, newer, after, 'alt')
+        # Take the short way round in azimuth
+        turn = (az1 - az0 + 180) % 360 - 180
+        az[inside] = ((az0 + weight*turn) % 360)[inside]
+        alt[inside] = (alt0 + weight*(alt1 - alt0))[inside]
+        return az, alt
+
+    def _at(self, older, newer, index, field):
+        index = np.asarray(index)
+        split = len(older)
+        if not len(newer):
+            return older[field][index]
+        return np.where(index < split, older[field][np.minimum(index, split - 1)],
+                        newer[field][np.clip(index - split, 0, len(newer) - 1)])
+
+def load(path):
+    """
+    Read back the positions which a history has spilled to disk, without
+    loading them all into memory.
+    """
+    if not os.path.getsize(path):
+        return np.zeros(0, dtype=RECORD)
+    return np.memmap(path, dtype=RECORD, mode='r')
@@ -0,0 +1,347 @@
+"""
+acreroad_1420 Tracking
+
+Keeps the telescope pointed at a target as it moves across the sky.
+
+Rather than transforming the target's position to horizontal
+coordinates every time the telescope is corrected, its path over the
+next few minutes is calculated in one go, in a single transformation
+over a grid of times, and the position at any moment is interpolated
+from that. The telescope is then kept on the path with small nudges,
+rather than being sent on a new slew each time.
+
+A `RateTracker` also keeps the azimuth drive turning at the rate the
+target moves, so that the telescope moves smoothly with it, and the
+nudges only have to take up what's left over.
+
+Examples
+--------
+>>> tracker = Tracker(connection, SkyCoord(ra=83.6*u.deg, dec=22.0*u.deg))
+>>> tracker.start()
+>>> tracker.stats()
+{'corrections': 12, 'slews': 0, 'error': 0.02, 'max_error': 0.09, 'trajectories': 1}
+"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+from astropy.coordinates import AltAz
+from astropy.time import Time
+
+
+# The rate at which the sky turns, in radians per second
+SIDEREAL_RATE = 7.2921150e-5
+
+
+def equatorial(az, alt, lat):
+    """
+    The hour angle and declination of a horizontal position.
+
+    Parameters
+    ----------
+    az, alt : float or array
+       The position, in radians, with azimuth measured from north
+       through east.
+    lat : float
+       The latitude of the telescope, in radians.
+
+    Returns
+    -------
+    ha, dec : float or array
+       In radians.
+    """
+    sin_dec = np.sin(lat)*np.sin(alt) + np.cos(lat)*np.cos(alt)*np.cos(az)
+    dec = np.arcsin(np.clip(sin_dec, -1, 1))
+    ha = np.arctan2(-np.sin(az)*np.cos(alt), (np.sin(alt) - np.sin(lat)*sin_dec)/np.cos(lat))
+    return ha, dec
+
+def horizontal_rates(ha, dec, lat):
+    """
+    The rates at which the azimuth and altitude of a fixed point on the
+    sky change as the Earth turns.
+
+    Parameters
+    ----------
+    ha, dec : float or array
+       The hour angle and declination of the point, in radians.
+    lat : float
+       The latitude of the telescope, in radians.
+
+    Returns
+    -------
+    daz, dalt : float or array
+       The rates, in radians per second. The azimuth rate becomes very
+       large close to the zenith.
+    """
+    sin_alt = np.sin(lat)*np.sin(dec) + np.cos(lat)*np.cos(dec)*np.cos(ha)
+    cos_alt = np.sqrt(1 - sin_alt**2)
+    dalt = -SIDEREAL_RATE*np.cos(lat)*np.cos(dec)*np.sin(ha)/cos_alt
+    daz = SIDEREAL_RATE*(np.sin(lat) - np.sin(dec)*sin_alt)/cos_alt**2
+    return daz, dalt
+
+
+class Trajectory():
+    """
+    The path of a target across the sky over a period of time.
+
+    Parameters
+    ----------
+    target : SkyCoord
+       The position of the target.
+    location : EarthLocation
+       The location of the telescope.
+    start : float
+       The start of the period, in seconds since 1970.
+    duration : float
+       The length of the period, in seconds.
+    step : float
+       The spacing, in seconds, of the times at which the target's
+       position is calculated.
+    """
+    def __init__(self, target, location, start, duration=600, step=10):
+        self.start = start
+        self.end = start + duration
+        self.times = start + np.arange(0, duration + step, step, dtype=float)
+        altaz = target.transform_to(AltAz(obstime=Time(self.times, format='unix'), location=location))
+        # Unwrapped, so that the azimuth can be interpolated across north
+        self.az = np.degrees(np.unwrap(altaz.az.radian))
+        self.alt = altaz.alt.degree
+
+    def covers(self, t):
+        return self.start <= t <= self.end
+
+    def at(self, t):
+        """
+        The azimuth and altitude of the target at a time, in degrees.
+        """
+        return np.interp(t, self.times, self.az) % 360, np.interp(t, self.times, self.alt)
+
+    def rate(self, t):
+        """
+        The rate at which the target's azimuth and altitude are changing
+        at a time, in degrees per second.
+        """
+        i = int(np.clip(np.searchsorted(self.times, t) - 1, 0, len(self.times) - 2))
+        dt = self.times[i+1] - self.times[i]
+        return (self.az[i+1] - self.az[i])/dt, (self.alt[i+1] - self.alt[i])/dt
+
+
+class Tracker():
+    """
+    Keeps the telescope on a target by nudging it back onto the target's
+    path at a regular cadence.
+
+    Parameters
+    ----------
+    drive : Drive
+       The telescope drive.
+    target : SkyCoord
+       The position of the target.
+    cadence : float
+       The time between corrections, in seconds.
+    horizon : float
+       How far ahead, in seconds, the target's path is calculated. It's
+       calculated again when it's about to run out.
+    step : float
+       The spacing, in seconds, of the times on the path.
+    tolerance : float
+       The pointing error, in degrees, which is tolerated before the
+       telescope is nudged.
+    reslew : float
+       The pointing error, in degrees, above which the telescope is sent
+       on a new slew instead of being nudged.
+    clock : callable
+       Gives the time, in seconds since 1970.
+    """
+    NUDGES = {('az', 1): "NUDGE_EAST", ('az', -1): "NUDGE_WEST",
+              ('alt', 1): "NUDGE_UP", ('alt', -1): "NUDGE_DOWN"}
+
+    def __init__(self, drive, target, cadence=5, horizon=600, step=10, tolerance=0.1, reslew=2.0, clock=time.time):
+        self.drive = drive
+        self.target = target
+        self.cadence = cadence
+        self.horizon = horizon
+        self.step = step
+        self.tolerance = tolerance
+        self.reslew = reslew
+        self.clock = clock
+        self.trajectory = None
+        self.running = False
+        # Counters
+        self.corrections = 0
+        self.slews = 0
+        self.trajectories = 0
+        self.error = None
+        self.max_error = 0
+        self._stopped = threading.Event()
+        # Held while a command is sent, so that none is sent once
+        # stop() has returned
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """
+        Start tracking, on a thread of its own.
+        """
+        self.running = True
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """
+        Stop tracking. No more commands are sent once this returns, and 
+        it waits up to `timeout` seconds for the tracking thread to 
+        finish any correction it's working out.
+        """
+        with self._lock:
+            self.running = False
+            self._stopped.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _send(self, function, *args):
+        """
+        Call a function which sends a command to the drive, unless the
+        tracker has been stopped, which may have happened while the
+        correction was worked out.
+
+        Returns
+        -------
+        bool
+           Whether the command was sent.
+        """
+        with self._lock:
+            if self._stopped.is_set():
+                return False
+            function(*args)
+            return True
+
+    def _run(self):
+        while self.running:
+            try:
+                self.correct()
+            except Exception as e:
+                logging.error("Tracking correction failed: {}".format(e))
+            self._stopped.wait(self.cadence)
+
+    def position(self, t=None):
+        """
+        The position of the target at a time, which defaults to now, in
+        degrees.
+        """
+        t = self.clock() if t is None else t
+        if not self.trajectory or not self.trajectory.covers(t + self.cadence):
+            # Calculate the path a little before now, so that it covers
+            # the times between corrections
+            self.trajectory = Trajectory(self.target, self.drive.location, t - self.step,
+                                         self.horizon, self.step)
+            self.trajectories += 1
+        return self.trajectory.at(t)
+
+    def correct(self):
+        """
+        Compare the telescope's position with the target's, and correct
+        it if it has drifted too far.
+
+        Returns
+        -------
+        float
+           The pointing error, in degrees.
+        """
+        if self.drive.slewing:
+            return None
+        az, alt = self.position()
+        if self.drive.sim:
+            # There's no telescope to correct, so it's taken to follow
+            # the target exactly
+            self.drive._stat_update(az, alt)
+            self.error = 0
+            return self.error
+        current = self.drive.position
+        # The short way round in azimuth
+        daz = (az - current.az + 180) % 360 - 180
+        dalt = alt - current.alt
+        self.error = float(np.hypot(daz*np.cos(np.radians(alt)), dalt))
+        self.max_error = max(self.max_error, self.error)
+        if self.error > self.reslew:
+            logging.info("Tracking error of {:.2f} deg; slewing back to the target".format(self.error))
+            if self._send(self.drive._slew_to, az, alt):
+                self.slews += 1
+        elif self.error > self.tolerance:
+            for axis, offset in (('az', daz), ('alt', dalt)):
+                if abs(offset) > self.tolerance / 2.:
+                    command = self.drive.vocabulary[self.NUDGES[axis, int(np.sign(offset))]]
+                    self._send(self.drive.send, command.format(np.radians(abs(offset))))
+            self.corrections += 1
+        return self.error
+
+    def stats(self):
+        """
+        The numbers of nudges, new slews and paths calculated, and the
+        last and largest pointing errors, in degrees.
+        """
+        return {'corrections': self.corrections, 'slews': self.slews, 'error': self.error,
+                'max_error': self.max_error, 'trajectories': self.trajectories}
+
+
+class RateTracker(Tracker):
+    """
+    Tracks a target by driving the azimuth axis at the target's rate,
+    with nudges to correct whatever drift is left.
+
+    The rates are worked out from the target's hour angle and
+    declination, and the controller is only sent a new rate when it has
+    changed by more than `threshold`. qp only has a rate command for
+    the azimuth axis (``ta``), so the altitude is still kept on the
+    target by nudging.
+
+    Parameters
+    ----------
+    threshold : float
+       The change in the azimuth rate, in degrees per second, which is
+       sent to the controller.
+
+    Other parameters are as for `Tracker`.
+    """
+    def __init__(self, drive, target, threshold=1e-4, **kwargs):
+        Tracker.__init__(self, drive, target, **kwargs)
+        self.threshold = threshold
+        self.rate = None
+        self.rate_updates = 0
+
+    def stop(self, timeout=1.0):
+        Tracker.stop(self, timeout)
+        if self.rate and not self.drive.sim:
+            self.drive.send(self.drive.vocabulary["TRACK_AZ"].format(0))
+        self.rate = None
+
+    def rates(self, t=None):
+        """
+        The rates at which the target's azimuth and altitude are changing
+        at a time, which defaults to now, in degrees per second.
+        """
+        az, alt = self.position(t)
+        lat = self.drive.location.latitude.radian
+        ha, dec = equatorial(np.radians(az), np.radians(alt), lat)
+        return tuple(np.degrees(horizontal_rates(ha, dec, lat)))
+
+    def correct(self):
+        error = Tracker.correct(self)
+        if error is None or self.drive.sim or self._stopped.is_set():
+            return error
+        daz, dalt = self.rates()
+        daz = float(np.clip(daz, -np.degrees(self.drive.MAX_SPEED), np.degrees(self.drive.MAX_SPEED)))
+        if self.rate is None or abs(daz - self.rate) > self.threshold:
+            if self._send(self.drive.send, self.drive.vocabulary["TRACK_AZ"].format(np.radians(daz))):
+                self.rate = daz
+                self.rate_updates += 1
+        return error
+
+    def stats(self):
+        stats = Tracker.stats(self)
+        stats.update({'rate': self.rate, 'rate_updates': self.rate_updates})
+        return stats
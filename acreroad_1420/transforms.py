@@ -0,0 +1,231 @@
+"""
+acreroad_1420 Transform cache
+
+Remembers the results of coordinate transformations, since the same
+ones are asked for over and over: the telescope's position on every
+update of the GUI, the sources in the catalogue, the Galactic plane,
+and the targets of slews.
+
+Each result is kept under the frame the position is given in, the
+frame it's wanted in, the position rounded to `precision` degrees, the
+location of the observer, and, for anything involving horizontal
+coordinates, the time rounded down to `resolution` seconds. The
+transformation is done at the start of the time bucket, and, by
+`convert`, for the rounded position, so its results are the same
+whether or not they came from the cache. A result is out by at most
+the precision, plus the distance the sky turns in `resolution`
+seconds (15 arcseconds a second).
+
+Once there are more than `size` results the least recently used ones
+are forgotten.
+
+Examples
+--------
+>>> CACHE.convert('altaz', 150.0, 40.0, 'icrs', 1476576000.3, (55.9, -4.3))
+(43.2450, 9.1585)
+>>> CACHE.stats()
+{'hits': 0, 'misses': 1, 'entries': 1, 'hit_rate': 0.0}
+"""
+
+import collections
+import threading
+
+import numpy as np
+
+from . import CONFIGURATION as config
+from . import coordinates
+
+
+def _convert(frame, lon, lat, to, t, site):
+    """
+    Transform a position between horizontal ('altaz'), 'icrs' and
+    'galactic' coordinates, with the functions in `coordinates`.
+    """
+    if frame == to:
+        return lon, lat
+    elif frame == 'galactic':
+        lon, lat = coordinates.galactic_to_icrs(lon, lat)
+    elif frame == 'altaz':
+        lon, lat = coordinates.altaz_to_icrs(lon, lat, t, *site)
+    elif frame != 'icrs':
+        raise ValueError("Unknown frame {}".format(frame))
+    if to == 'galactic':
+        return coordinates.icrs_to_galactic(lon, lat)
+    elif to == 'altaz':
+        return coordinates.icrs_to_altaz(lon, lat, t, *site)
+    elif to != 'icrs':
+        raise ValueError("Unknown frame {}".format(to))
+    return lon, lat
+
+def site(location):
+    """
+    The latitude and longitude of an astropy `EarthLocation`, in
+    degrees, as the cache uses them.
+    """
+    return (float(location.latitude.degree), float(location.longitude.degree))
+
+
+class TransformCache():
+    """
+    A bounded cache of coordinate transformations.
+
+    Results can be looked up from any thread.
+
+    Parameters
+    ----------
+    resolution : float
+       The width, in seconds, of the time buckets.
+    precision : float
+       The step, in degrees, which positions are rounded to.
+    size : int
+       The most results which are kept.
+    """
+    def __init__(self, resolution=1.0, precision=1e-4, size=4096):
+        self.resolution = resolution
+        self.precision = precision
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _round(self, angle):
+        """
+        The key for an angle, or an array of them, and the rounded angle.
+        """
+        steps = np.round(np.asarray(angle, dtype=float) / self.precision).astype(np.int64)
+        if steps.ndim:
+            return tuple(steps.ravel()), steps * self.precision
+        return int(steps), int(steps) * self.precision
+
+    def bucket(self, t):
+        """
+        The time bucket of a time in seconds since 1970, and the time at
+        its start.
+        """
+        bucket = int(t // self.resolution)
+        return bucket, bucket * self.resolution
+
+    def get(self, key, compute):
+        """
+        The result kept under `key`, or if there isn't one, the result of
+        calling `compute`, which is then kept.
+        """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                # Put it back as the most recently used
+                self._entries[key] = value
+                self.hits += 1
+                return value
+        # Worked out outside the lock, so that a slow transformation
+        # doesn't hold up other threads
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return value
+
+    def convert(self, frame, lon, lat, to, t=None, site=None):
+        """
+        Transform a position between frames.
+
+        Parameters
+        ----------
+        frame, to : str
+           The frames to transform from and to: 'altaz', 'icrs' or
+           'galactic'.
+        lon, lat : float or array
+           The position, in degrees.
+        t : float
+           The time, in seconds since 1970; only needed for 'altaz'.
+        site : tuple
+           The latitude and longitude of the observer, in degrees; only
+           needed for 'altaz'.
+
+        Returns
+        -------
+        lon, lat : float or array
+           In degrees.
+        """
+        (lon_key, lon), (lat_key, lat) = self._round(lon), self._round(lat)
+        if 'altaz' in (frame, to):
+            bucket, t = self.bucket(t)
+        else:
+            # Nothing here depends on the time or the place
+            bucket = site = None
+        key = (frame, to, lon_key, lat_key, site, bucket)
+
+        def transform():
+            result = _convert(frame, lon, lat, to, t, site)
+            for part in result:
+                if isinstance(part, np.ndarray):
+                    # Every caller gets the same arrays
+                    part.flags.writeable = False
+            return result
+        return self.get(key, transform)
+
+    def altaz(self, skycoord, t, location):
+        """
+        The horizontal position of an astropy coordinate, transformed by
+        astropy.
+
+        Only positions in frames which don't depend on the time (ICRS,
+        Galactic, and FK5) are kept; others are transformed every time.
+
+        Parameters
+        ----------
+        skycoord : SkyCoord
+           A single position.
+        t : float
+           The time, in seconds since 1970.
+        location : EarthLocation
+           The location of the observer.
+
+        Returns
+        -------
+        az, alt : float
+           In degrees.
+        """
+        from astropy.coordinates import AltAz
+        from astropy.time import Time
+
+        def transform(t):
+            altaz = skycoord.transform_to(AltAz(obstime=Time(t, format='unix'), location=location))
+            return float(altaz.az.degree), float(altaz.alt.degree)
+
+        frame = skycoord.frame.name
+        if frame not in ('icrs', 'galactic', 'fk5'):
+            return transform(t)
+        if frame == 'fk5':
+            frame = 'fk5 {}'.format(skycoord.frame.equinox)
+        spherical = skycoord.frame.spherical
+        (lon_key, _), (lat_key, _) = self._round(spherical.lon.degree), self._round(spherical.lat.degree)
+        bucket, t = self.bucket(t)
+        key = (frame, 'astropy altaz', lon_key, lat_key, site(location), bucket)
+        return self.get(key, lambda: transform(t))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """
+        The numbers of hits and misses, the number of results kept, and
+        the fraction of lookups which were hits.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                    'hit_rate': float(self.hits) / lookups if lookups else None}
+
+
+# The cache which the drive, the skymap and the radio sources share
+CACHE = TransformCache(resolution=float(config.get('coordinates', 'resolution')),
+                       precision=float(config.get('coordinates', 'precision')),
+                       size=int(config.get('coordinates', 'size')))
@@ -0,0 +1,171 @@
+"""
+acreroad_1420 Observation workers
+
+Observation scripts can be written as plugins, that is a function in an
+importable module which takes the position to observe, the path of the
+file to write the data to, and the length of the observation in seconds:
+
+>>> def observe(position, outfile, duration, args=None):
+...     ...
+
+and scheduled by giving the scheduler the function, or its name in the
+form "module:function", as the script.
+
+A plugin is run in a worker, which is a python interpreter that has
+already been started and has imported the heavy modules an observation
+needs, and which is just waiting to be told what to observe. The pool
+keeps a number of these ready, so that a job doesn't wait for an
+interpreter to start.
+"""
+
+from __future__ import print_function
+
+import collections
+import os
+import pickle
+import pkgutil
+import shutil
+import sys
+import threading
+import traceback
+import importlib
+from subprocess import Popen, PIPE
+
+# The modules which workers import while they wait for a job
+PRELOAD = ('numpy', 'astropy.units', 'astropy.coordinates', 'astropy.time')
+
+Plugin = collections.namedtuple('Plugin', 'module function ra dec outfile duration args')
+
+def plugin_name(script):
+    """
+    The name of a plugin, in the form "module:function", if `script` is a
+    plugin function or the name of one, otherwise None.
+
+    Raises
+    ------
+    ValueError
+       If `script` is a function which a worker couldn't import by name,
+       such as one defined in `__main__`, a lambda, or a closure.
+    """
+    if hasattr(script, '__call__'):
+        module, name = getattr(script, '__module__', None), getattr(script, '__name__', None)
+        if not module or module == '__main__' or getattr(sys.modules.get(module), name, None) is not script:
+            raise ValueError("The plugin {!r} can't be imported by a worker; it must be a function "
+                             "defined at the top level of a module other than __main__.".format(script))
+        return "{}:{}".format(module, name)
+    if not script or os.path.exists(script) or script.count(":") != 1:
+        return None
+    module, function = script.split(":")
+    try:
+        if pkgutil.find_loader(module) is None:
+            return None
+    except ImportError:
+        return None
+    return script
+
+
+class WorkerPool():
+    """
+    A pool of warm workers, which observation plugins are run in.
+
+    Parameters
+    ----------
+    size : int
+       The number of workers to keep ready. If this is zero a worker is
+       started when a plugin is launched.
+    preload : list of str
+       The modules the workers should import while they're waiting.
+    launcher : callable
+       The function used to start processes.
+
+    Examples
+    --------
+    >>> pool = workers.WorkerPool(2, preload=workers.PRELOAD + ('gnuradio.gr',))
+    >>> jobs = schedule.Scheduler(drive=connection, workers=pool)
+    """
+    def __init__(self, size=2, preload=PRELOAD, launcher=Popen):
+        self.size = size
+        self.preload = list(preload)
+        self._launch = launcher
+        self._spare = collections.deque()
+        self._lock = threading.Lock()
+        self._fill()
+
+    def _spawn(self):
+        # The workers should be able to import whatever the scheduler can
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+        return self._launch([sys.executable, "-m", __name__] + self.preload,
+                            stdin=PIPE, stdout=PIPE, stderr=PIPE, env=env)
+
+    def _fill(self):
+        with self._lock:
+            while len(self._spare) < self.size:
+                self._spare.append(self._spawn())
+
+    def launch(self, command, **kwargs):
+        """
+        Start a command, which may be a plugin, in which case it is run in
+        a worker. This has the same interface as `subprocess.Popen`.
+        """
+        if not isinstance(command, Plugin):
+            return self._launch(command, **kwargs)
+        with self._lock:
+            worker = None
+            while self._spare and worker is None:
+                worker = self._spare.popleft()
+                if worker.poll() is not None: worker = None
+        if worker is None:
+            worker = self._spawn()
+        worker.stdin.write(pickle.dumps(tuple(command), 2))
+        worker.stdin.close()
+        # Replace the worker without holding up the job
+        threading.Thread(target=self._fill).start()
+        # The worker's output is piped, so if it isn't wanted it has to
+        # be passed on
+        for stream, name in ((worker.stdout, 'stdout'), (worker.stderr, 'stderr')):
+            if kwargs.get(name) != PIPE:
+                _copy(stream, getattr(sys, name))
+        return worker
+
+    def close(self):
+        """
+        Stop the workers which are waiting for a job.
+        """
+        with self._lock:
+            self.size = 0
+            while self._spare:
+                self._spare.popleft().kill()
+
+def _copy(source, destination):
+    thread = threading.Thread(target=shutil.copyfileobj,
+                              args=(source, getattr(destination, 'buffer', destination)))
+    thread.daemon = True
+    thread.start()
+
+def run(task):
+    """
+    Run an observation plugin.
+    """
+    from astropy.coordinates import SkyCoord
+    import astropy.units as u
+    plugin = Plugin(*task)
+    function = getattr(importlib.import_module(plugin.module), plugin.function)
+    position = SkyCoord(plugin.ra, plugin.dec, unit=(u.deg, u.deg), frame='icrs')
+    if plugin.args:
+        return function(position, plugin.outfile, plugin.duration, args=plugin.args)
+    return function(position, plugin.outfile, plugin.duration)
+
+def main(preload):
+    for module in preload:
+        importlib.import_module(module)
+    # Wait for a job
+    task = pickle.load(getattr(sys.stdin, 'buffer', sys.stdin))
+    try:
+        run(task)
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
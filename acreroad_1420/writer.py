@@ -0,0 +1,354 @@
+"""
+acreroad_1420 Command writer
+
+Sends commands to the drive controller from a single thread, so that
+the threads which issue commands, such as the GUI and the tracking
+timer, never wait on the serial port.
+
+Commands are queued in the order they're given, with two exceptions.
+A motion command which hasn't been sent yet is replaced by any later
+one, as only the latest target matters. A stop jumps to the front of
+the queue, behind any other stops, and clears out every command
+waiting behind it which would move the telescope.
+
+Only some commands are answered by the controller. The rest are done
+as soon as they've been written.
+
+While the connection to the controller is down the writer is paused,
+and commands wait in the queue until it's resumed.
+"""
+
+import collections
+import logging
+import threading
+
+from . import protocol
+from .link import ConnectionLost
+
+
+# Commands which move the telescope to a target
+MOTION = ("gh", "ge")
+# Commands which stop the telescope
+STOPS = ("x", "X")
+# Every command which sets the telescope moving, which a stop cancels
+MOVES = MOTION + ("gU", "gD", "gE", "gW", "gH", "nu", "nd", "ne", "nw", "ta")
+
+# The letter of the reply to each command which the controller answers
+REPLIES = {"gh": 'g', "ge": 'g', "S": 'S'}
+
+# The command letter which each kind of reply acknowledges
+ACKNOWLEDGES = {protocol.Arrived: 'g', protocol.Endstop: 'g',
+                protocol.Calibration: 'c', protocol.StatusReport: 'S'}
+
+
+class CommandCancelled(Exception):
+    pass
+
+
+class CommandFuture():
+    """
+    The eventual outcome of a command.
+
+    A command is `written` once it has been sent down the serial port,
+    and is done once the controller has replied to it, or once it has
+    been replaced by a later command.
+    """
+    def __init__(self, command):
+        self.command = command
+        self.written = threading.Event()
+        self._done = threading.Event()
+        self._reply = None
+        self._exception = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def verb(self):
+        return self.command.split()[0] if self.command.strip() else ""
+
+    @property
+    def expects(self):
+        """
+        The letter of the reply which the controller will send to the
+        command, or None if it won't reply.
+        """
+        if self.command.strip() == "c":
+            # A calibration run reports the offsets it found; setting
+            # the calibration isn't answered
+            return 'c'
+        return REPLIES.get(self.verb)
+
+    def done(self):
+        return self._done.is_set()
+
+    def cancelled(self):
+        return isinstance(self._exception, CommandCancelled)
+
+    def exception(self):
+        return self._exception
+
+    def add_done_callback(self, function):
+        """
+        Call a function, with the future as its argument, once the 
+        command is done, or straight away if it already is.
+        """
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(function)
+                return
+        function(self)
+
+    def result(self, timeout=None):
+        """
+        Wait for the controller's reply to the command.
+
+        Parameters
+        ----------
+        timeout : float
+           The longest time to wait, in seconds. By default there's no limit.
+
+        Returns
+        -------
+        record
+           The reply; see `acreroad_1420.protocol`.
+
+        Raises
+        ------
+        ControllerError
+           If the controller reports an error in response to the command.
+        CommandCancelled
+           If the command was replaced before it was sent.
+        ReplyLost
+           If too many later commands were sent while waiting for the
+           reply.
+        """
+        if not self._done.wait(timeout):
+            return None
+        if self._exception:
+            raise self._exception
+        return self._reply
+
+    def _resolve(self, reply=None, exception=None):
+        with self._lock:
+            self._reply, self._exception = reply, exception
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for function in callbacks:
+            function(self)
+
+
+class CommandWriter():
+    """
+    A queue of commands for the drive controller, which is drained by
+    its own thread.
+
+    Parameters
+    ----------
+    port : serial.Serial
+       The open serial port.
+    pending : int
+       The most sent commands which are kept waiting for a reply. Once
+       there are more, the oldest fails with `ReplyLost`.
+    paused : bool
+       Whether to wait for `resume()` before sending anything, for
+       example because the port isn't connected yet.
+    """
+    def __init__(self, port, pending=64, paused=False):
+        self.port = port
+        self.running = True
+        self.paused = paused
+        self.written = 0
+        self.coalesced = 0
+        self.pending = pending
+        self._queue = collections.deque()
+        self._awaiting = collections.deque()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._write)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, command):
+        """
+        Queue a command to be sent to the controller.
+
+        Parameters
+        ----------
+        command : str
+           The command, without its newline.
+
+        Returns
+        -------
+        CommandFuture
+           The outcome of the command.
+        """
+        future = CommandFuture(command)
+        verb = future.verb
+        with self._condition:
+            if verb in STOPS:
+                for queued in [queued for queued in self._queue if queued.verb in MOVES]:
+                    self._queue.remove(queued)
+                    queued._resolve(exception=CommandCancelled("Cancelled by {}".format(command)))
+                # Behind any stops which are already waiting, so they're
+                # sent in the order they were given
+                self._after_stops([future])
+            elif verb in MOTION:
+                for i, queued in enumerate(self._queue):
+                    if queued.verb in MOTION:
+                        self._queue[i] = future
+                        queued._resolve(exception=CommandCancelled("Superseded by {}".format(command)))
+                        self.coalesced += 1
+                        break
+                else:
+                    self._queue.append(future)
+            else:
+                self._queue.append(future)
+            self._condition.notify()
+        return future
+
+    def stop(self):
+        with self._condition:
+            self.running = False
+            self._condition.notify()
+
+    def pause(self, exception=None):
+        """
+        Stop sending commands, because the connection has been lost.
+
+        Commands which were sent but haven't been answered can't be
+        relied on. Motion commands are queued to be sent again, as
+        sending one twice does no harm, unless a later motion command,
+        or a stop, is already waiting; any others fail with `exception`.
+        """
+        exception = exception or ConnectionLost("The connection was lost before a reply")
+        with self._condition:
+            self.paused = True
+            unanswered = list(self._awaiting)
+            self._awaiting.clear()
+            failed = []
+            for future in reversed(unanswered):
+                if future.verb in MOTION and not any(queued.verb in MOTION + STOPS for queued in self._queue):
+                    self._queue.appendleft(future)
+                else:
+                    failed.append(future)
+        for future in failed:
+            future._resolve(exception=exception)
+
+    def resume(self, commands=()):
+        """
+        Start sending commands again.
+
+        Parameters
+        ----------
+        commands : list of str
+           Commands to send before any which are queued, other than
+           stops, for example to set up the controller again after it
+           has been reconnected.
+
+        Returns
+        -------
+        list of CommandFuture
+           The outcomes of the `commands`.
+        """
+        futures = [CommandFuture(command) for command in commands]
+        with self._condition:
+            # Stops which were given while the writer was paused still
+            # go first
+            self._after_stops(futures)
+            self.paused = False
+            self._condition.notify()
+        return futures
+
+    def _after_stops(self, futures):
+        """
+        Put commands at the front of the queue, behind any stops. This
+        must be called while holding the condition.
+        """
+        stops = 0
+        while stops < len(self._queue) and self._queue[stops].verb in STOPS:
+            stops += 1
+        self._queue.rotate(-stops)
+        self._queue.extendleft(reversed(futures))
+        self._queue.rotate(stops)
+
+    def _write(self):
+        while True:
+            with self._condition:
+                while self.running and (self.paused or not self._queue):
+                    self._condition.wait()
+                if not self.running:
+                    return
+                future = self._queue.popleft()
+                # Replies can arrive as soon as the command is written
+                self._awaiting.append(future)
+                lost = []
+                while len(self._awaiting) > self.pending:
+                    lost.append(self._awaiting.popleft())
+            for waiting in lost:
+                waiting._resolve(exception=ReplyLost(
+                    "No reply to {} came before {} more commands were sent".format(
+                        waiting.command, self.pending)))
+            try:
+                self.port.write((future.command + "\n").encode('ascii'))
+            except ConnectionLost:
+                # Send the command once the connection is back, unless
+                # pause() has already dealt with it
+                with self._condition:
+                    if future in self._awaiting:
+                        self._awaiting.remove(future)
+                        self._queue.appendleft(future)
+                    self.paused = not self.port.connected.is_set()
+                continue
+            except Exception as e:
+                logging.error("Failed to send {} to the drive: {}".format(future.command, e))
+                with self._condition:
+                    self._awaiting.remove(future)
+                future._resolve(exception=e)
+            else:
+                self.written += 1
+                if future.expects is None:
+                    # There won't be a reply to wait for
+                    with self._condition:
+                        if future in self._awaiting:
+                            self._awaiting.remove(future)
+                    future._resolve()
+            future.written.set()
+
+    def acknowledge(self, record):
+        """
+        Match a reply from the controller with the command it answers,
+        which is the oldest unanswered command expecting a reply with
+        the same letter. An error answers the oldest unanswered command
+        which expects any reply.
+        """
+        if isinstance(record, protocol.Error):
+            letter, exception = None, ControllerError(record.text)
+        elif isinstance(record, protocol.Reply):
+            letter, exception = record.text[:1], None
+        elif type(record) in ACKNOWLEDGES:
+            letter, exception = ACKNOWLEDGES[type(record)], None
+        else:
+            return
+        with self._condition:
+            for future in self._awaiting:
+                if future.expects is not None and letter in (None, future.expects):
+                    self._awaiting.remove(future)
+                    break
+            else:
+                return
+        if exception:
+            future._resolve(exception=exception)
+        else:
+            future._resolve(record)
+
+
+class ControllerError(Exception):
+    """
+    An error reported by the drive controller.
+    """
+
+
+class ReplyLost(Exception):
+    """
+    The controller's reply to a command was given up on.
+    """
+    pass
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_coordinates
+-----------------
+Benchmark for the fast coordinate conversions, against astropy.
+
+Run from the top of the repository with
+
+    PYTHONPATH=. python benchmarks/bench_coordinates.py [n]
+
+The conversions which the GUI makes on every update, from the
+telescope's position to ICRS and Galactic coordinates, are timed both
+ways, one position at a time, and then for `n` positions at once. The
+largest difference between the two is reported too.
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+import numpy as np
+from astropy.coordinates import SkyCoord, EarthLocation, AltAz, ICRS, Galactic
+from astropy.time import Time
+import astropy.units as u
+
+from acreroad_1420 import coordinates, transforms
+
+
+ACRE_ROAD = EarthLocation(lat=55.9024278*u.deg, lon=-4.307582*u.deg, height=61*u.m)
+SITE = (ACRE_ROAD.latitude.degree, ACRE_ROAD.longitude.degree)
+
+
+def with_astropy(az, alt, t):
+    position = SkyCoord(AltAz(az=az*u.deg, alt=alt*u.deg, obstime=Time(t, format='unix'), location=ACRE_ROAD))
+    icrs = position.transform_to(ICRS)
+    galactic = position.transform_to(Galactic)
+    return icrs.ra.degree, icrs.dec.degree, galactic.l.degree, galactic.b.degree
+
+def with_coordinates(az, alt, t):
+    ra, dec = coordinates.altaz_to_icrs(az, alt, t, *SITE)
+    l, b = coordinates.icrs_to_galactic(ra, dec)
+    return ra, dec, l, b
+
+def best(function, *args):
+    times = []
+    for i in range(5):
+        tick = time.time()
+        result = function(*args)
+        times.append(time.time() - tick)
+    return min(times), result
+
+def main(n=10000):
+    n = int(n)
+    now = time.time()
+    slow, exact = best(with_astropy, 150.0, 40.0, now)
+    fast, result = best(with_coordinates, 150.0, 40.0, now)
+    print("One position: astropy {:.2f} ms, coordinates {:.3f} ms ({:.0f} times faster)".format(
+        1000*slow, 1000*fast, slow/fast))
+
+    random = np.random.RandomState(1)
+    az = random.uniform(0, 360, n)
+    alt = np.degrees(np.arcsin(random.uniform(0, 1, n)))
+    t = now + random.uniform(0, 86400, n)
+    slow, exact = best(with_astropy, az, alt, t)
+    fast, result = best(with_coordinates, az, alt, t)
+    print("{} positions: astropy {:.1f} ms, coordinates {:.1f} ms ({:.0f} times faster)".format(
+        n, 1000*slow, 1000*fast, slow/fast))
+    ra, dec = np.radians(result[:2])
+    ra0, dec0 = np.radians(exact[:2])
+    h = np.sin((dec - dec0)/2)**2 + np.cos(dec)*np.cos(dec0)*np.sin((ra - ra0)/2)**2
+    print("Largest difference: {:.2f} arcsec, with UT1 taken to be UTC".format(
+        3600*np.degrees(2*np.arcsin(np.sqrt(h))).max()))
+
+    cache = transforms.TransformCache()
+    cached, result = best(cache.convert, 'altaz', 150.0, 40.0, 'icrs', now, SITE)
+    print("One position from the cache: {:.3f} ms ({})".format(1000*cached, cache.stats()))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
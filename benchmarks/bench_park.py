@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_park
+-----------------
+Benchmark for the time from starting `srt_park` to its command arriving
+at the drive controller.
+
+Run from the top of the repository with
+
+    PYTHONPATH=. python benchmarks/bench_park.py [runs]
+
+A pseudo-terminal stands in for the controller. Each run starts a new
+interpreter running `python -m acreroad_1420.park wind`, and times how
+long it takes for the stow command to come out of the other end.
+
+By default srt_park waits for the controller to send a line before
+sending anything, since the Arduino resets when the port is opened.
+That's timed with a controller which answers straight away, and with
+one which never answers, which costs the whole configured boot time.
+It's also timed with `--settle 0`, which doesn't wait at all. For
+comparison the time to start an interpreter which does nothing, and to
+import the full drive (if astropy is installed), are also measured.
+"""
+
+from __future__ import print_function
+
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+import tty
+
+
+def time_to_command(device, master, settle=None, answer=False):
+    """
+    Start srt_park, and wait for its command on the controller's side
+    of the terminal. If `answer` is set the controller sends a line
+    every 10 ms, as a controller which is running reports its position.
+    """
+    command = [sys.executable, "-m", "acreroad_1420.park", "wind", "--device", device]
+    if settle is not None:
+        command += ["--settle", str(settle)]
+    done = threading.Event()
+    if answer:
+        # Opening the port throws away anything which was sent before
+        def chatter():
+            while not done.wait(0.01):
+                os.write(master, b"#ready\n")
+        threading.Thread(target=chatter).start()
+    start = time.time()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    received = b""
+    while b"\n" not in received:
+        ready, _, _ = select.select([master], [], [], 10)
+        if not ready:
+            done.set()
+            process.kill()
+            raise RuntimeError("Nothing arrived: {}".format(process.communicate()))
+        received += os.read(master, 64)
+    elapsed = time.time() - start
+    done.set()
+    process.wait()
+    assert received.strip() == b"X", received
+    return elapsed
+
+def time_to_run(code):
+    start = time.time()
+    status = subprocess.call([sys.executable, "-c", code], stderr=open(os.devnull, "w"))
+    return time.time() - start if status == 0 else None
+
+def report(name, times):
+    times = sorted(times)
+    print("{:<24} median {:7.1f} ms   best {:7.1f} ms".format(name, 1000*times[len(times)//2], 1000*times[0]))
+
+def main(runs=10):
+    master, slave = os.openpty()
+    tty.setraw(master)
+    device = os.ttyname(slave)
+
+    report("interpreter start", [time_to_run("pass") for i in range(runs)])
+    report("srt_park --settle 0", [time_to_command(device, master, settle=0) for i in range(runs)])
+    report("srt_park, answered", [time_to_command(device, master, answer=True) for i in range(runs)])
+    # This takes the whole boot time each run, so it's only done a few times
+    report("srt_park, unanswered", [time_to_command(device, master) for i in range(min(runs, 3))])
+    drive = [time_to_run("import acreroad_1420.drive") for i in range(runs)]
+    if None in drive:
+        print("The drive can't be imported here, so it isn't compared.")
+    else:
+        report("importing the drive", drive)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
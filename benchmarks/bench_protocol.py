@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_protocol
+-----------------
+Benchmark for parsing the lines which the drive controller sends.
+
+Run from the top of the repository with
+
+    PYTHONPATH=. python benchmarks/bench_protocol.py [traffic] [nlines]
+
+where `traffic` is a file of lines recorded from the controller. Without
+one, traffic with the mix of lines which qp sends while slewing is made
+up. The drive's parser is compared with the chain of comparisons which
+it replaced.
+"""
+
+from __future__ import print_function
+
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from acreroad_1420 import CONFIGURATION as config
+from acreroad_1420 import drive
+
+
+def synthetic(nlines):
+    """
+    Make up some traffic: mostly status lines and encoder clicks, with
+    the occasional reply or comment.
+    """
+    random.seed(1420)
+    lines = []
+    for i in range(nlines):
+        kind = random.random()
+        if kind < 0.6:
+            lines.append("s {},{:.6e},{:.6e}\n".format(i, random.uniform(0, 6.28), random.uniform(0, 1.57)))
+        elif kind < 0.9:
+            lines.append("a{},{},{},{:.6e},{:.6e}\n".format(random.choice("zl"), i, i, random.uniform(0, 6.28), random.uniform(0, 1.57)))
+        elif kind < 0.95:
+            lines.append(">S Taz={:.4f} Talt={:.4f} t={}\n".format(random.uniform(0, 6.28), random.uniform(0, 1.57), i))
+        elif kind < 0.98:
+            lines.append(">g A {:.4f} {:.4f}\n".format(random.uniform(0, 6.28), random.uniform(0, 1.57)))
+        else:
+            lines.append("#qp heartbeat {}\n".format(i))
+    return lines
+
+def legacy_parse(self, string):
+    """
+    The parser which was in the drive before the protocol module.
+    """
+    if len(string)<1: return 0
+    logging.debug(string)
+    if string[0]==">":
+        if string[1]=="S":
+            d = string[2:].split()
+            out = {}
+            for field in d:
+                key, val = field.split("=")
+                out[key] = val
+            try:
+                az, alt = out['Taz'], out['Talt']
+            except KeyError:
+                logging.error('Key missing from the status output {}'.format(out))
+            return out
+        if string[1:3] == "g E":
+            logging.info("The telescope appears to have hit an end-stop.")
+        if string[1:4] == "g A":
+            self.slewing = False
+            self._slew_complete()
+            logging.info("The telescope has reached {}".format(string[3:]))
+        if string[1]=='c':
+            logging.info("Calibration completed. New values are {}".format(string[2:]))
+            self.calibrating=False
+            self.config.set('offsets','calibration',string[2:])
+            self.calibration = string[2:]
+        else:
+            logging.info(string[1:])
+    elif string[0]=="s" and len(string)>1:
+        d = string[2:].strip('\n').split(",")
+        if len(d) > 3: return
+        az, alt = self._parse_floats(d[1]), self._parse_floats(d[2])
+        self._stat_update( self._r2d(az), self._r2d(alt) )
+        return d
+    elif string[0]=="a":
+        if string[1]=="z" or string[1]=="l":
+            d = string.split(",")
+            self._stat_update(self._r2d(self._parse_floats(d[3])), self._r2d(self._parse_floats(d[4])))
+    elif string[0]=="!":
+        logging.error(string[1:])
+    elif string[0]=="#":
+        logging.info(string[1:])
+
+def rate(parse, lines):
+    tick = time.time()
+    for line in lines:
+        parse(line)
+    return len(lines) / (time.time() - tick)
+
+def main(traffic=None, nlines=200000):
+    if traffic:
+        with open(traffic) as f:
+            lines = f.readlines()
+    else:
+        lines = synthetic(int(nlines))
+
+    # The configured log is on the telescope's computer
+    config.set('logs', 'logfile', os.path.join(tempfile.mkdtemp(), "srt_drive.log"))
+    connection = drive.Drive(simulate=1)
+    before = rate(lambda line: legacy_parse(connection, line), lines)
+    after = rate(connection.parse, lines)
+
+    print("Parsed {} lines".format(len(lines)))
+    print("Before: {:.0f} lines/s".format(before))
+    print("After:  {:.0f} lines/s ({:.1f}x)".format(after, after/before))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
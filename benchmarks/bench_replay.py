@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_replay
+-----------------
+Benchmark for the drive's parser, played a capture of the traffic from
+the controller.
+
+Run from the top of the repository with
+
+    PYTHONPATH=. python benchmarks/bench_replay.py [capture] [nlines]
+
+where `capture` is a file recorded with `Drive(..., capture=...)`.
+Without one, a capture of the made-up traffic from bench_protocol is
+written to a temporary file first. The capture is played back as fast
+as possible through the parser of a drive in simulation mode, and the
+rate and memory used are reported.
+"""
+
+from __future__ import print_function
+
+import gc
+import os
+import sys
+import tempfile
+
+from acreroad_1420 import CONFIGURATION as config
+from acreroad_1420 import capture, drive
+
+from bench_protocol import synthetic
+
+
+def main(path=None, nlines=200000):
+    if not path:
+        handle, path = tempfile.mkstemp(suffix=".cap")
+        os.close(handle)
+        os.remove(path)
+        recorder = capture.Recorder(path)
+        for line in synthetic(int(nlines)):
+            recorder.line(line)
+        recorder.close()
+
+    # The configured log is on the telescope's computer
+    config.set('logs', 'logfile', os.path.join(tempfile.mkdtemp(), "srt_drive.log"))
+    connection = drive.Drive(simulate=1, homeonstart=False)
+    # Warm up, so that the first calls don't count
+    capture.replay(path, connection.parse)
+
+    gc.collect()
+    blocks = getattr(sys, 'getallocatedblocks', lambda: None)()
+    stats = capture.replay(path, connection.parse)
+    gc.collect()
+    print("Replayed {lines} lines in {seconds:.2f} s: {rate:.0f} lines/s".format(**stats))
+    if blocks is not None:
+        retained = sys.getallocatedblocks() - blocks
+        print("Memory blocks kept afterwards: {} ({:.3f} per line)".format(retained, float(retained)/stats['lines']))
+
+    try:
+        import tracemalloc
+    except ImportError:
+        return
+    tracemalloc.start()
+    capture.replay(path, connection.parse)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("Peak memory while replaying: {:.1f} kB".format(peak/1024.))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
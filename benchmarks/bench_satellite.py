@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_satellite
+-----------------
+Benchmark for tracking a satellite: how long it takes to work out a
+pass, and how closely a simulated drive follows it.
+
+Run from the top of the repository with
+
+    PYTHONPATH=. python benchmarks/bench_satellite.py [tle-file] [step]
+
+where `tle-file` holds a satellite's name and two-line elements. Without
+one, an old set of elements for the ISS is used, and the pass after the
+epoch of the elements is tracked.
+
+The simulated drive receives each command after a serial delay, and
+then moves each axis towards the commanded position at the speed in
+the slew model. The tracking error is reported for several values of
+the tracker's lead.
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+import numpy as np
+from astropy.coordinates import EarthLocation
+import astropy.units as u
+
+from acreroad_1420 import satellite
+from acreroad_1420.drive import Snapshot
+from acreroad_1420.slew import SlewModel
+
+
+ISS = ["ISS (ZARYA)",
+       "1 25544U 98067A   08264.51782528 -.00002182  00000-0 -11606-4 0  2927",
+       "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537"]
+
+ACRE_ROAD = EarthLocation(lat=55.9024278*u.deg, lon=-4.307582*u.deg, height=61*u.m)
+
+
+class SimulatedMount():
+    """
+    A drive which takes time to hear about, and to carry out, each move.
+    """
+    sim = 0
+    slewing = False
+
+    def __init__(self, location, speeds, delay):
+        self.location = location
+        self.speeds = np.degrees(speeds)
+        self.delay = delay
+        self.now = 0
+        self.current = np.array([0.0, 0.0])
+        self.commands = []
+        self.target = None
+
+    @property
+    def position(self):
+        return Snapshot(self.current[0] % 360, self.current[1], self.now)
+
+    def _slew_to(self, az, alt):
+        self.commands.append((self.now + self.delay, np.array([az, alt])))
+
+    def advance(self, t):
+        while self.commands and self.commands[0][0] <= t:
+            self.target = self.commands.pop(0)[1]
+        if self.target is not None:
+            offset = self.target - self.current
+            offset[0] = (offset[0] + 180) % 360 - 180
+            limit = self.speeds * (t - self.now)
+            self.current = self.current + np.clip(offset, -limit, limit)
+        self.now = t
+
+def follow(tle, start, lead, cadence=0.5, delay=0.3, dt=0.05):
+    """
+    Track a pass with a simulated mount, returning the error, in
+    degrees, every `dt` seconds.
+    """
+    mount = SimulatedMount(ACRE_ROAD, SlewModel().speeds, delay)
+    clock = lambda: mount.now
+    tracker = satellite.SatelliteTracker(mount, tle, cadence=cadence, lead=lead, start=start, clock=clock)
+    # Start on the satellite as it rises
+    mount.current = np.array(tracker.position(tracker.rise))
+    mount.now = tracker.rise
+    errors = []
+    next_command = tracker.rise
+    for t in np.arange(tracker.rise, tracker.set, dt):
+        mount.advance(t)
+        if t >= next_command:
+            tracker.correct()
+            next_command += cadence
+        now = tracker.position(t)
+        errors.append(satellite._separation((mount.current[0] % 360, mount.current[1]), now))
+    return np.array(errors), tracker
+
+def main(path=None, step=0.1):
+    tle = open(path).read() if path else ISS
+    start = satellite.unix(satellite.body(tle)._epoch)
+    rise, setting = satellite.next_pass(tle, ACRE_ROAD, start)
+    print("Pass of {:.0f} s".format(setting - rise))
+
+    times = []
+    for i in range(3):
+        tick = time.time()
+        path = satellite.PassTrajectory(tle, ACRE_ROAD, rise, setting - rise, float(step))
+        times.append(time.time() - tick)
+    print("Trajectory of {} positions: {:.1f} ms ({:.1f} us per position)".format(
+        len(path.times), 1000*min(times), 1e6*min(times)/len(path.times)))
+
+    print("{:>6} {:>10} {:>10} {:>10} {:>9}".format("lead", "median", "95%", "max", "commands"))
+    for lead in (0, 0.3, 0.6, 1.0, 2.0):
+        errors, tracker = follow(tle, start, lead)
+        print("{:5.1f}s {:9.3f}d {:9.3f}d {:9.3f}d {:9d}".format(
+            lead, np.median(errors), np.percentile(errors, 95), errors.max(), tracker.commands))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
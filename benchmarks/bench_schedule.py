@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+bench_schedule
+-----------------
+Benchmark for loading a large number of jobs into the scheduler.
+
+Run from the top of the repository with
+
+    PYTHONPATH=. python benchmarks/bench_schedule.py [njobs] [journal]
+
+Pass a non-zero second argument to record the jobs in a schedule journal,
+and time how long it takes to restore them.
+"""
+
+from __future__ import print_function
+
+import datetime
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+from astropy.coordinates import SkyCoord
+import astropy.units as u
+from astropy.utils import iers
+
+# Don't time repeated attempts to download the IERS tables on machines
+# without a network connection.
+iers.conf.auto_download = False
+
+from acreroad_1420 import CONFIGURATION as config
+from acreroad_1420 import drive, schedule
+
+
+def main(njobs=50000, journal=0):
+    handle, script = tempfile.mkstemp(suffix=".sh")
+    os.write(handle, b"#!/bin/sh\n")
+    os.close(handle)
+    os.chmod(script, stat.S_IRWXU)
+
+    # Keep the drive's log, the job logs and the journal out of the way
+    rootdir = tempfile.mkdtemp()
+    config.set('logs', 'logfile', os.path.join(rootdir, "srt_drive.log"))
+    connection = drive.Drive(simulate=1)
+    if journal:
+        journal = os.path.join(rootdir, "schedule.journal")
+    jobs = schedule.Scheduler(rootdir=rootdir, drive=connection, journal=journal or None)
+    position = SkyCoord(ra=10*u.deg, dec=20*u.deg, frame="icrs")
+    first = datetime.datetime.now() + datetime.timedelta(days=1)
+
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        # Drift scans, a minute long, every five minutes
+        tick = time.time()
+        for i in range(njobs):
+            jobs.at(first + datetime.timedelta(seconds=300*i), script=script, position=position, forsec=60)
+        elapsed = time.time() - tick
+
+        tick = time.time()
+        for i in range(1000):
+            jobs.schedule.overlapping(first + datetime.timedelta(seconds=300*i*njobs/1000.), 
+                                      first + datetime.timedelta(seconds=300*i*njobs/1000. + 3600))
+        query = (time.time() - tick)/1000.
+
+        if journal:
+            tick = time.time()
+            jobs.journal.flush()
+            flushed = time.time() - tick
+            jobs.stop()
+            tick = time.time()
+            jobs = schedule.Scheduler(rootdir=rootdir, drive=connection, journal=journal)
+            replay = time.time() - tick
+    finally:
+        sys.stdout = stdout
+        jobs.stop()
+        os.remove(script)
+        shutil.rmtree(rootdir, ignore_errors=True)
+
+    print("Inserted {} jobs in {:.2f} s ({:.1f} us per job)".format(len(jobs.schedule), elapsed, 1e6*elapsed/njobs))
+    print("Overlap query for one hour takes {:.1f} us".format(1e6*query))
+    if journal:
+        print("The journal took a further {:.2f} s to flush, and {:.1f} ms to restore".format(flushed, 1e3*replay))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -40,7 +40,7 @@ setup(
     #             'acreroad_1420'},
     entry_points = {
         'gui_scripts': [ 'srt_skymap = acreroad_1420.__main__:main'],
-        'console_scripts' : ['srt_park = acreroad_1420.__main__:park'],
+        'console_scripts' : ['srt_park = acreroad_1420.park:main'],
     },
     include_package_data=True,
     install_requires=requirements,
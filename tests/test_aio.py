@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_aio
+-----------------
+Tests for the acreroad_1420.aio module
+"""
+
+
+import unittest
+import fcntl
+import os
+import struct
+import sys
+import termios
+import tty
+
+if sys.version_info < (3, 6):
+    raise unittest.SkipTest("The asyncio drive needs Python 3.6")
+
+import asyncio
+
+from acreroad_1420 import aio, drive, protocol
+
+class FakeSerial():
+    """
+    One end of a pseudo-terminal, standing in for the serial port.
+    """
+    def __init__(self):
+        self.controller, self.port = os.openpty()
+        tty.setraw(self.port)
+        os.set_blocking(self.port, False)
+
+    def fileno(self):
+        return self.port
+
+    @property
+    def in_waiting(self):
+        waiting = fcntl.ioctl(self.port, termios.FIONREAD, struct.pack('I', 0))
+        return struct.unpack('I', waiting)[0]
+
+    def read(self, size=1):
+        return os.read(self.port, 4096)
+
+class FakeDrive():
+    sim = 0
+    reader = None
+    recorder = None
+    position = drive.Snapshot(0, 0, 0)
+
+    def __init__(self):
+        self.ser = FakeSerial()
+        self.slew = drive.Slew(None)
+
+    def parse(self, line):
+        record = protocol.decode(line)
+        if isinstance(record, protocol.Status):
+            self.position = drive.Snapshot(record.az, record.alt, record.time)
+        elif isinstance(record, protocol.Arrived):
+            self.slew._finish()
+        return record
+
+    def home(self):
+        return 1
+
+class TestAsyncDrive(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.drive = FakeDrive()
+        self.telescope = aio.AsyncDrive(self.drive, loop=self.loop)
+
+    def testPositionsShared(self):
+        first, second = self.telescope.positions(), self.telescope.positions()
+        # Start both consumers listening
+        waiting = [asyncio.ensure_future(consumer.__anext__(), loop=self.loop) for consumer in (first, second)]
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        os.write(self.drive.ser.controller, b"s 1,1.5e0,")
+        os.write(self.drive.ser.controller, b"5e-1\n")
+        positions = self.loop.run_until_complete(asyncio.wait_for(asyncio.gather(*waiting), 1))
+        self.assertEqual([(p.az, p.alt) for p in positions], [(1.5, 0.5), (1.5, 0.5)])
+
+    def testHomeWaitsForArrival(self):
+        home = asyncio.ensure_future(self.telescope.home(timeout=1), loop=self.loop)
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        self.assertFalse(home.done())
+        os.write(self.drive.ser.controller, b">g A\n")
+        self.assertTrue(self.loop.run_until_complete(home).arrived)
+
+    def testHungUpPortDropped(self):
+        os.close(self.drive.ser.controller)
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+        self.assertIsNone(self.telescope._fileno)
+
+    def testFailedSlewRaises(self):
+        self.drive.slew._finish("The telescope hit an end-stop.")
+        with self.assertRaises(drive.ControllerException):
+            self.loop.run_until_complete(self.telescope.home(timeout=1))
+
+    def tearDown(self):
+        self.telescope.close()
+        self.loop.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_capture
+-----------------
+Tests for the acreroad_1420.capture module
+"""
+
+
+import unittest
+import os
+import tempfile
+import time
+
+from acreroad_1420 import capture
+from acreroad_1420.reader import LineReader
+
+class TestCapture(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+        os.remove(self.path)
+        self.recorder = capture.Recorder(self.path)
+
+    def testRoundTrip(self):
+        self.recorder.command("gh 1.00 0.50")
+        self.recorder.line(b"s 0,1e0,5e-1\n")
+        self.recorder.close()
+        records = list(capture.read(self.path))
+        self.assertEqual([(r.kind, r.data) for r in records],
+                         [(capture.COMMAND, b"gh 1.00 0.50"), (capture.LINE, b"s 0,1e0,5e-1\n")])
+        self.assertLessEqual(records[0].time, records[1].time)
+
+    def testReaderRecordsLines(self):
+        reader = LineReader(None, lambda line: None, recorder=self.recorder)
+        reader.feed(b"s 0,1e0,5e-1\n>g A")
+        # Lines are recorded as they're parsed
+        reader.drain()
+        self.recorder.close()
+        self.assertEqual([r.data for r in capture.read(self.path)], [b"s 0,1e0,5e-1\n"])
+
+    def testFlushedWithoutClosing(self):
+        recorder = capture.Recorder(self.path + ".now", interval=0)
+        recorder.line(b"s 0,1e0,5e-1\n")
+        self.assertEqual([r.data for r in capture.read(self.path + ".now")], [b"s 0,1e0,5e-1\n"])
+        recorder.close()
+        recorder.line(b"s 1,1e0,5e-1\n")
+        os.remove(self.path + ".now")
+
+    def testReplay(self):
+        for i in range(100):
+            self.recorder.line("s {},1e0,5e-1\n".format(i))
+        self.recorder.command("x")
+        self.recorder.close()
+        lines, commands = [], []
+        stats = capture.replay(self.path, lines.append, commands.append)
+        self.assertEqual((stats['lines'], stats['commands']), (100, 1))
+        self.assertEqual(lines[-1], b"s 99,1e0,5e-1\n")
+        self.assertEqual(commands, ["x"])
+
+    def testReplayInRealTime(self):
+        self.recorder.line(b"s 0,1e0,5e-1\n")
+        time.sleep(0.2)
+        self.recorder.line(b"s 1,1e0,5e-1\n")
+        self.recorder.close()
+        stats = capture.replay(self.path, lambda line: None, realtime=True, speed=2)
+        self.assertGreater(stats['seconds'], 0.09)
+
+    def testTruncatedRecordIgnored(self):
+        self.recorder.line(b"s 0,1e0,5e-1\n")
+        self.recorder.close()
+        with open(self.path, 'ab') as f:
+            f.write(capture.HEADER.pack(0, capture.LINE, 20) + b"s 1")
+        self.assertEqual(len(list(capture.read(self.path))), 1)
+
+    def tearDown(self):
+        self.recorder.close()
+        os.remove(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
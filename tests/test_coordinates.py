@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_coordinates
+-----------------
+Tests for the acreroad_1420.coordinates module
+"""
+
+
+import unittest
+
+import numpy as np
+from astropy.coordinates import SkyCoord, EarthLocation, AltAz, ICRS, Galactic
+from astropy.time import Time
+from astropy.utils import iers
+import astropy.units as u
+
+from acreroad_1420 import coordinates
+
+# Use the tables which come with astropy, so the tests work offline
+iers.conf.auto_download = False
+
+ACRE_ROAD = EarthLocation(lat=55.9024278*u.deg, lon=-4.307582*u.deg, height=61*u.m)
+LATITUDE, LONGITUDE = ACRE_ROAD.latitude.degree, ACRE_ROAD.longitude.degree
+
+
+def separation(lon1, lat1, lon2, lat2):
+    """
+    The angle between two positions, in degrees.
+    """
+    lon1, lat1, lon2, lat2 = np.radians([lon1, lat1, lon2, lat2])
+    # The haversine formula, which is accurate for small angles
+    h = np.sin((lat2 - lat1)/2)**2 + np.cos(lat1)*np.cos(lat2)*np.sin((lon2 - lon1)/2)**2
+    return np.degrees(2*np.arcsin(np.sqrt(h)))
+
+
+class TestCoordinates(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(42)
+        n = 200
+        self.az = random.uniform(0, 360, n)
+        self.alt = np.degrees(np.arcsin(random.uniform(0.05, 1, n)))
+        # Times inside the IERS tables which come with astropy
+        self.times = random.uniform(Time("2010-01-01").unix, Time("2016-01-01").unix, n)
+        self.obstime = Time(self.times, format='unix')
+        self.dut1 = self.obstime.delta_ut1_utc
+        self.frame = AltAz(obstime=self.obstime, location=ACRE_ROAD)
+
+    def testAltAzToICRS(self):
+        exact = SkyCoord(az=self.az*u.deg, alt=self.alt*u.deg, frame=self.frame).transform_to(ICRS)
+        ra, dec = coordinates.altaz_to_icrs(self.az, self.alt, self.times, LATITUDE, LONGITUDE, self.dut1)
+        error = separation(ra, dec, exact.ra.degree, exact.dec.degree)
+        self.assertLess(error.max(), coordinates.TOLERANCE)
+
+    def testICRSToAltAz(self):
+        ra, dec = self.az, self.alt - 30
+        exact = SkyCoord(ra=ra*u.deg, dec=dec*u.deg).transform_to(self.frame)
+        az, alt = coordinates.icrs_to_altaz(ra, dec, self.times, LATITUDE, LONGITUDE, self.dut1)
+        error = separation(az, alt, exact.az.degree, exact.alt.degree)
+        self.assertLess(error.max(), coordinates.TOLERANCE)
+
+    def testWithoutUT1(self):
+        exact = SkyCoord(az=self.az*u.deg, alt=self.alt*u.deg, frame=self.frame).transform_to(ICRS)
+        ra, dec = coordinates.altaz_to_icrs(self.az, self.alt, self.times, LATITUDE, LONGITUDE)
+        error = separation(ra, dec, exact.ra.degree, exact.dec.degree)
+        self.assertLess(error.max(), coordinates.POINTING_TOLERANCE)
+
+    def testGalactic(self):
+        ra, dec = self.az, self.alt - 30
+        exact = SkyCoord(ra=ra*u.deg, dec=dec*u.deg).transform_to(Galactic)
+        l, b = coordinates.icrs_to_galactic(ra, dec)
+        self.assertLess(separation(l, b, exact.l.degree, exact.b.degree).max(), coordinates.GALACTIC_TOLERANCE)
+        back = coordinates.galactic_to_icrs(l, b)
+        self.assertLess(separation(ra, dec, back[0], back[1]).max(), 1e-6/3600)
+
+    def testRoundTrip(self):
+        ra, dec = coordinates.altaz_to_icrs(self.az, self.alt, self.times, LATITUDE, LONGITUDE)
+        az, alt = coordinates.icrs_to_altaz(ra, dec, self.times, LATITUDE, LONGITUDE)
+        self.assertLess(separation(az, alt, self.az, self.alt).max(), 0.01/3600)
+
+    def testScalars(self):
+        ra, dec = coordinates.altaz_to_icrs(180.0, 34.1, 1476576000.0, 55.9, -4.3)
+        self.assertEqual(np.shape(ra), ())
+        self.assertAlmostEqual(dec, 0, delta=0.2)
+
+    def testSiderealTime(self):
+        exact = self.obstime.sidereal_time('apparent', longitude=ACRE_ROAD.longitude).degree
+        fast = coordinates.sidereal_time(self.times, LONGITUDE, self.dut1)
+        difference = (fast - exact + 180) % 360 - 180
+        self.assertLess(np.abs(difference).max(), coordinates.TOLERANCE)
+
+    def testSignedDMS(self):
+        self.assertEqual(coordinates.signed_dms(-12.5), (-1, 12, 30, 0))
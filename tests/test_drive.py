@@ -9,13 +9,14 @@ Tests for the acreroad_1420.drive module
 
 
 import unittest
+import threading
 
 from astropy.coordinates import SkyCoord
 from astropy.coordinates import ICRS, Galactic, FK4, FK5
 from astropy.coordinates import Angle, Latitude, Longitude
 import astropy.units as u
 
-from acreroad_1420 import drive
+from acreroad_1420 import drive, coordinates
 
 class TestDrive(unittest.TestCase):
     def setUp(self):
@@ -24,6 +25,18 @@ class TestDrive(unittest.TestCase):
     def testCalibrate(self):
         self.assertEqual(self.connection.calibrate(), ">c 000 000")
 
+    def testReconnectAfterCalibration(self):
+        resumed = []
+        class Writer():
+            def resume(self, commands=()):
+                resumed.append(commands)
+        class Link():
+            reconnects = 1
+        self.connection.parse(">c 450 650\n")
+        self.connection.writer = Writer()
+        self.connection._connection_changed(Link(), True)
+        self.assertEqual(resumed[0][1], "c 450.000000 650.000000")
+
     def testCalibrateWithValues(self):
         self.assertEqual(self.connection.calibrate("450 650"), 1)
 
@@ -43,17 +56,65 @@ class TestDrive(unittest.TestCase):
 
         c = SkyCoord(frame="galactic", l="1h12m43.2s", b="+1d12m43s")
 
-        self.assertEqual(self.connection.goto(c), 1)
+        slew = self.connection.goto(c)
+        self.assertIsInstance(slew, drive.Slew)
+        self.assertEqual(slew.target, self.connection.target)
 
     def testStatusRADEC(self):
+        self.connection._stat_update(150.0, 40.0)
+        c = self.connection.skycoord().transform_to(ICRS)
+        status = self.connection.status()
+        position = SkyCoord(ra=status['ra']*u.deg, dec=status['dec']*u.deg)
+        self.assertLess(position.separation(c).degree, coordinates.POINTING_TOLERANCE)
+        
+    def testGotoSlewArrives(self):
         c = SkyCoord(frame="galactic", l="1h12m43.2s", b="+1d12m43s")
+        self.assertTrue(self.connection.goto(c).wait(1))
+
+    def testArrivalFinishesSlew(self):
+        slew = self.connection._slew = drive.Slew(None)
+        self.assertFalse(slew.wait(0.01))
+        self.connection.parse(">g A 1.2 0.5\n")
+        self.assertTrue(slew.wait(0))
+        self.assertTrue(self.connection.slewSuccess())
+
+    def testEndstopFailsSlew(self):
+        slew = self.connection._slew = drive.Slew(None)
+        self.connection.parse(">g E\n")
+        with self.assertRaises(drive.ControllerException):
+            slew.wait(0)
+
+    def testSnapshotCantChange(self):
+        with self.assertRaises(AttributeError):
+            self.connection.position.az = 10
+
+    def testSnapshotsCoherentUnderLoad(self):
+        # The altitude is always a quarter of the azimuth, so a reader
+        # which mixed two updates would see a different ratio.
+        lines = ["s 0,{0:.4f},{1:.6f}\n".format(a, a/4) for a in [i*1e-3 for i in range(1, 6000)]]
+        self.connection.parse(lines.pop(0))
+        done = threading.Event()
+        failures = []
+        def read():
+            last = 0
+            while not done.is_set():
+                position = self.connection.position
+                if abs(position.alt*4 - position.az) > 1e-6 * max(1, position.az) or position.sequence < last:
+                    failures.append(position)
+                last = position.sequence
+        readers = [threading.Thread(target=read) for i in range(8)]
+        for reader in readers:
+            reader.start()
+        start = self.connection.position.sequence
+        for line in lines:
+            self.connection.parse(line)
+        done.set()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(failures, [])
+        self.assertEqual(self.connection.position.sequence, start + len(lines))
+        self.assertEqual(self.connection.az, self.connection.position.az)
 
-        self.connection.goto(c)
-
-        c = c.transform_to(frame=ICRS)
-        
-        self.assertEqual(self.connection.status()['ra'].value, c.ra.value)
-        
     def testHome(self):
         self.assertEqual(self.connection.home(), 1)
         
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_flowgraphs
+-----------------
+Tests for the acreroad_1420.flowgraphs module
+"""
+
+
+import unittest
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+from acreroad_1420 import flowgraphs
+
+# Stands in for grcc, writing out a flowgraph's contents as a python file
+GRCC = """#!/bin/sh
+sleep 0.2
+echo "# $(cat $3)" > $2/top_block.py
+"""
+
+class TestFlowgraphCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        grcc = os.path.join(self.directory, "grcc")
+        with open(grcc, "w") as f:
+            f.write(GRCC)
+        os.chmod(grcc, stat.S_IRWXU)
+        self.flowgraph = os.path.join(self.directory, "observing.grc")
+        with open(self.flowgraph, "w") as f:
+            f.write("first")
+        self.cache = flowgraphs.FlowgraphCache(os.path.join(self.directory, "cache"), grcc=grcc)
+        self.command = [grcc, "-e", self.flowgraph]
+
+    def compiled(self, command):
+        with open(command[1]) as f:
+            return f.read().strip()
+
+    def testCompiledOnce(self):
+        self.cache.prepare(self.flowgraph)
+        self.assertTrue(self.cache.wait(self.flowgraph, 5))
+        first = self.cache.command(self.command)
+        self.assertEqual(first[0], sys.executable)
+        self.assertEqual(self.compiled(first), "# first")
+        self.assertEqual(self.cache.command(self.command), first)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 0))
+        self.assertGreater(stats['saved'], 0.1)
+
+    def testCompilingDoesNotWait(self):
+        tick = time.time()
+        self.assertEqual(self.cache.command(self.command), self.command)
+        self.assertLess(time.time() - tick, 0.1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+        self.assertTrue(self.cache.wait(self.flowgraph, 5))
+        self.assertEqual(self.compiled(self.cache.command(self.command)), "# first")
+
+    def testEditedFlowgraphRecompiled(self):
+        self.cache.prepare(self.flowgraph)
+        self.cache.wait(self.flowgraph, 5)
+        self.assertEqual(self.compiled(self.cache.command(self.command)), "# first")
+        time.sleep(0.01)
+        with open(self.flowgraph, "w") as f:
+            f.write("second")
+        self.cache.prepare(self.flowgraph)
+        self.cache.wait(self.flowgraph, 5)
+        self.assertEqual(self.compiled(self.cache.command(self.command)), "# second")
+
+    def testOtherCommandsUntouched(self):
+        self.assertEqual(self.cache.command(["/bin/true"]), ["/bin/true"])
+
+    def testFailedCompileFallsBack(self):
+        self.cache.grcc = "/bin/false"
+        command = ["/bin/false", "-e", self.flowgraph]
+        self.assertEqual(self.cache.command(command), command)
+        self.assertFalse(self.cache.wait(self.flowgraph, 5))
+        self.assertEqual(self.cache.command(command), command)
+        self.cache.wait(self.flowgraph, 5)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_link
+-----------------
+Tests for the acreroad_1420.link module
+"""
+
+
+import unittest
+import threading
+
+from acreroad_1420 import link
+
+class FakePort():
+    """
+    A serial port which reads status lines until it's unplugged.
+    """
+    def __init__(self, device, baud, timeout=None):
+        self.device = device
+        self.unplugged = False
+        self.quiet = False
+        self.written = []
+
+    def read(self, size=1):
+        if self.unplugged:
+            raise IOError("device disconnected")
+        return b"" if self.quiet else b"s 0,0,0\n"
+
+    def write(self, data):
+        if self.unplugged:
+            raise IOError("device disconnected")
+        self.written.append(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class Controller():
+    """
+    Opens fake ports, on devices which are present.
+    """
+    def __init__(self, devices, quiet=False):
+        self.devices = devices
+        self.quiet = quiet
+        self.opened = []
+
+    def open(self, device, baud, timeout=None, **kwargs):
+        if device not in self.devices:
+            raise IOError("no such device {}".format(device))
+        self.opened.append(FakePort(device, baud, timeout))
+        self.opened[-1].quiet = self.quiet
+        return self.opened[-1]
+
+    def ports(self):
+        return [(device, "", "") for device in self.devices]
+
+class TestSerialLink(unittest.TestCase):
+    def setUp(self):
+        self.controller = Controller(["/dev/ttyACM0"])
+        self.link = link.SerialLink("/dev/ttyACM0", 19200, timeout=0.05, silence=0.5,
+                                    backoff=0.01, opener=self.controller.open, ports=self.controller.ports)
+        self.changes = []
+        self.reconnected = threading.Event()
+        def listen(link, connected):
+            self.changes.append(connected)
+            if connected and link.reconnects:
+                self.reconnected.set()
+        self.link.add_listener(listen)
+        self.link.start()
+        self.assertTrue(self.link.connected.wait(1))
+
+    def testReconnectsToNewDevice(self):
+        # The Arduino comes back under a different name
+        self.controller.devices = ["/dev/ttyACM1"]
+        self.controller.opened[-1].unplugged = True
+        self.assertEqual(self.link.read(), b"")
+        self.assertTrue(self.reconnected.wait(1))
+        self.assertEqual(self.link.stats()['device'], "/dev/ttyACM1")
+        self.assertEqual(self.link.read(), b"s 0,0,0\n")
+        self.assertEqual(self.changes, [True, False, True])
+        self.assertIsNotNone(self.link.stats()['last_outage'])
+
+    def testWriteWhileLostRaises(self):
+        self.controller.devices = []
+        self.controller.opened[-1].unplugged = True
+        with self.assertRaises(link.ConnectionLost):
+            self.link.write(b"gU\n")
+        with self.assertRaises(link.ConnectionLost):
+            self.link.write(b"gU\n")
+        self.controller.devices = ["/dev/ttyACM0"]
+        self.assertTrue(self.reconnected.wait(1))
+        self.link.write(b"gU\n")
+        self.assertEqual(self.controller.opened[-1].written, [b"gU\n"])
+
+    def testSilenceReconnects(self):
+        self.controller.opened[-1].quiet = True
+        self.assertTrue(self.reconnected.wait(2))
+        self.assertEqual(self.link.reconnects, 1)
+
+    def testFilenoBeforeConnecting(self):
+        with self.assertRaises(link.ConnectionLost):
+            link.SerialLink("/dev/ttyACM0", 19200).fileno()
+
+    def tearDown(self):
+        self.link.stop()
+
+class TestDriveLink(unittest.TestCase):
+    def testStowFallsBackToOtherDevice(self):
+        controller = Controller(["/dev/ttyS0", "/dev/ttyACM1"])
+        connection = link.DriveLink("/dev/ttyACM0", 19200, opener=controller.open, ports=controller.ports)
+        connection.stow()
+        self.assertEqual(connection.device, "/dev/ttyACM1")
+        self.assertTrue(connection.ready)
+        self.assertEqual(controller.opened[-1].written, [b"X\n"])
+
+    def testWaitsForController(self):
+        controller = Controller(["/dev/ttyACM0"], quiet=True)
+        connection = link.DriveLink("/dev/ttyACM0", 19200, settle=0.1, opener=controller.open, ports=controller.ports)
+        self.assertFalse(connection.ready)
+
+    def testMissingController(self):
+        controller = Controller([])
+        with self.assertRaises(link.ConnectionLost):
+            link.DriveLink("/dev/ttyACM0", 19200, opener=controller.open, ports=controller.ports)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_planner
+-----------------
+Tests for the acreroad_1420.planner module
+"""
+
+
+import unittest
+import datetime
+
+import numpy as np
+from astropy.coordinates import SkyCoord, AltAz
+from astropy.time import Time
+import astropy.units as u
+
+from acreroad_1420 import planner, slew
+
+class TestPlanner(unittest.TestCase):
+    def setUp(self):
+        self.planner = planner.Planner(slew_model=slew.SlewModel(), step=300)
+        self.start = datetime.datetime(2016, 3, 8, 18, 0)
+        self.end = self.start + datetime.timedelta(hours=6)
+        # The last target never rises at Acre Road
+        self.positions = SkyCoord(ra=[10, 80, 200, 300, 150, 0]*u.deg, dec=[60, 40, 70, 50, 85, -80]*u.deg, frame="icrs")
+
+    def testHorizontalPositions(self):
+        self.planner.plan(self.positions, 600, self.start, self.end, origin=(180, 45), budget=0)
+        when = Time(self.start, format="datetime") + self.planner.times[10]*u.second
+        altaz = self.positions.transform_to(AltAz(obstime=when, location=self.planner.location))
+        self.assertLess(np.abs(altaz.alt.value - self.planner.alt[:, 10]).max(), 0.01)
+
+    def testPlan(self):
+        plan = self.planner.plan(self.positions, 600, self.start, self.end, origin=(180, 45), budget=0.2)
+        self.assertEqual(sorted(obs['target'] for obs in plan), [0, 1, 2, 3, 4])
+        for previous, obs in zip(plan[:-1], plan[1:]):
+            self.assertGreaterEqual((obs['start'] - previous['end']).total_seconds(), obs['slew'] - 1e-3)
+            self.assertEqual((obs['end'] - obs['start']).total_seconds(), 600)
+        self.assertGreaterEqual(self.planner.dead_time, 0)
+
+    def testWindows(self):
+        opens = self.start + datetime.timedelta(hours=2)
+        windows = [(opens, self.end)] + [(self.start, self.end)]*5
+        plan = self.planner.plan(self.positions, 600, self.start, self.end, windows=windows, origin=(180, 45), budget=0)
+        first = [obs for obs in plan if obs['target'] == 0][0]
+        self.assertGreaterEqual(first['start'], opens)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_protocol
+-----------------
+Tests for the acreroad_1420.protocol module
+"""
+
+
+import unittest
+
+from acreroad_1420 import protocol
+
+class TestDecode(unittest.TestCase):
+    def testStatus(self):
+        record = protocol.decode("s 1234,1.5e0,3e-1\n")
+        self.assertEqual(record, protocol.Status('1234', 1.5, 0.3))
+
+    def testStatusWithFloatExponent(self):
+        record = protocol.decode(b"s 1234,1e0.5,0e0\n")
+        self.assertAlmostEqual(record.az, 10**0.5)
+
+    def testIncompleteStatusIgnored(self):
+        self.assertEqual(protocol.decode("s 1234,1.5\n"), None)
+
+    def testClick(self):
+        record = protocol.decode("al,10,20,1.5,0.5\n")
+        self.assertEqual(record, protocol.Click('l', 1.5, 0.5))
+
+    def testStatusReport(self):
+        record = protocol.decode(">S Taz=1.2 Talt=0.5 t=12:00\n")
+        self.assertEqual(record.fields, {'Taz': '1.2', 'Talt': '0.5', 't': '12:00'})
+
+    def testReplies(self):
+        self.assertEqual(protocol.decode(">g A 1.2 0.5\n"), protocol.Arrived("1.2 0.5"))
+        self.assertEqual(protocol.decode(">g E\n"), protocol.Endstop(""))
+        self.assertEqual(protocol.decode(">c 450 650\n"), protocol.Calibration("450 650"))
+        self.assertEqual(protocol.decode(">T ok\n"), protocol.Reply("T ok"))
+
+    def testMessages(self):
+        self.assertEqual(protocol.decode("!bad command\n"), protocol.Error("bad command"))
+        self.assertEqual(protocol.decode("#qp v0.7b2\n"), protocol.Comment("qp v0.7b2"))
+
+    def testUnknown(self):
+        self.assertEqual(protocol.decode(""), None)
+        self.assertEqual(protocol.decode("x\n"), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_reader
+-----------------
+Tests for the acreroad_1420.reader module
+"""
+
+
+import unittest
+import threading
+import time
+
+from acreroad_1420 import reader
+
+class FakePort():
+    """
+    Hands out pre-arranged chunks of bytes, as a serial port would.
+    """
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.in_waiting = len(self.chunks[0]) if self.chunks else 0
+
+    def read(self, size=1):
+        if not self.chunks:
+            time.sleep(0.01)
+            return b""
+        chunk = self.chunks.pop(0)
+        self.in_waiting = len(self.chunks[0]) if self.chunks else 0
+        return chunk
+
+class TestLineReader(unittest.TestCase):
+    def testFraming(self):
+        lines = []
+        port = FakePort([b"s 1,1.0e0,", b"2.0e0\n#hel", b"lo\n!oops\n", b"s 2"])
+        lr = reader.LineReader(port, lines.append)
+        lr.start()
+        time.sleep(0.2)
+        lr.stop()
+        self.assertEqual(lines, [b"s 1,1.0e0,2.0e0\n", b"#hello\n", b"!oops\n"])
+        self.assertEqual(lr.stats()['lines'], 3)
+
+    def testOverflowCounted(self):
+        release = threading.Event()
+        lines = []
+        lr = reader.LineReader(FakePort([]), lambda line: (release.wait(), lines.append(line)), size=4)
+        lr.start()
+        lr.feed(b"#first\n")
+        time.sleep(0.1)
+        # The parser is stuck on the first line, so these back up
+        lr.feed(b"".join(b"#line\n" for _ in range(6)))
+        release.set()
+        time.sleep(0.1)
+        lr.stop()
+        self.assertEqual(lr.overflowed, 2)
+        self.assertEqual(len(lines), 5)
+
+    def testGarbageDropped(self):
+        lines = []
+        lr = reader.LineReader(FakePort([]), lines.append, max_line=8)
+        lr.feed(b"x"*20)
+        lr.feed(b"#ok\n")
+        self.assertEqual(lr.dropped, 1)
+        self.assertEqual([line for read, line in lr._buffer], [b"#ok\n"])
+
+    def testParserErrorsCounted(self):
+        def fail(line):
+            raise ValueError(line)
+        lr = reader.LineReader(FakePort([b"s 1\n"]), fail)
+        lr.start()
+        time.sleep(0.1)
+        lr.stop()
+        self.assertEqual(lr.errors, 1)
+
+    def testReadErrorsLoggedByParser(self):
+        class BrokenPort(FakePort):
+            def read(self, size=1):
+                time.sleep(0.05)
+                raise IOError("unplugged")
+        lr = reader.LineReader(BrokenPort([]), lambda line: None)
+        with self.assertLogs(level='ERROR') as logs:
+            lr.start()
+            time.sleep(0.1)
+            lr.stop()
+        self.assertGreaterEqual(lr.errors, 1)
+        self.assertIn("unplugged", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_satellite
+-----------------
+Tests for the acreroad_1420.satellite module
+"""
+
+
+import unittest
+import math
+
+import ephem
+from astropy.coordinates import EarthLocation
+import astropy.units as u
+
+from acreroad_1420 import satellite
+from acreroad_1420.drive import Snapshot
+
+ISS = ["ISS (ZARYA)",
+       "1 25544U 98067A   08264.51782528 -.00002182  00000-0 -11606-4 0  2927",
+       "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537"]
+
+# A geostationary satellite, which is always up
+GEOSTATIONARY = ["GEO",
+                 "1 39285U 13056A   16068.50000000  .00000130  00000-0  00000+0 0  9991",
+                 "2 39285   0.0500  82.0000 0002000 250.0000 020.0000  1.00270000100006"]
+
+class FakeDrive():
+    location = EarthLocation(lat=55.9024278*u.deg, lon=-4.307582*u.deg, height=61*u.m)
+    sim = 0
+    slewing = False
+
+    def __init__(self):
+        self.position = Snapshot(0, 0, 0)
+        self.slews = []
+
+    def _slew_to(self, az, alt):
+        self.slews.append((az, alt))
+
+class TestSatellite(unittest.TestCase):
+    def setUp(self):
+        self.epoch = satellite.unix(satellite.body(ISS)._epoch)
+        self.rise, self.set = satellite.next_pass(ISS, FakeDrive.location, self.epoch)
+
+    def testNextPass(self):
+        self.assertGreater(self.rise, self.epoch)
+        self.assertTrue(60 < self.set - self.rise < 900)
+
+    def testGeostationaryHasNoPass(self):
+        epoch = satellite.unix(satellite.body(GEOSTATIONARY)._epoch)
+        with self.assertRaises(satellite.PassError):
+            satellite.next_pass(GEOSTATIONARY, FakeDrive.location, epoch + 3600)
+
+    def testStaleElementsHaveNoPass(self):
+        # Elements from 2016 are no use long before 2100
+        with self.assertRaises(satellite.PassError):
+            satellite.next_pass(ISS, FakeDrive.location, 4102444800)
+
+    def testTrajectoryMatchesEphem(self):
+        path = satellite.PassTrajectory(ISS, FakeDrive.location, self.rise, self.set - self.rise, step=0.5)
+        t = self.rise + 100.25
+        site = satellite.observer(FakeDrive.location)
+        site.date = ephem.Date(satellite.UNIX_EPOCH + t/86400.)
+        body = satellite.body(ISS)
+        body.compute(site)
+        az, alt = path.at(t)
+        self.assertLess(satellite._separation((az, alt), (math.degrees(body.az), math.degrees(body.alt))), 0.01)
+
+    def testTrackerLeadsSatellite(self):
+        drive = FakeDrive()
+        now = [self.rise + 60]
+        tracker = satellite.SatelliteTracker(drive, ISS, lead=0.6, start=self.epoch, clock=lambda: now[0])
+        tracker.correct()
+        self.assertEqual(drive.slews, [tracker.position(now[0] + 0.6)])
+        # The satellite hasn't moved, so there's nothing new to send
+        tracker.correct()
+        self.assertEqual(len(drive.slews), 1)
+        now[0] += 0.5
+        tracker.correct()
+        self.assertEqual(tracker.commands, 2)
+
+    def testEndLeavesNewTrackerRunning(self):
+        drive = FakeDrive()
+        tracker = satellite.SatelliteTracker(drive, ISS, start=self.epoch, clock=lambda: self.set + 1)
+        # The drive has moved on to tracking something else
+        drive.tracker, drive.tracking = object(), True
+        tracker._run()
+        self.assertTrue(drive.tracking)
+
+
+if __name__ == '__main__':
+    unittest.main()
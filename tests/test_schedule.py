@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_schedule
+-----------------
+Tests for the acreroad_1420.schedule module
+"""
+
+
+import unittest
+import datetime
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+from astropy.coordinates import SkyCoord
+import astropy.units as u
+
+from acreroad_1420 import drive, journal, schedule, supervisor
+
+class TestScheduleIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = schedule.ScheduleIndex()
+        self.t0 = datetime.datetime(2016, 3, 8, 17, 10)
+        for i, (start, length) in enumerate([(0, 60), (300, 60), (100, 30), (1000, 3600)]):
+            start = self.t0 + datetime.timedelta(seconds=start)
+            self.index.add({'id': i+1, 'start': start, 'end': start + datetime.timedelta(seconds=length)})
+
+    def testOrdered(self):
+        self.assertEqual([job['id'] for job in self.index], [1, 3, 2, 4])
+
+    def testOverlapping(self):
+        found = self.index.overlapping(self.t0 + datetime.timedelta(seconds=50),
+                                       self.t0 + datetime.timedelta(seconds=310))
+        self.assertEqual(sorted(job['id'] for job in found), [1, 2, 3])
+
+    def testOverlappingLongJob(self):
+        found = self.index.overlapping(self.t0 + datetime.timedelta(seconds=4000),
+                                       self.t0 + datetime.timedelta(seconds=4100))
+        self.assertEqual([job['id'] for job in found], [4])
+
+    def testRemove(self):
+        self.index.remove(3)
+        self.assertEqual([job['id'] for job in self.index], [1, 2, 4])
+        self.assertFalse(3 in self.index)
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.connection = drive.Drive('/dev/tty.usbserial', 9600, simulate=1)
+        self.rootdir = tempfile.mkdtemp()
+        self.jobs = schedule.Scheduler(rootdir=self.rootdir, drive=self.connection)
+
+        handle, self.script = tempfile.mkstemp(suffix=".sh")
+        os.write(handle, b"#!/bin/sh\nsleep 5\n")
+        os.close(handle)
+        os.chmod(self.script, stat.S_IRWXU)
+
+        self.position = SkyCoord(ra=10*u.deg, dec=20*u.deg, frame="icrs")
+
+    def testAtReturnsJobId(self):
+        start = datetime.datetime.now() + datetime.timedelta(hours=1)
+        idn = self.jobs.at(start, script=self.script, position=self.position, forsec=60)
+        self.assertEqual(idn, 1)
+        self.assertEqual(len(self.jobs.schedule), 1)
+
+    def testPastJobRejected(self):
+        start = datetime.datetime.now() - datetime.timedelta(hours=1)
+        self.assertEqual(self.jobs.at(start, script=self.script, position=self.position, forsec=60), 0)
+
+    def testFailedActionEndsJob(self):
+        def fail(idn, command):
+            raise OSError("can't start")
+        self.jobs.supervisor.start = fail
+        start = datetime.datetime.now() + datetime.timedelta(seconds=0.2)
+        idn = self.jobs.at(start, script=self.script, position=self.position, forsec=60)
+        self.assertEqual(self.jobs.wait(idn, timeout=5), supervisor.FAILED)
+        time.sleep(0.1)
+        self.assertEqual(len(self.jobs.schedule), 0)
+        self.assertTrue(self.jobs.sched_thread.is_alive())
+
+    def testWaitForUnknownJob(self):
+        self.assertRaises(KeyError, self.jobs.wait, 99, 0.1)
+
+    def testIdleSchedulerDoesNotSpin(self):
+        cpu = os.times()[0]
+        time.sleep(0.5)
+        self.assertLess(os.times()[0] - cpu, 0.1)
+
+    def testEarlierJobWakesScheduler(self):
+        later = datetime.datetime.now() + datetime.timedelta(hours=1)
+        self.jobs.at(later, script=self.script, position=self.position, forsec=60)
+
+        start = datetime.datetime.now() + datetime.timedelta(seconds=0.5)
+        self.jobs.at(start, script=self.script, position=self.position, forsec=0.5)
+
+        time.sleep(1.5)
+        stats = self.jobs.lateness_stats('start')
+        self.assertEqual(stats['count'], 1)
+        self.assertLess(stats['max'], 0.1)
+        # The finished job is removed, leaving the later one queued
+        self.assertEqual(len(self.jobs.schedule), 1)
+
+    def testWaitForJob(self):
+        start = datetime.datetime.now() + datetime.timedelta(seconds=0.2)
+        idn = self.jobs.at(start, script=self.script, position=self.position, forsec=0.5)
+        self.assertEqual(self.jobs.wait(idn, timeout=0.1), None)
+        # The script is sent a SIGTERM at the end of the job
+        self.assertEqual(self.jobs.wait(idn, timeout=5), -15)
+        self.assertEqual(self.jobs.exits[idn], -15)
+
+    def testAtMany(self):
+        first = datetime.datetime.now() + datetime.timedelta(hours=1)
+        times = [first + datetime.timedelta(minutes=10*i) for i in range(5)]
+        positions = ["{} +20".format(10*i) for i in range(5)]
+        ids = self.jobs.at_many(times, script=self.script, positions=positions, forsec=60)
+        self.assertEqual(ids, [1, 2, 3, 4, 5])
+        self.assertEqual([job['start'] for job in self.jobs.schedule], times)
+        self.assertAlmostEqual(self.jobs.schedule[2]['position'].ra.value, 20)
+
+    def testAtManyIsAtomic(self):
+        first = datetime.datetime.now() + datetime.timedelta(hours=1)
+        self.jobs.at(first, script=self.script, position=self.position, forsec=600)
+        times = [first + datetime.timedelta(minutes=10*i) for i in range(3)]
+        # The first row clashes with the existing job, the second is in the same beam
+        positions = SkyCoord(ra=[100, 10, 50]*u.deg, dec=[20, 20.1, 20]*u.deg, frame="icrs")
+        with self.assertRaises(schedule.SchedulerException) as context:
+            self.jobs.at_many(times, script=self.script, positions=positions, forsec=60)
+        self.assertEqual(list(context.exception.reasons.keys()), [0])
+        self.assertEqual(len(self.jobs.schedule), 1)
+
+    def testJournalRestoresSchedule(self):
+        journal = os.path.join(self.rootdir, "schedule.journal")
+        self.jobs.stop()
+        self.jobs = schedule.Scheduler(rootdir=self.rootdir, drive=self.connection, journal=journal)
+
+        later = datetime.datetime.now() + datetime.timedelta(hours=1)
+        self.jobs.at(later, script=self.script, position=self.position, forsec=60, then=self.connection.stow)
+        start = datetime.datetime.now() + datetime.timedelta(seconds=0.2)
+        running = self.jobs.at(start, script=self.script, position=self.position, forsec=60)
+        time.sleep(0.5)
+        pid = self.jobs.processes[running].pid
+        self.jobs.stop()
+        self.assertFalse(self.jobs.journal._writer.is_alive())
+
+        self.jobs = schedule.Scheduler(rootdir=self.rootdir, drive=self.connection, journal=journal)
+        self.assertEqual([job['id'] for job in self.jobs.schedule], [2, 1])
+        self.assertEqual(self.jobs.next_id, 3)
+        self.assertEqual(self.jobs.processes[running].pid, pid)
+        self.assertAlmostEqual(self.jobs.schedule.get(1)['position'].ra.value, 10)
+        self.assertEqual(self.jobs.schedule.get(1)['then'], [self.connection.stow])
+
+    def testJournalRejectsLambdas(self):
+        self.jobs.stop()
+        self.jobs = schedule.Scheduler(rootdir=self.rootdir, drive=self.connection,
+                                       journal=os.path.join(self.rootdir, "schedule.journal"))
+        later = datetime.datetime.now() + datetime.timedelta(hours=1)
+        self.assertEqual(self.jobs.at(later, script=self.script, position=self.position, forsec=60, then=lambda: None), 0)
+        self.assertEqual(len(self.jobs.schedule), 0)
+
+    def testReusedPidNotAdopted(self):
+        started = journal.process_started(os.getpid())
+        self.assertTrue(journal.process_alive(os.getpid(), started))
+        self.assertFalse(journal.process_alive(os.getpid(), started + "0"))
+        self.assertFalse(journal.process_alive(os.getpid(), None))
+
+    def tearDown(self):
+        self.jobs.stop()
+        for process in self.jobs.processes.values():
+            process.kill()
+        os.remove(self.script)
+        # The killed scripts' output may still be being logged
+        shutil.rmtree(self.rootdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_simulate
+-----------------
+Tests for the acreroad_1420.simulate module
+"""
+
+
+import unittest
+import datetime
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+
+from acreroad_1420 import clock, drive, simulate, slew
+
+class TestVirtualClock(unittest.TestCase):
+    def testWaitWithoutTimeoutBlocks(self):
+        virtual = clock.VirtualClock(datetime.datetime(2016, 3, 8, 12, 0))
+        condition = threading.Condition()
+        def notify():
+            time.sleep(0.2)
+            with condition:
+                condition.notify()
+        threading.Thread(target=notify).start()
+        tick = time.time()
+        with condition:
+            virtual.wait(condition)
+        self.assertGreater(time.time() - tick, 0.1)
+        self.assertEqual(virtual.now(), datetime.datetime(2016, 3, 8, 12, 0))
+
+class TestSimulator(unittest.TestCase):
+    def setUp(self):
+        self.connection = drive.Drive('/dev/tty.usbserial', 9600, simulate=1)
+        self.start = datetime.datetime(2016, 3, 8, 12, 0)
+        self.rootdir = tempfile.mkdtemp()
+
+        handle, self.script = tempfile.mkstemp(suffix=".sh")
+        os.write(handle, b"#!/bin/sh\nsleep 5\n")
+        os.close(handle)
+        os.chmod(self.script, stat.S_IRWXU)
+
+    def testWeekRunsQuickly(self):
+        sim = simulate.Simulator(self.connection, rootdir=self.rootdir, start=self.start)
+        times = [self.start + datetime.timedelta(hours=6*i + 1) for i in range(28)]
+        positions = ["{} +{}".format(50*i % 360, 10 + i) for i in range(28)]
+        tick = time.time()
+        sim.at_many(times, script=self.script, positions=positions, forsec=3600)
+        report = sim.run()
+        self.assertLess(time.time() - tick, 60)
+
+        self.assertEqual(len(report['jobs']), 28)
+        self.assertEqual(report['elapsed'], 164*3600)
+        self.assertGreater(report['slew'], 0)
+        # Slews are planned to where the target will be at the start of
+        # the job, so they can run slightly over
+        self.assertLess(report['lateness']['max'], 1)
+        # Each job is followed by five hours with nothing to do, less the slew
+        self.assertLess(abs(report['jobs'][1]['idle'] + report['jobs'][1]['slew'] - 5*3600), 1)
+        self.assertEqual(len(sim.scheduler.schedule), 0)
+
+    def testSlowDriveMakesJobsLate(self):
+        slow = slew.SlewModel(speeds=(0.005, 0.005))
+        sim = simulate.Simulator(self.connection, rootdir=self.rootdir, start=self.start, slew_model=slow)
+        sim.at(self.start + datetime.timedelta(minutes=10), script=self.script, position="h90 +80", forsec=600)
+        report = sim.run()
+        self.assertGreater(report['lateness']['max'], 0)
+
+    def testRejectionsRecorded(self):
+        sim = simulate.Simulator(self.connection, rootdir=self.rootdir, start=self.start)
+        first = self.start + datetime.timedelta(hours=1)
+        sim.at(first, script=self.script, position="h180 +45", forsec=3600)
+        sim.at_many([first + datetime.timedelta(minutes=30)], script=self.script, positions="h90 +45", forsec=60)
+        report = sim.run()
+        self.assertEqual(len(report['rejected']), 1)
+        self.assertEqual(len(report['jobs']), 1)
+
+    def tearDown(self):
+        os.remove(self.script)
+        shutil.rmtree(self.rootdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_slew
+-----------------
+Tests for the acreroad_1420.slew module
+"""
+
+
+import unittest
+
+import numpy as np
+
+from acreroad_1420 import slew
+
+class TestSlewModel(unittest.TestCase):
+    def setUp(self):
+        self.model = slew.SlewModel(speeds=(0.034, 0.034), acceleration=0.02, settle=2)
+
+    def testNoSlew(self):
+        self.assertEqual(self.model.estimate(180, 45, 180, 45), 0)
+
+    def testLongSlew(self):
+        # 90 degrees at 0.034 rad/s, with 1.7 s lost to the ramps and 2 s to settle
+        expected = np.pi/2 / 0.034 + 0.034/0.02 + 2
+        self.assertAlmostEqual(self.model.estimate(90, 45, 180, 45), expected)
+
+    def testShortSlewFasterThanLinear(self):
+        short = self.model.estimate(180, 45, 181, 45)
+        self.assertLess(short, 10)
+        self.assertLess(short, self.model.estimate(180, 45, 190, 45))
+
+    def testAzimuthWraps(self):
+        self.assertAlmostEqual(self.model.estimate(359, 45, 1, 45), self.model.estimate(1, 45, 3, 45))
+
+    def testVectorised(self):
+        times = self.model.estimate(np.zeros(3), np.zeros(3), [10, 20, 30], [0, 40, 0])
+        self.assertEqual(times.shape, (3,))
+        self.assertAlmostEqual(times[1], self.model.estimate(0, 0, 0, 40))
+
+    def testObserveRefinesModel(self):
+        predicted = self.model.estimate(90, 45, 180, 45)
+        for i in range(50):
+            self.model.observe(90, 45, 180, 45, 1.5*predicted)
+        self.assertAlmostEqual(self.model.estimate(90, 45, 180, 45), 1.5*predicted, places=2)
+
+    def testMaxSpeed(self):
+        model = slew.SlewModel(speeds=(1.0, 1.0), max_speed=0.5)
+        self.assertEqual(list(model.speeds), [0.5, 0.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
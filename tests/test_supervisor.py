@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_supervisor
+-----------------
+Tests for the acreroad_1420.supervisor module
+"""
+
+
+import unittest
+import os
+import shutil
+import tempfile
+import time
+
+from acreroad_1420 import supervisor
+
+class TestSupervisor(unittest.TestCase):
+    def setUp(self):
+        self.logdir = tempfile.mkdtemp()
+        self.supervisor = supervisor.Supervisor(self.logdir, grace=0.5, max_then=1, drain=0.5)
+
+    def testExitCodeCaptured(self):
+        handle = self.supervisor.start(1, ["sh", "-c", "exit 3"])
+        self.assertEqual(handle.wait(5), 3)
+        self.assertTrue(handle.done())
+
+    def testWaitBeforeStart(self):
+        handle = self.supervisor.handle(2)
+        self.assertEqual(handle.wait(0.1), None)
+        self.supervisor.start(2, ["true"])
+        self.assertEqual(handle.wait(5), 0)
+
+    def testOutputLogged(self):
+        handle = self.supervisor.start(3, ["sh", "-c", "echo hello; echo oops >&2"])
+        handle.wait(5)
+        with open(os.path.join(self.logdir, "job-3.log")) as log:
+            text = log.read()
+        self.assertIn("INFO hello", text)
+        self.assertIn("ERROR oops", text)
+
+    def testStubbornProcessKilled(self):
+        handle = self.supervisor.start(4, ["sh", "-c", "trap '' TERM; sleep 30"])
+        time.sleep(0.2)
+        tick = time.time()
+        self.supervisor.stop(handle)
+        self.assertEqual(handle.wait(5), -9)
+        self.assertLess(time.time() - tick, 2)
+
+    def testThenCommandsQueued(self):
+        first = self.supervisor.then(["sleep", "0.3"])
+        second = self.supervisor.then(["true"])
+        self.assertEqual(second.pid, None)
+        self.assertEqual(second.wait(5), 0)
+        self.assertTrue(first.done())
+
+    def testThenCommandsShareLog(self):
+        first = self.supervisor.then(["echo", "first"])
+        second = self.supervisor.then(["echo", "second"])
+        self.assertEqual(second.wait(5), 0)
+        self.assertTrue(first.done())
+        with open(os.path.join(self.logdir, "then.log")) as log:
+            text = log.read()
+        self.assertIn("INFO first", text)
+        self.assertIn("INFO second", text)
+
+    def testFailedThenFreesSlot(self):
+        missing = self.supervisor.then(["/nonexistent/then-command"])
+        self.assertEqual(missing.wait(5), supervisor.FAILED)
+        self.assertIsNotNone(missing.error)
+        self.assertEqual(self.supervisor.then(["true"]).wait(5), 0)
+
+    def tearDown(self):
+        shutil.rmtree(self.logdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
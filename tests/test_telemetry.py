@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_telemetry
+-----------------
+Tests for the acreroad_1420.telemetry module
+"""
+
+
+import unittest
+import datetime
+import os
+import tempfile
+
+import numpy as np
+
+from acreroad_1420 import telemetry
+
+class TestPositionHistory(unittest.TestCase):
+    def setUp(self):
+        self.history = telemetry.PositionHistory(size=8)
+        for i in range(21):
+            self.history.append(350 + i, 10 + i, utc=1000 + i)
+
+    def testRingKeepsLatest(self):
+        self.assertEqual(len(self.history), 8)
+        self.assertEqual(list(self.history.records()['utc']), list(range(1013, 1021)))
+        self.assertEqual(self.history.latest()['az'], 370)
+
+    def testInterpolation(self):
+        az, alt = self.history.at([1016.25, 1020])
+        np.testing.assert_allclose(az, [6.25, 10])
+        np.testing.assert_allclose(alt, [26.25, 30])
+
+    def testInterpolationAcrossNorth(self):
+        history = telemetry.PositionHistory(size=8)
+        history.append(359, 45, utc=0)
+        history.append(1, 45, utc=1)
+        az, _ = history.at([0.5])
+        self.assertAlmostEqual(az[0] % 360, 0)
+
+    def testOutsideHistory(self):
+        az, alt = self.history.at([1012.5, 1021])
+        self.assertTrue(np.isnan(az).all() and np.isnan(alt).all())
+
+    def testDatetimes(self):
+        az, _ = self.history.at([datetime.datetime(1970, 1, 1, 0, 16, 55)])
+        self.assertAlmostEqual(az[0], 5)
+
+    def testSpill(self):
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        history = telemetry.PositionHistory(size=8, spill=path, chunk=3)
+        for i in range(30):
+            history.append(i, i, utc=i)
+        history.flush()
+        self.assertEqual(list(telemetry.load(path)['utc']), list(range(30)))
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_tracking
+-----------------
+Tests for the acreroad_1420.tracking module
+"""
+
+
+import unittest
+import time
+
+import numpy as np
+from astropy.coordinates import SkyCoord, EarthLocation, AltAz
+from astropy.time import Time
+import astropy.units as u
+
+from acreroad_1420 import tracking
+from acreroad_1420.drive import Drive, Snapshot
+
+class FixedPath():
+    """
+    A target which doesn't move.
+    """
+    def __init__(self, az, alt):
+        self.position = az, alt
+
+    def covers(self, t):
+        return True
+
+    def at(self, t):
+        return self.position
+
+class FakeDrive():
+    vocabulary = Drive.vocabulary
+    MAX_SPEED = Drive.MAX_SPEED
+    location = EarthLocation(lat=55.9*u.deg, lon=-4.3*u.deg, height=61*u.m)
+    sim = 0
+    slewing = False
+
+    def __init__(self, az, alt):
+        self.position = Snapshot(az, alt, 0)
+        self.sent = []
+        self.slews = []
+
+    def send(self, command):
+        self.sent.append(command)
+
+    def _slew_to(self, az, alt):
+        self.slews.append((az, alt))
+
+class TestTrajectory(unittest.TestCase):
+    def testInterpolation(self):
+        location = EarthLocation(lat=55.9*u.deg, lon=-4.3*u.deg, height=61*u.m)
+        target = SkyCoord(ra=83.6*u.deg, dec=22.0*u.deg)
+        start = time.time()
+        path = tracking.Trajectory(target, location, start, duration=600, step=10)
+        t = start + 123.4
+        az, alt = path.at(t)
+        exact = target.transform_to(AltAz(obstime=Time(t, format='unix'), location=location))
+        self.assertLess(abs(az - exact.az.degree), 0.01)
+        self.assertLess(abs(alt - exact.alt.degree), 0.01)
+
+class TestRates(unittest.TestCase):
+    def testRatesMatchMotion(self):
+        lat = np.radians(55.9)
+        ha, dec = np.radians([-60.0, 30.0, 100.0]), np.radians([20.0, -10.0, 70.0])
+        az, alt = tracking.horizontal_rates(ha, dec, lat)
+        # Step the sky on by a second and see how far the position moves
+        def horizontal(ha):
+            alt = np.arcsin(np.sin(lat)*np.sin(dec) + np.cos(lat)*np.cos(dec)*np.cos(ha))
+            az = np.arctan2(-np.cos(dec)*np.sin(ha), np.sin(dec)*np.cos(lat) - np.cos(dec)*np.sin(lat)*np.cos(ha))
+            return az, alt
+        before, after = horizontal(ha), horizontal(ha + tracking.SIDEREAL_RATE)
+        np.testing.assert_allclose(az, (after[0] - before[0] + np.pi) % (2*np.pi) - np.pi, rtol=1e-3)
+        np.testing.assert_allclose(alt, after[1] - before[1], rtol=1e-3)
+        np.testing.assert_allclose(tracking.equatorial(before[0], before[1], lat), (ha, dec))
+
+class TestTracker(unittest.TestCase):
+    def track(self, drive, az, alt):
+        tracker = tracking.Tracker(drive, None, tolerance=0.1, reslew=2.0)
+        tracker.trajectory = FixedPath(az, alt)
+        tracker.correct()
+        return tracker
+
+    def testNudgesOntoPath(self):
+        drive = FakeDrive(359.8, 30.0)
+        tracker = self.track(drive, 0.2, 29.5)
+        self.assertEqual([command.split()[0] for command in drive.sent], ["ne", "nd"])
+        self.assertAlmostEqual(float(drive.sent[0].split()[1]), np.radians(0.4), places=5)
+        self.assertEqual(tracker.corrections, 1)
+
+    def testSmallErrorIgnored(self):
+        drive = FakeDrive(180.0, 30.0)
+        tracker = self.track(drive, 180.05, 30.02)
+        self.assertEqual(drive.sent, [])
+        self.assertLess(tracker.error, 0.1)
+
+    def testLargeErrorSlews(self):
+        drive = FakeDrive(180.0, 30.0)
+        tracker = self.track(drive, 190.0, 30.0)
+        self.assertEqual(drive.slews, [(190.0, 30.0)])
+        self.assertEqual(tracker.slews, 1)
+
+    def testNothingSentAfterStop(self):
+        drive = FakeDrive(180.0, 30.0)
+        tracker = tracking.Tracker(drive, None)
+        tracker.trajectory = FixedPath(190.0, 30.0)
+        # The drive moves on while the correction is being worked out
+        tracker.trajectory.at = lambda t: (tracker.stop(), (190.0, 30.0))[1]
+        tracker.correct()
+        self.assertEqual(drive.slews, [])
+        self.assertEqual(tracker.slews, 0)
+
+    def testRateOnlySentWhenItChanges(self):
+        drive = FakeDrive(180.0, 30.0)
+        tracker = tracking.RateTracker(drive, None, threshold=1e-4)
+        tracker.trajectory = FixedPath(180.0, 30.0)
+        tracker.correct()
+        tracker.correct()
+        self.assertEqual([command.split()[0] for command in drive.sent], ["ta"])
+        # Due south the target moves west at faster than the sidereal rate
+        self.assertGreater(float(drive.sent[0].split()[1]), tracking.SIDEREAL_RATE)
+        tracker.trajectory = FixedPath(90.0, 30.0)
+        drive.position = Snapshot(90.0, 30.0, 0)
+        tracker.correct()
+        tracker.stop()
+        self.assertEqual(tracker.rate_updates, 2)
+        self.assertEqual(float(drive.sent[-1].split()[1]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
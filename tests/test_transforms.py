@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_transforms
+-----------------
+Tests for the acreroad_1420.transforms module
+"""
+
+
+import unittest
+
+import numpy as np
+
+from acreroad_1420 import coordinates, transforms
+
+SITE = (55.9024278, -4.307582)
+NOW = 1476576000.0
+
+
+class TestTransformCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = transforms.TransformCache(resolution=1.0, precision=1e-4, size=3)
+
+    def testHitsAndMisses(self):
+        first = self.cache.convert('altaz', 150.0, 40.0, 'icrs', NOW + 0.2, SITE)
+        second = self.cache.convert('altaz', 150.0, 40.0, 'icrs', NOW + 0.7, SITE)
+        self.assertEqual(first, second)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def testNewTimeBucket(self):
+        self.cache.convert('altaz', 150.0, 40.0, 'icrs', NOW, SITE)
+        self.cache.convert('altaz', 150.0, 40.0, 'icrs', NOW + 1, SITE)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def testSameAsUncached(self):
+        # Done at the start of the time bucket, for the rounded position
+        ra, dec = self.cache.convert('altaz', 150.00002, 40.0, 'icrs', NOW + 0.5, SITE)
+        exact = coordinates.altaz_to_icrs(150.0, 40.0, NOW, *SITE)
+        self.assertEqual((ra, dec), exact)
+
+    def testTimelessIgnoresTimeAndSite(self):
+        self.cache.convert('icrs', 83.633, 22.014, 'galactic', NOW, SITE)
+        l, b = self.cache.convert('icrs', 83.633, 22.014, 'galactic', NOW + 100, (0, 0))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertAlmostEqual(l, coordinates.icrs_to_galactic(83.633, 22.014)[0], places=3)
+
+    def testLeastRecentlyUsedIsDropped(self):
+        for ra in (10, 20, 30):
+            self.cache.convert('icrs', ra, 0, 'galactic')
+        # Use the oldest, so the second is the least recently used
+        self.cache.convert('icrs', 10, 0, 'galactic')
+        self.cache.convert('icrs', 40, 0, 'galactic')
+        self.assertEqual(self.cache.stats()['entries'], 3)
+        self.cache.convert('icrs', 10, 0, 'galactic')
+        self.assertEqual(self.cache.stats()['hits'], 2)
+        self.cache.convert('icrs', 20, 0, 'galactic')
+        self.assertEqual(self.cache.stats()['misses'], 5)
+
+    def testArrays(self):
+        l = np.linspace(0, 360, 72)
+        az, alt = self.cache.convert('galactic', l, np.zeros(72), 'altaz', NOW, SITE)
+        self.assertEqual(az.shape, (72,))
+        again = self.cache.convert('galactic', l, np.zeros(72), 'altaz', NOW, SITE)
+        self.assertIs(again[0], az)
+        with self.assertRaises(ValueError):
+            az[0] = 0
+
+    def testUnknownFrame(self):
+        with self.assertRaises(ValueError):
+            self.cache.convert('fk4', 10, 0, 'icrs')
+
+    def testAltAzOfSkyCoord(self):
+        from astropy.coordinates import SkyCoord, EarthLocation
+        import astropy.units as u
+        location = EarthLocation(lat=SITE[0]*u.deg, lon=SITE[1]*u.deg, height=61*u.m)
+        target = SkyCoord(ra=83.633*u.deg, dec=22.014*u.deg)
+        first = self.cache.altaz(target, NOW + 0.1, location)
+        second = self.cache.altaz(SkyCoord(ra=83.633*u.deg, dec=22.014*u.deg), NOW + 0.9, location)
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.stats()['hits'], 1)
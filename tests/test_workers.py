@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_workers
+-----------------
+Tests for the acreroad_1420.workers module
+"""
+
+
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+import time
+from subprocess import PIPE
+
+from acreroad_1420 import workers
+
+PLUGIN = """
+def observe(position, outfile, duration, args=None):
+    with open(outfile, "w") as f:
+        f.write("{:.1f} {:.1f} {} {}".format(position.ra.deg, position.dec.deg, duration, args))
+"""
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, "warm_plugin.py"), "w") as f:
+            f.write(PLUGIN)
+        # The worker imports this last, so it's warm once the marker exists
+        self.marker = os.path.join(self.directory, "warm")
+        with open(os.path.join(self.directory, "warm_marker.py"), "w") as f:
+            f.write("open({!r}, 'w').close()\n".format(self.marker))
+        sys.path.insert(0, self.directory)
+        self.pool = workers.WorkerPool(1, preload=workers.PRELOAD + ('warm_marker',))
+        self.outfile = os.path.join(self.directory, "out.dat")
+
+    def testPluginName(self):
+        self.assertEqual(workers.plugin_name("warm_plugin:observe"), "warm_plugin:observe")
+        self.assertEqual(workers.plugin_name("not_a_module_at_all:observe"), None)
+        self.assertEqual(workers.plugin_name(self.outfile), None)
+
+    def testMainPluginRejected(self):
+        def observe(position, outfile, duration):
+            pass
+        observe.__module__ = '__main__'
+        with self.assertRaises(ValueError):
+            workers.plugin_name(observe)
+        with self.assertRaises(ValueError):
+            workers.plugin_name(lambda position, outfile, duration: None)
+
+    def testPluginRunsInWarmWorker(self):
+        # Wait for the worker to finish its imports
+        deadline = time.time() + 60
+        while not os.path.exists(self.marker) and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertTrue(os.path.exists(self.marker))
+        tick = time.time()
+        process = self.pool.launch(workers.Plugin("warm_plugin", "observe", 10.0, 20.0, self.outfile, 60, ["-v"]),
+                                   stdout=PIPE, stderr=PIPE)
+        self.assertEqual(process.wait(), 0)
+        self.assertLess(time.time() - tick, 1)
+        with open(self.outfile) as f:
+            self.assertEqual(f.read(), "10.0 20.0 60 ['-v']")
+
+    def testFailingPlugin(self):
+        process = self.pool.launch(workers.Plugin("warm_plugin", "missing", 10.0, 20.0, self.outfile, 60, []),
+                                   stdout=PIPE, stderr=PIPE)
+        self.assertEqual(process.wait(), 1)
+        self.assertIn(b"AttributeError", process.stderr.read())
+
+    def testCommandsPassedThrough(self):
+        process = self.pool.launch(["sh", "-c", "exit 2"])
+        self.assertEqual(process.wait(), 2)
+
+    def tearDown(self):
+        self.pool.close()
+        sys.path.remove(self.directory)
+        shutil.rmtree(self.directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_writer
+-----------------
+Tests for the acreroad_1420.writer module
+"""
+
+
+import unittest
+import threading
+import time
+
+from acreroad_1420 import protocol, writer
+
+class SlowPort():
+    """
+    A serial port which holds up each write until it's released.
+    """
+    def __init__(self):
+        self.written = []
+        self.release = threading.Event()
+
+    def write(self, data):
+        self.release.wait()
+        self.written.append(data)
+
+class TestCommandWriter(unittest.TestCase):
+    def setUp(self):
+        self.port = SlowPort()
+        self.writer = writer.CommandWriter(self.port)
+        # The writer is held up sending this
+        self.first = self.writer.submit("s 200")
+        time.sleep(0.05)
+
+    def testMotionCoalesced(self):
+        first = self.writer.submit("gh 1.00 0.50")
+        self.writer.submit("gU")
+        last = self.writer.submit("gh 1.10 0.60")
+        self.port.release.set()
+        last.written.wait(1)
+        self.assertEqual(self.port.written, [b"s 200\n", b"gh 1.10 0.60\n", b"gU\n"])
+        self.assertTrue(first.cancelled())
+        self.assertEqual(self.writer.coalesced, 1)
+
+    def testStopJumpsQueue(self):
+        self.writer.submit("T 2016 3 8 17 10 0")
+        goto = self.writer.submit("gh 1.00 0.50")
+        stop = self.writer.submit("x")
+        self.port.release.set()
+        stop.written.wait(1)
+        time.sleep(0.05)
+        self.assertEqual(self.port.written, [b"s 200\n", b"x\n", b"T 2016 3 8 17 10 0\n"])
+        self.assertTrue(goto.cancelled())
+
+    def testReplyResolvesFuture(self):
+        calibrate = self.writer.submit("c")
+        self.port.release.set()
+        calibrate.written.wait(1)
+        self.writer.acknowledge(protocol.Calibration("450 650"))
+        self.assertEqual(calibrate.result(1), protocol.Calibration("450 650"))
+
+    def testOldestReplyGivenUp(self):
+        self.writer.pending = 2
+        statuses = [self.writer.submit("S") for i in range(3)]
+        self.port.release.set()
+        statuses[-1].written.wait(1)
+        self.assertRaises(writer.ReplyLost, statuses[0].result, 1)
+        self.writer.acknowledge(protocol.StatusReport({}))
+        self.assertFalse(statuses[2].done())
+        self.assertTrue(statuses[1].done())
+
+    def testNoReplyDoneWhenWritten(self):
+        clock = self.writer.submit("T 2016 3 8 17 10 0")
+        self.port.release.set()
+        self.assertIsNone(clock.result(1))
+        self.assertTrue(clock.written.is_set())
+        self.assertTrue(self.first.done())
+
+    def testErrorFailsFuture(self):
+        self.port.release.set()
+        goto = self.writer.submit("gh 1.00 0.50")
+        rate = self.writer.submit("ta 0.0001")
+        rate.written.wait(1)
+        self.writer.acknowledge(protocol.Error("bad command"))
+        with self.assertRaises(writer.ControllerError):
+            goto.result(1)
+        self.assertIsNone(rate.exception())
+
+    def testStopCancelsEveryMove(self):
+        moves = [self.writer.submit(command) for command in ("gU", "gH", "nu 0.01", "ta 0.0001", "gh 1.00 0.50")]
+        setup = self.writer.submit("T 2016 3 8 17 10 0")
+        self.writer.submit("x")
+        self.port.release.set()
+        setup.written.wait(1)
+        self.assertEqual(self.port.written, [b"s 200\n", b"x\n", b"T 2016 3 8 17 10 0\n"])
+        self.assertTrue(all(move.cancelled() for move in moves))
+
+    def testStopsKeepTheirOrder(self):
+        self.writer.submit("gU")
+        self.writer.submit("x")
+        last = self.writer.submit("X")
+        self.port.release.set()
+        last.written.wait(1)
+        self.assertEqual(self.port.written, [b"s 200\n", b"x\n", b"X\n"])
+
+    def testPauseReplaysMotion(self):
+        self.port.release.set()
+        status = self.writer.submit("S")
+        goto = self.writer.submit("gh 1.00 0.50")
+        goto.written.wait(1)
+        self.writer.pause()
+        queued = self.writer.submit("gU")
+        setup = self.writer.resume(["T 2016 3 8 17 10 0"])
+        queued.written.wait(1)
+        self.assertEqual(self.port.written[3:], [b"T 2016 3 8 17 10 0\n", b"gh 1.00 0.50\n", b"gU\n"])
+        self.assertIsInstance(status.exception(), writer.ConnectionLost)
+        self.assertFalse(goto.done())
+        self.assertTrue(setup[0].written.is_set())
+
+    def testStopsDuringOutageGoFirst(self):
+        self.port.release.set()
+        goto = self.writer.submit("gh 1.00 0.50")
+        goto.written.wait(1)
+        self.writer.pause()
+        stop = self.writer.submit("x")
+        setup = self.writer.resume(["T 2016 3 8 17 10 0"])
+        setup[0].written.wait(1)
+        self.assertEqual(self.port.written[2:], [b"x\n", b"T 2016 3 8 17 10 0\n"])
+        self.assertTrue(stop.done())
+        self.assertTrue(goto.cancelled())
+
+    def tearDown(self):
+        self.port.release.set()
+        self.writer.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()